@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from datetime import datetime
-from typing import List
+from datetime import datetime, date, timedelta
+from typing import List, Optional
+import base64
 from app.db.metadata_db import get_db
 from app.db.models import BookingRequest
-from app.utils.email_utils import send_booking_confirmation
+from app.core.availability import slot_index, SlotConflictError, InvalidSlotError
+from app.config import settings
+from app.utils.email_utils import enqueue_booking_confirmation, email_outbox_sender
 
 router = APIRouter()
 
@@ -25,14 +28,49 @@ class BookingResponse(BaseModel):
     status: str
     created_at: datetime
 
+class DayAvailability(BaseModel):
+    date: date
+    free_slots: List[str]
+
+class AvailabilityResponse(BaseModel):
+    slot_minutes: int
+    days: List[DayAvailability]
+
+class BookingPage(BaseModel):
+    items: List[BookingResponse]
+    next_cursor: Optional[str] = None
+
+# Columns needed by list views; selecting them directly skips ORM object hydration
+BOOKING_LIST_COLUMNS = (
+    BookingRequest.id,
+    BookingRequest.full_name,
+    BookingRequest.email,
+    BookingRequest.booking_date,
+    BookingRequest.booking_time,
+    BookingRequest.status,
+    BookingRequest.created_at
+)
+
+def encode_cursor(booking_id: int) -> str:
+    return base64.urlsafe_b64encode(str(booking_id).encode()).decode()
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @router.post("/book", response_model=BookingResponse)
 async def create_booking(booking: BookingCreate, db: Session = Depends(get_db)):
     """Create a new booking"""
     try:
         # Parse date
         booking_date = datetime.strptime(booking.booking_date, "%Y-%m-%d")
-        
-        # Create booking
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format")
+    
+    try:
+        # Create booking and claim its slot
         db_booking = BookingRequest(
             full_name=booking.full_name,
             email=booking.email,
@@ -40,35 +78,87 @@ async def create_booking(booking: BookingCreate, db: Session = Depends(get_db)):
             booking_time=booking.booking_time,
             notes=booking.notes
         )
+        slot_index.book(db, db_booking)
         
-        db.add(db_booking)
+        # Queue confirmation email in the same transaction; the outbox sender delivers it
+        enqueue_booking_confirmation(db, db_booking)
         db.commit()
         db.refresh(db_booking)
-        
-        # Send confirmation email
-        email_sent = send_booking_confirmation(
-            booking.email,
-            booking.full_name,
-            booking.booking_date,
-            booking.booking_time
-        )
-        
-        if not email_sent:
-            # Log warning but don't fail the booking
-            print(f"Warning: Failed to send confirmation email to {booking.email}")
+        email_outbox_sender.notify()
         
         return db_booking
         
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail="Invalid date format")
+    except InvalidSlotError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except SlotConflictError as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
+        db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/bookings", response_model=List[BookingResponse])
-async def get_bookings(db: Session = Depends(get_db)):
-    """Get all bookings"""
-    bookings = db.query(BookingRequest).all()
-    return bookings
+@router.post("/bookings/{booking_id}/cancel", response_model=BookingResponse)
+async def cancel_booking(booking_id: int, db: Session = Depends(get_db)):
+    """Cancel a booking and free its slot"""
+    booking = db.query(BookingRequest).filter(BookingRequest.id == booking_id).first()
+    if not booking:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    if booking.status == "cancelled":
+        raise HTTPException(status_code=409, detail="Booking already cancelled")
+    
+    slot_index.cancel(db, booking)
+    db.commit()
+    db.refresh(booking)
+    return booking
+
+@router.get("/availability", response_model=AvailabilityResponse)
+async def get_availability(start: date, end: Optional[date] = None, db: Session = Depends(get_db)):
+    """Free slots per day over a date range"""
+    end = end or start
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    if (end - start).days >= settings.BOOKING_MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range is limited to {settings.BOOKING_MAX_RANGE_DAYS} days")
+    
+    days = slot_index.free_slots(db, start, end)
+    return {
+        "slot_minutes": slot_index.slot_minutes,
+        "days": [{"date": day, "free_slots": slots} for day, slots in days.items()]
+    }
+
+@router.get("/bookings", response_model=BookingPage)
+async def get_bookings(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    email: Optional[str] = None,
+    status: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: Session = Depends(get_db)
+):
+    """List bookings newest first, one keyset page at a time"""
+    query = db.query(*BOOKING_LIST_COLUMNS)
+    
+    if email:
+        query = query.filter(BookingRequest.email == email)
+    if status:
+        query = query.filter(BookingRequest.status == status)
+    if date_from:
+        query = query.filter(BookingRequest.booking_date >= datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        query = query.filter(BookingRequest.booking_date < datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+    if cursor:
+        query = query.filter(BookingRequest.id < decode_cursor(cursor))
+    
+    # Fetch one extra row to know whether another page exists
+    rows = query.order_by(BookingRequest.id.desc()).limit(limit + 1).all()
+    page = rows[:limit]
+    
+    return {
+        "items": [row._asdict() for row in page],
+        "next_cursor": encode_cursor(page[-1].id) if len(rows) > limit else None
+    }
 
 @router.get("/bookings/{booking_id}", response_model=BookingResponse)
 async def get_booking(booking_id: int, db: Session = Depends(get_db)):
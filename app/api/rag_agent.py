@@ -1,15 +1,29 @@
 # app/api/rag_agent.py
 
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import List, Dict, Optional
+from app.core.profiling import run_in_threadpool
+from pydantic import BaseModel, Field
+from typing import List, Dict, Optional, Literal
 from app.core.tools import document_search_tool, booking_tool
-from app.main import memory_store
+from app.core.embedding import embedding_generator
+from app.core.vector_store import vector_store
+from app.core.history import history_manager
+from app.core.metrics import track_stage
+from app.core.circuit_breaker import vector_db_breaker
+from app.core.retrieval import ScoredChunk
+from app.core.dedup import deduplicator
+from app.db.metadata_db import SessionLocal
+from app.core.inference_client import RemoteText2TextPipeline
+from app.core.stub_models import StubText2TextPipeline
+from app.config import settings
+import math
 import uuid
-from transformers import pipeline
+from transformers import pipeline, AutoTokenizer
 
 router = APIRouter()
 
+LLM_MODEL_NAME = "google/flan-t5-base"
+
 class QueryRequest(BaseModel):
     query: str
     session_id: Optional[str] = None
@@ -19,10 +33,25 @@ class QueryResponse(BaseModel):
     session_id: str
     sources: List[Dict] = []
 
+class BatchSearchRequest(BaseModel):
+    queries: List[str] = Field(min_length=1, max_length=settings.SEARCH_BATCH_MAX_QUERIES)
+    top_k: int = Field(default=5, ge=1, le=100)
+    method: Literal["cosine", "dot", "euclidean"] = "cosine"
+
+class SearchHit(BaseModel):
+    id: str
+    score: float
+    text: str
+    metadata: Dict
+
+class BatchSearchResponse(BaseModel):
+    results: List[List[SearchHit]]
+    metrics: Dict
+
 class RAGAgent:
     def __init__(self):
-        # Load HuggingFace model (e.g., Flan-T5)
-        self.llm = pipeline("text2text-generation", model="google/flan-t5-base")
+        self._llm = None
+        self._tokenizer = None
 
         # Available tools (just for documentation logic here)
         self.tools = {
@@ -30,43 +59,121 @@ class RAGAgent:
             "book_interview": booking_tool,
         }
 
+    def get_llm(self):
+        """Lazy load HuggingFace model (e.g., Flan-T5)"""
+        if self._llm is None:
+            if settings.MODEL_BACKEND == "stub":
+                self._llm = StubText2TextPipeline()
+            elif settings.INFERENCE_SERVER_SOCKET:
+                self._llm = RemoteText2TextPipeline()
+            else:
+                self._llm = pipeline("text2text-generation", model=LLM_MODEL_NAME)
+        return self._llm
+
+    def get_tokenizer(self):
+        """Lazy load the LLM's tokenizer, which budgets the history in its prompts"""
+        if self._tokenizer is None:
+            tokenizer = getattr(self.get_llm(), "tokenizer", None)
+            # Generation served by the inference server: load the tokenizer alone
+            self._tokenizer = tokenizer or AutoTokenizer.from_pretrained(LLM_MODEL_NAME)
+        return self._tokenizer
+
     def process_query(self, query: str, session_id: str) -> Dict:
         """Simple RAG response without LangChain agent"""
-        # Add conversation history
-        memory_store.add_message(session_id, {"role": "user", "content": query})
+        # Bounded conversation history (summary + recent turns), read before this turn is added
+        history = history_manager.get_prompt_history(session_id)
+        history_manager.add_message(session_id, {"role": "user", "content": query})
+
+        # Very simple agent logic (call document search before LLM); typed hits, no JSON round-trip
+        hits, _ = self.tools["document_search"].search(query)
 
-        # Very simple agent logic (call document search tool before LLM)
-        search_result = self.tools["document_search"].run({"query": query})
+        history_section = f"Conversation so far:\n{history}\n" if history else ""
 
         prompt = f"""
-You are a helpful assistant. First read the following context from document search:
-{search_result.get("result", "No relevant document found")}
+You are a helpful assistant.
+{history_section}
+First read the following context from document search:
+{self.format_context(hits) or "No relevant document found"}
 
 Then answer the user question: {query}
 """
 
-        llm_response = self.llm(prompt, max_length=256, do_sample=False)[0]["generated_text"]
+        llm = self.get_llm()
+        with track_stage("llm_generation", LLM_MODEL_NAME):
+            llm_response = llm(prompt, max_length=256, do_sample=False)[0]["generated_text"]
 
-        memory_store.add_message(session_id, {"role": "assistant", "content": llm_response})
+        history_manager.add_message(session_id, {"role": "assistant", "content": llm_response})
 
         return {
             "response": llm_response,
             "session_id": session_id,
-            "sources": [{"source": "vector_store"}]
+            "sources": self.sources(hits)
         }
 
+    def sources(self, hits: List[ScoredChunk]) -> List[Dict]:
+        """Hit sources; with deduplication, every document that contains the chunk"""
+        sources = [hit.source() for hit in hits]
+        if settings.DEDUP_ENABLED and sources:
+            db = SessionLocal()
+            try:
+                documents = deduplicator.source_documents(db, [hit.id for hit in hits])
+            finally:
+                db.close()
+            for source in sources:
+                source["documents"] = documents.get(source["id"], [source["document_id"]])
+        return sources
+
+    def format_context(self, hits: List[ScoredChunk]) -> str:
+        """Numbered snippets of the retrieved chunks for the prompt"""
+        return "\n\n".join(
+            f"[{n}] {hit.metadata.get('filename', 'unknown')} (chunk {hit.metadata.get('chunk_index', 0)}):\n{hit.snippet()}"
+            for n, hit in enumerate(hits, 1)
+        )
+
 rag_agent_instance = RAGAgent()
+history_manager.use_llm(rag_agent_instance.get_llm, rag_agent_instance.get_tokenizer)
 
 @router.post("/query", response_model=QueryResponse)
 async def query_agent(request: QueryRequest):
     try:
         session_id = request.session_id or str(uuid.uuid4())
-        result = rag_agent_instance.process_query(request.query, session_id)
+        # Model-bound; off the event loop so admission control can keep shedding under load
+        result = await run_in_threadpool(rag_agent_instance.process_query, request.query, session_id)
         return QueryResponse(**result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def search_batch(queries: List[str], top_k: int, method: str) -> Dict:
+    """Embed all queries in one call and rank them against the index in one pass"""
+    embeddings, embedding_metrics = embedding_generator.generate_embeddings(queries)
+    if embedding_metrics.get("status") != "success":
+        raise RuntimeError(f"Query embedding failed: {embedding_metrics.get('error')}")
+
+    results, search_metrics = vector_store.similarity_search_batch(embeddings, top_k=top_k, method=method)
+    if search_metrics.get("status") != "success":
+        raise RuntimeError(f"Batch search failed: {search_metrics.get('error')}")
+
+    return {
+        "results": [[hit.to_dict() for hit in hits] for hits in results],
+        "metrics": {"embedding": embedding_metrics, "search": search_metrics}
+    }
+
+@router.post("/search/batch", response_model=BatchSearchResponse)
+async def search_documents_batch(request: BatchSearchRequest):
+    try:
+        # CPU-bound; keep it off the event loop
+        result = await run_in_threadpool(search_batch, request.queries, request.top_k, request.method)
+        return BatchSearchResponse(**result)
+    except Exception as e:
+        if vector_db_breaker.rejecting:
+            raise HTTPException(
+                status_code=503,
+                detail="Vector store unavailable, retry later",
+                headers={"Retry-After": str(math.ceil(vector_db_breaker.retry_after))}
+            )
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.delete("/session/{session_id}")
 async def clear_session(session_id: str):
-    memory_store.clear_conversation(session_id)
+    history_manager.clear(session_id)
     return {"message": "Session cleared"}
@@ -1,28 +1,132 @@
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
+from fastapi.responses import JSONResponse
+from app.core.profiling import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.db.metadata_db import get_db
 from app.db.models import DocumentMetadata
 from app.core.chunking import chunker
 from app.core.embedding import embedding_generator
+from app.core.dedup import deduplicator
+from app.core.projection import output_dimension, active_projection_version
 from app.config import settings
+from app.core.metrics import track_stage
+from app.core.circuit_breaker import vector_db_breaker, CircuitOpen
+from app.utils.text_extraction import extract_text_from_pdf, extract_text_from_txt
 
 import os
+import math
 import uuid
+import hashlib
 from datetime import datetime
 import PyPDF2
-import io
 
 # ✅ Use shared vector_store instance to avoid re-initializing Pinecone every request
 from app.core.vector_store import vector_store
 
 router = APIRouter()
 
-def extract_text_from_pdf(file_content: bytes) -> str:
-    pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
-    return ''.join([page.extract_text() for page in pdf_reader.pages if page.extract_text()])
+UPLOAD_DIR = "uploads"
+UPLOAD_BLOCK_SIZE = 1024 * 1024
+# Multipart framing (boundaries, part headers) on top of the file itself
+MULTIPART_OVERHEAD = 64 * 1024
 
-def extract_text_from_txt(file_content: bytes) -> str:
-    return file_content.decode('utf-8')
+class UploadSizeLimitMiddleware:
+    """Reject upload bodies over MAX_FILE_SIZE while they are still being received.
+
+    Checks Content-Length up front and counts bytes for chunked bodies, so an
+    oversized upload is refused before it is parsed and spooled to disk.
+    """
+
+    def __init__(self, app, path_prefix: str = "/api/v1/upload", max_body_size: int = settings.MAX_FILE_SIZE + MULTIPART_OVERHEAD):
+        self.app = app
+        self.path_prefix = path_prefix
+        self.max_body_size = max_body_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope["headers"]:
+            if name != b"content-length":
+                continue
+            try:
+                declared = int(value)
+            except ValueError:
+                declared = -1
+            if declared < 0:
+                response = JSONResponse({"detail": "Invalid Content-Length header"}, status_code=400)
+            elif declared > self.max_body_size:
+                response = JSONResponse({"detail": "File too large"}, status_code=413)
+            else:
+                break
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_size:
+                    raise HTTPException(status_code=413, detail="File too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+async def save_upload(file: UploadFile, extension: str):
+    """
+    Stream an upload to disk in fixed-size blocks, hashing as it goes.
+    Returns (path, sha256, size); the file is stored under its content hash.
+    Disk writes and hashing run in the threadpool so a slow disk does not stall the event loop.
+    """
+    tmp_dir = os.path.join(UPLOAD_DIR, "tmp")
+    await run_in_threadpool(os.makedirs, tmp_dir, exist_ok=True)
+    tmp_path = os.path.join(tmp_dir, f"{uuid.uuid4()}.part")
+    hasher = hashlib.sha256()
+    size = 0
+
+    def write(out, block: bytes):
+        hasher.update(block)
+        out.write(block)
+
+    out = await run_in_threadpool(open, tmp_path, "wb")
+    try:
+        try:
+            while True:
+                block = await file.read(UPLOAD_BLOCK_SIZE)
+                if not block:
+                    break
+                size += len(block)
+                if size > settings.MAX_FILE_SIZE:
+                    raise HTTPException(status_code=413, detail="File too large")
+                await run_in_threadpool(write, out, block)
+        finally:
+            await run_in_threadpool(out.close)
+    except BaseException:
+        # Removed inline: awaiting here could be cancelled again and leave the part file behind
+        os.remove(tmp_path)
+        raise
+
+    content_hash = hasher.hexdigest()
+    file_path = os.path.join(UPLOAD_DIR, f"{content_hash}{extension}")
+    await run_in_threadpool(place_upload, tmp_path, file_path)
+
+    return file_path, content_hash, size
+
+def place_upload(tmp_path: str, file_path: str):
+    """Move a finished upload to its content-addressed path, dropping it if that content is already stored"""
+    if os.path.exists(file_path):
+        os.remove(tmp_path)
+    else:
+        os.replace(tmp_path, file_path)
+
+def discard_upload(db: Session, file_path: str):
+    """Remove a stored upload that failed processing, unless a processed document shares it"""
+    if not db.query(DocumentMetadata.id).filter(DocumentMetadata.file_path == file_path).first():
+        os.remove(file_path)
 
 @router.post("/upload")
 async def upload_document(
@@ -35,24 +139,75 @@ async def upload_document(
     if file.content_type not in ["application/pdf", "text/plain"]:
         raise HTTPException(status_code=400, detail="Unsupported file type")
 
-    content = await file.read()
     extension = os.path.splitext(file.filename)[1].lower()
 
-    if extension == ".pdf":
-        text = extract_text_from_pdf(content)
-    elif extension == ".txt":
-        text = extract_text_from_txt(content)
-    else:
+    if extension not in (".pdf", ".txt"):
         raise HTTPException(status_code=400, detail="Unsupported extension")
 
-    # ✅ 2. Generate document ID
+    # Vector store known to be down: refuse before extracting and embedding for nothing
+    if vector_db_breaker.rejecting:
+        raise HTTPException(
+            status_code=503,
+            detail="Vector store unavailable, retry later",
+            headers={"Retry-After": str(math.ceil(vector_db_breaker.retry_after))}
+        )
+
+    # ✅ 2. Stream to content-addressed storage, enforcing MAX_FILE_SIZE per block
+    file_path, content_hash, file_size = await save_upload(file, extension)
+
+    # ✅ 3. Identical file already processed with the same settings: nothing to do.
+    # The projection is part of the key: vectors from another projection live in another space
+    embedding_projection = active_projection_version()
+    existing = db.query(DocumentMetadata).filter(
+        DocumentMetadata.content_hash == content_hash,
+        DocumentMetadata.chunking_method == chunking_method,
+        DocumentMetadata.embedding_model == embedding_model,
+        DocumentMetadata.embedding_projection == embedding_projection,
+        DocumentMetadata.processed == True
+    ).first()
+    if existing:
+        return {
+            "document_id": existing.document_id,
+            "filename": existing.filename,
+            "total_chunks": existing.total_chunks,
+            "content_hash": content_hash,
+            "deduplicated": True
+        }
+
+    with track_stage("extraction", extension.lstrip(".")):
+        try:
+            extract = extract_text_from_pdf if extension == ".pdf" else extract_text_from_txt
+            text = await run_in_threadpool(extract, file_path)
+        except (UnicodeDecodeError, PyPDF2.errors.PdfReadError) as e:
+            await run_in_threadpool(discard_upload, db, file_path)
+            raise HTTPException(status_code=400, detail=f"Could not extract text: {e}")
+
+    # ✅ 4. Generate document ID
     document_id = str(uuid.uuid4())
 
-    # ✅ 3. Chunk and embed
-    chunks, _ = chunker.chunk_document(text, method=chunking_method)
-    embeddings, _ = embedding_generator.generate_embeddings(chunks, model=embedding_model)
+    # ✅ 5. Chunk, drop near-duplicates of chunks already in the corpus, embed the rest
+    # CPU-bound work runs in the threadpool so the event loop stays responsive
+    chunks, chunking_metrics = await run_in_threadpool(chunker.chunk_document, text, method=chunking_method)
+    plan = None
+    positions = list(range(len(chunks)))
+    if settings.DEDUP_ENABLED and chunks:
+        plan = await run_in_threadpool(deduplicator.plan, db, chunks, embedding_model, embedding_projection)
+        positions = plan.unique
+    unique_chunks = [chunks[i] for i in positions]
+
+    if unique_chunks:
+        embeddings, embedding_metrics = await run_in_threadpool(embedding_generator.generate_embeddings, unique_chunks, model=embedding_model)
+        if embedding_metrics.get("status") != "success":
+            # Recording the document now would make every later upload of this file a dedup hit without vectors
+            await run_in_threadpool(discard_upload, db, file_path)
+            raise HTTPException(
+                status_code=503,
+                detail=f"Embedding failed, retry later: {embedding_metrics.get('error', 'unknown error')}"
+            )
+    else:
+        embeddings, embedding_metrics = [], {"total_texts": 0, "status": "skipped"}
 
-    # ✅ 4. Prepare metadata
+    # ✅ 6. Prepare metadata
     metadata = [
         {
             "document_id": document_id,
@@ -60,31 +215,33 @@ async def upload_document(
             "chunk_index": i,
             "chunking_method": chunking_method,
             "embedding_model": embedding_model
-        } for i in range(len(chunks))
+        } for i in positions
     ]
 
-    # ✅ 5. Store vectors in Pinecone
-    vector_ids = vector_store.store_embeddings(embeddings, chunks, metadata)
-
-    # ✅ 6. Save file locally
-    file_path = f"uploads/{document_id}_{file.filename}"
-    os.makedirs("uploads", exist_ok=True)
-    with open(file_path, "wb") as f:
-        f.write(content)
+    # ✅ 7. Store vectors in Pinecone
+    vector_ids = await run_in_threadpool(vector_store.store_embeddings, embeddings, unique_chunks, metadata)
 
-    # ✅ 7. Store metadata in DB
+    # ✅ 8. Store metadata in DB, with back-references from every chunk to its stored copy
     doc_record = DocumentMetadata(
         document_id=document_id,
         filename=file.filename,
         file_path=file_path,
         chunking_method=chunking_method,
         embedding_model=embedding_model,
+        embedding_projection=embedding_projection,
         total_chunks=len(chunks),
-        file_size=len(content),
+        file_size=file_size,
+        content_hash=content_hash,
         processed=True
     )
 
     db.add(doc_record)
+    processing_metrics = {"chunking": chunking_metrics, "embedding": embedding_metrics}
+    if plan is not None:
+        deduplicator.record(db, plan, document_id, embedding_model, embedding_projection, chunks, vector_ids)
+        processing_metrics["deduplication"] = deduplicator.report(
+            plan, chunks, embedding_metrics.get("processing_time", 0.0), output_dimension()
+        )
     db.commit()
     db.refresh(doc_record)
 
@@ -92,5 +249,51 @@ async def upload_document(
         "document_id": document_id,
         "filename": file.filename,
         "total_chunks": len(chunks),
-        "vector_ids": vector_ids[:5]  # Show preview
+        "content_hash": content_hash,
+        "deduplicated": False,
+        "vector_ids": vector_ids[:5],  # Show preview
+        "processing_metrics": processing_metrics
+    }
+
+@router.delete("/documents/{document_id}")
+async def delete_document(document_id: str, db: Session = Depends(get_db)):
+    doc_record = db.query(DocumentMetadata).filter(DocumentMetadata.document_id == document_id).first()
+    if not doc_record:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    # ✅ 1. Drop the document's references; chunks other documents still reference keep their vectors
+    vector_ids = deduplicator.forget(db, document_id)
+
+    # ✅ 2. Delete the vectors before committing, so a failure leaves the document intact
+    try:
+        if vector_ids is None:
+            # Uploaded without deduplication: no other document references its vectors
+            await run_in_threadpool(vector_store.delete_by_document, document_id)
+        elif vector_ids:
+            await run_in_threadpool(vector_store.delete_vectors, vector_ids)
+    except CircuitOpen as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=503,
+            detail="Vector store unavailable, retry later",
+            headers={"Retry-After": str(math.ceil(e.retry_after))}
+        )
+    except Exception:
+        db.rollback()
+        raise
+
+    filename, file_path, total_chunks = doc_record.filename, doc_record.file_path, doc_record.total_chunks
+    db.delete(doc_record)
+    db.commit()
+
+    # ✅ 3. The stored file is content-addressed and may back other documents
+    if not db.query(DocumentMetadata.id).filter(DocumentMetadata.file_path == file_path).first():
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+    return {
+        "document_id": document_id,
+        "filename": filename,
+        "deleted_vectors": total_chunks if vector_ids is None else len(vector_ids),
+        "deleted": True
     }
@@ -11,15 +11,27 @@ class Settings(BaseSettings):
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
     REDIS_PASSWORD: Optional[str] = None
+    REDIS_BACKEND: str = "redis"  # redis | memory (in-process store, no connection attempted)
     
     # Vector DB (Pinecone)
     PINECONE_API_KEY: str = ""
     PINECONE_ENVIRONMENT: str = "us-east-1"
     PINECONE_INDEX_NAME: str = "rag-index"
+    VECTOR_STORE_BACKEND: str = "pinecone"  # pinecone | memory | local
+
+    # Local vector index (VECTOR_STORE_BACKEND=local)
+    LOCAL_INDEX_DIR: str = "vector_index"
+    LOCAL_INDEX_COMPACT_WAL_RECORDS: int = 1000  # log records since the last snapshot
+    LOCAL_INDEX_COMPACT_DELETED_RATIO: float = 0.2
+    LOCAL_INDEX_FSYNC: bool = True
     
     # Embeddings
     EMBEDDING_MODEL: str = "sentence-transformer"
     EMBEDDING_DIMENSION: int = 384
+    MODEL_BACKEND: str = "transformers"  # transformers | stub (deterministic offline models, no downloads)
+    # Optional PCA projection (python -m app.core.projection fit): version or file path, empty disables
+    EMBEDDING_PROJECTION: str = ""
+    PROJECTION_DIR: str = "projections"
     
     # OpenAI (Optional)
     OPENAI_API_KEY: Optional[str] = None
@@ -29,16 +41,91 @@ class Settings(BaseSettings):
     SMTP_PORT: int = 587
     SMTP_USERNAME: str = ""
     SMTP_PASSWORD: str = ""
+    SMTP_SENDER_EMAIL: str = ""  # defaults to SMTP_USERNAME
+    SMTP_SECURITY: str = "starttls"  # ssl | starttls | none (none is for local SMTP stand-ins)
+    SMTP_TIMEOUT: float = 10.0
+    SMTP_IDLE_TIMEOUT: float = 60.0  # close the reused connection after this long without mail
+    SMTP_BACKEND: str = "smtp"  # smtp | sink (messages are kept in memory, nothing is sent)
+    
+    # Email outbox
+    EMAIL_OUTBOX_ENABLED: bool = True
+    EMAIL_OUTBOX_BATCH_SIZE: int = 20
+    EMAIL_OUTBOX_POLL_INTERVAL: float = 5.0
+    EMAIL_OUTBOX_MAX_ATTEMPTS: int = 5
+    EMAIL_OUTBOX_BACKOFF_BASE: float = 30.0
+    EMAIL_OUTBOX_BACKOFF_MAX: float = 3600.0
+    EMAIL_OUTBOX_LEASE_SECONDS: int = 300
     
     # App settings
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
     ALLOWED_EXTENSIONS: Set[str] = {".pdf", ".txt"}
     DEBUG: bool = False
     
+    # Booking slots
+    BOOKING_DAY_START: str = "09:00"
+    BOOKING_DAY_END: str = "17:00"
+    BOOKING_SLOT_MINUTES: int = 30
+    BOOKING_MAX_RANGE_DAYS: int = 62
+    
     # Chunking defaults
     DEFAULT_CHUNK_SIZE: int = 1000
     DEFAULT_CHUNK_OVERLAP: int = 200
     
+    # Near-duplicate chunk elimination at ingest (MinHash LSH over word shingles);
+    # changing NUM_PERM, BANDS or SHINGLE_SIZE makes stored signatures incomparable
+    DEDUP_ENABLED: bool = True
+    DEDUP_THRESHOLD: float = 0.85  # estimated Jaccard similarity at which a chunk is a duplicate
+    DEDUP_NUM_PERM: int = 128
+    DEDUP_BANDS: int = 16
+    DEDUP_SHINGLE_SIZE: int = 5
+    
+    # Shared inference server (python -m app.core.inference_server); empty loads models in-process
+    INFERENCE_SERVER_SOCKET: str = ""
+    INFERENCE_SERVER_TIMEOUT: float = 120.0
+    INFERENCE_MAX_BATCH: int = 64
+    INFERENCE_BATCH_WAIT: float = 0.005
+    
+    # Batch search
+    SEARCH_BATCH_MAX_QUERIES: int = 5000
+    
+    # Admission control, per worker process and route class
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_QUERY_CONCURRENCY: int = 4
+    ADMISSION_QUERY_QUEUE: int = 16
+    ADMISSION_UPLOAD_CONCURRENCY: int = 2
+    ADMISSION_UPLOAD_QUEUE: int = 4
+    ADMISSION_BOOKING_CONCURRENCY: int = 16
+    ADMISSION_BOOKING_QUEUE: int = 64
+    ADMISSION_QUEUE_TIMEOUT: float = 2.0  # longest wait for a slot before 503
+    ADMISSION_RETRY_AFTER: int = 2
+    SESSION_RATE_LIMIT: int = 60  # requests per window per session, 0 disables
+    SESSION_RATE_WINDOW: int = 60
+    # Rate-limit key for requests without a session: off (not limited) | client (peer address) |
+    # forwarded (last X-Forwarded-For address, as appended by the reverse proxy in front of the worker)
+    SESSION_RATE_LIMIT_CLIENT_FALLBACK: str = "off"
+    
+    # Circuit breakers (vector_db, redis, smtp) and the background dependency monitor behind /health
+    CIRCUIT_FAILURE_THRESHOLD: int = 5  # consecutive failures that open a breaker
+    CIRCUIT_RESET_TIMEOUT: float = 30.0  # seconds a breaker fails fast before letting a trial call through
+    HEALTH_CHECK_INTERVAL: float = 15.0
+    HEALTH_CHECK_TIMEOUT: float = 5.0
+    SEARCH_CACHE_SIZE: int = 1024  # recent search results served while the vector store is unavailable
+    
+    # Conversation history
+    HISTORY_WINDOW_MESSAGES: int = 10
+    HISTORY_MAX_TOKENS: int = 300
+    HISTORY_SUMMARY_MAX_TOKENS: int = 120
+    HISTORY_SUMMARY_BATCH_MESSAGES: int = 4  # messages evicted from the window per summarizing LLM call
+    
+    # Request profiling (opt-in)
+    PROFILING_ENABLED: bool = False
+    PROFILING_HEADER: str = "X-Profile-Request"
+    PROFILING_TOKEN: str = ""  # header value that triggers profiling; empty disables the header trigger
+    PROFILING_SAMPLE_RATE: float = 0.0
+    PROFILING_MODE: str = "sampling"  # sampling | deterministic
+    PROFILING_SAMPLE_INTERVAL: float = 0.005
+    PROFILING_DIR: str = "profiles"
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -0,0 +1,256 @@
+from typing import Deque, List, Optional, Tuple
+from collections import deque
+from fastapi.responses import JSONResponse
+from app.core.profiling import run_in_threadpool
+from app.config import settings
+from app.core.metrics import REQUESTS_SHED, ADMISSION_QUEUE_DEPTH, ADMISSION_WAIT
+from app.db.redis_memory import memory_store
+import asyncio
+import json
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+SESSION_HEADER = b"x-session-id"
+FORWARDED_FOR_HEADER = b"x-forwarded-for"
+CLIENT_FALLBACKS = ("off", "client", "forwarded")
+# Largest JSON body read up front to find the session_id of a request
+SESSION_BODY_PEEK_LIMIT = 64 * 1024
+
+def parse_content_length(headers) -> Optional[int]:
+    """The declared body length, None when the header is missing or malformed"""
+    try:
+        value = int(headers.get(b"content-length", b""))
+    except ValueError:
+        return None
+    return value if value >= 0 else None
+
+class Overloaded(Exception):
+    """No admission slot could be granted"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+class ConcurrencyLimiter:
+    """At most max_concurrent requests in progress and max_queue waiting, FIFO.
+
+    A request that finds the queue full is refused at once, and one that waits
+    longer than queue_timeout gives up, so admitted requests only ever queue
+    behind a bounded amount of work.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> float:
+        """Take a slot, returns the seconds spent waiting for it"""
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            return 0.0
+        if len(self._waiters) >= self.max_queue:
+            raise Overloaded("queue_full")
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        ADMISSION_QUEUE_DEPTH.labels(self.name).inc()
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+        except asyncio.TimeoutError:
+            # A slot handed over at the deadline is still ours
+            if not future.done():
+                raise Overloaded("queue_timeout")
+        except asyncio.CancelledError:
+            if future.done():
+                self.release()
+            raise
+        finally:
+            if not future.done():
+                future.cancel()
+            try:
+                self._waiters.remove(future)
+            except ValueError:
+                pass
+            ADMISSION_QUEUE_DEPTH.labels(self.name).dec()
+        return time.perf_counter() - start
+
+    def release(self):
+        """Hand the slot to the oldest waiter, or free it"""
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+class RouteClass:
+    def __init__(self, name: str, routes: List[Tuple[Optional[str], str]], limiter: ConcurrencyLimiter):
+        self.name = name
+        self.routes = routes  # (HTTP method or None for any, path prefix)
+        self.limiter = limiter
+
+    def matches(self, method: str, path: str) -> bool:
+        return any((m is None or m == method) and path.startswith(prefix) for m, prefix in self.routes)
+
+def default_route_classes() -> List[RouteClass]:
+    timeout = settings.ADMISSION_QUEUE_TIMEOUT
+    return [
+        RouteClass(
+            "query",
+            [("POST", "/api/v1/rag/query"), ("POST", "/api/v1/rag/search")],
+            ConcurrencyLimiter("query", settings.ADMISSION_QUERY_CONCURRENCY, settings.ADMISSION_QUERY_QUEUE, timeout)
+        ),
+        RouteClass(
+            "upload",
+            [("POST", "/api/v1/upload/")],
+            ConcurrencyLimiter("upload", settings.ADMISSION_UPLOAD_CONCURRENCY, settings.ADMISSION_UPLOAD_QUEUE, timeout)
+        ),
+        RouteClass(
+            "booking",
+            [("POST", "/api/v1/booking/book")],
+            ConcurrencyLimiter("booking", settings.ADMISSION_BOOKING_CONCURRENCY, settings.ADMISSION_BOOKING_QUEUE, timeout)
+        )
+    ]
+
+class AdmissionControlMiddleware:
+    """Per-route-class concurrency limits, bounded wait queues and per-session rate limits.
+
+    Overload is answered fast: 503 when a class's queue is full or the wait for a
+    slot times out, 429 when a session exceeds SESSION_RATE_LIMIT requests per
+    SESSION_RATE_WINDOW seconds. Both carry Retry-After and are counted in
+    rag_requests_shed_total. Limits apply per worker process; rate-limit
+    counters live in Redis and are shared by all workers.
+
+    The session is the X-Session-Id header, else the session_id field of a JSON
+    body. Requests without a session are not rate limited unless
+    SESSION_RATE_LIMIT_CLIENT_FALLBACK keys them by client address; behind a
+    reverse proxy the peer address is the proxy's, so use "forwarded" there.
+    """
+
+    def __init__(
+        self,
+        app,
+        route_classes: Optional[List[RouteClass]] = None,
+        rate_limit: int = settings.SESSION_RATE_LIMIT,
+        rate_window: int = settings.SESSION_RATE_WINDOW,
+        retry_after: int = settings.ADMISSION_RETRY_AFTER,
+        client_fallback: str = settings.SESSION_RATE_LIMIT_CLIENT_FALLBACK
+    ):
+        if client_fallback not in CLIENT_FALLBACKS:
+            raise ValueError(f"Unknown rate-limit client fallback: {client_fallback}")
+        self.app = app
+        self.route_classes = route_classes if route_classes is not None else default_route_classes()
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.retry_after = retry_after
+        self.client_fallback = client_fallback
+
+    def _classify(self, scope) -> Optional[RouteClass]:
+        for route_class in self.route_classes:
+            if route_class.matches(scope["method"], scope["path"]):
+                return route_class
+        return None
+
+    def _client_key(self, scope, headers) -> Optional[str]:
+        if self.client_fallback == "forwarded":
+            forwarded = headers.get(FORWARDED_FOR_HEADER, b"").decode("latin-1").split(",")[-1].strip()
+            if forwarded:
+                return f"client:{forwarded}"
+        if self.client_fallback in ("client", "forwarded"):
+            client = scope.get("client")
+            return f"client:{client[0] if client else 'unknown'}"
+        return None
+
+    async def _session_key(self, scope, receive) -> Tuple[Optional[str], object]:
+        """Returns the rate-limit key, None when the request is not limited, and a
+        receive callable that replays any body read here"""
+        headers = dict(scope["headers"])
+        if SESSION_HEADER in headers:
+            return f"session:{headers[SESSION_HEADER].decode('latin-1')}", receive
+
+        content_length = parse_content_length(headers)
+        if headers.get(b"content-type", b"").startswith(b"application/json") and content_length and content_length <= SESSION_BODY_PEEK_LIMIT:
+            chunks, more_body = [], True
+            while more_body:
+                message = await receive()
+                if message["type"] != "http.request":
+                    break
+                chunks.append(message.get("body", b""))
+                more_body = message.get("more_body", False)
+            body = b"".join(chunks)
+            replayed = False
+
+            async def replay():
+                nonlocal replayed
+                if not replayed:
+                    replayed = True
+                    return {"type": "http.request", "body": body, "more_body": False}
+                return await receive()
+
+            try:
+                session_id = json.loads(body).get("session_id")
+            except (ValueError, AttributeError):
+                session_id = None
+            if session_id:
+                return f"session:{session_id}", replay
+            receive = replay
+
+        return self._client_key(scope, headers), receive
+
+    def _count_request(self, key: str) -> Tuple[int, int]:
+        """Fixed-window counter; returns the count and the seconds until the window resets"""
+        now = time.time()
+        window = int(now // self.rate_window)
+        count = memory_store.increment_counter(f"rate_limit:{key}:{window}", self.rate_window)
+        return count, max(1, int((window + 1) * self.rate_window - now))
+
+    async def _shed(self, scope, receive, send, route_class: str, reason: str, status_code: int, retry_after: int):
+        REQUESTS_SHED.labels(route_class, reason).inc()
+        detail = "Rate limit exceeded" if reason == "rate_limited" else "Server is busy, retry later"
+        response = JSONResponse(
+            {"detail": detail, "reason": reason},
+            status_code=status_code,
+            headers={"Retry-After": str(retry_after)}
+        )
+        await response(scope, receive, send)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route_class = self._classify(scope)
+        if route_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        if self.rate_limit > 0:
+            key, receive = await self._session_key(scope, receive)
+            if key is not None:
+                count, reset_in = await run_in_threadpool(self._count_request, key)
+                if count > self.rate_limit:
+                    await self._shed(scope, receive, send, route_class.name, "rate_limited", 429, reset_in)
+                    return
+
+        try:
+            waited = await route_class.limiter.acquire()
+        except Overloaded as e:
+            await self._shed(scope, receive, send, route_class.name, e.reason, 503, self.retry_after)
+            return
+
+        ADMISSION_WAIT.labels(route_class.name).observe(waited)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route_class.limiter.release()
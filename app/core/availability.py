@@ -0,0 +1,156 @@
+from typing import Dict, List
+from datetime import date, datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.db.models import BookingRequest, BookingDayOccupancy
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# occupied_mask is a signed 64-bit column
+MAX_SLOTS_PER_DAY = 63
+
+class SlotConflictError(Exception):
+    """The requested slot is already booked"""
+
+class InvalidSlotError(ValueError):
+    """The requested time is not on the booking slot grid"""
+
+class SlotIndex:
+    """Per-day occupancy bitmasks for O(1) availability lookups per day.
+
+    Every booking sets one bit in its day's row and every cancellation clears
+    it, inside the caller's transaction. The bit flip is a conditional UPDATE so
+    two concurrent bookings cannot both claim a slot; the partial unique index on
+    booking_requests (booking_date, booking_time) backs this up at the database.
+    """
+
+    def __init__(
+        self,
+        day_start: str = settings.BOOKING_DAY_START,
+        day_end: str = settings.BOOKING_DAY_END,
+        slot_minutes: int = settings.BOOKING_SLOT_MINUTES
+    ):
+        start = datetime.strptime(day_start, "%H:%M")
+        end = datetime.strptime(day_end, "%H:%M")
+        step = timedelta(minutes=slot_minutes)
+
+        self.slot_minutes = slot_minutes
+        self.slots: List[str] = []
+        while start + step <= end:
+            self.slots.append(start.strftime("%H:%M"))
+            start += step
+
+        if not self.slots or len(self.slots) > MAX_SLOTS_PER_DAY:
+            raise ValueError(f"Booking day must have 1-{MAX_SLOTS_PER_DAY} slots, got {len(self.slots)}")
+
+        self._slot_bits = {slot: 1 << i for i, slot in enumerate(self.slots)}
+        self._full_mask = (1 << len(self.slots)) - 1
+
+    def normalize_time(self, booking_time: str) -> str:
+        """Validate a HH:MM time against the slot grid, returns its canonical form"""
+        try:
+            normalized = datetime.strptime(booking_time.strip(), "%H:%M").strftime("%H:%M")
+        except ValueError:
+            raise InvalidSlotError(f"Invalid time format: {booking_time}")
+        if normalized not in self._slot_bits:
+            raise InvalidSlotError(f"{normalized} is not a bookable slot")
+        return normalized
+
+    def free_slots_from_mask(self, mask: int) -> List[str]:
+        if mask & self._full_mask == self._full_mask:
+            return []
+        return [slot for slot, bit in self._slot_bits.items() if not mask & bit]
+
+    def _reserve(self, db: Session, day: date, booking_time: str):
+        bit = self._slot_bits[booking_time]
+        occupancy = BookingDayOccupancy.occupied_mask
+
+        updated = (
+            db.query(BookingDayOccupancy)
+            .filter(BookingDayOccupancy.day == day, occupancy.op("&")(bit) == 0)
+            .update({"occupied_mask": occupancy.op("|")(bit)}, synchronize_session=False)
+        )
+        if updated:
+            return
+
+        if db.query(BookingDayOccupancy.day).filter(BookingDayOccupancy.day == day).first():
+            raise SlotConflictError(f"{day} {booking_time} is already booked")
+
+        # First booking of the day; another request may be creating the row concurrently
+        try:
+            with db.begin_nested():
+                db.add(BookingDayOccupancy(day=day, occupied_mask=bit))
+        except IntegrityError:
+            self._reserve(db, day, booking_time)
+
+    def _release(self, db: Session, day: date, booking_time: str):
+        bit = self._slot_bits.get(booking_time)
+        if bit is None:
+            return
+        occupancy = BookingDayOccupancy.occupied_mask
+        (
+            db.query(BookingDayOccupancy)
+            .filter(BookingDayOccupancy.day == day)
+            .update({"occupied_mask": occupancy.op("&")(~bit)}, synchronize_session=False)
+        )
+
+    def book(self, db: Session, booking: BookingRequest):
+        """Insert a booking and claim its slot; the caller commits or rolls back"""
+        booking.booking_time = self.normalize_time(booking.booking_time)
+        try:
+            self._reserve(db, booking.booking_date.date(), booking.booking_time)
+            db.add(booking)
+            db.flush()
+        except IntegrityError:
+            raise SlotConflictError(f"{booking.booking_date.date()} {booking.booking_time} is already booked")
+
+    def cancel(self, db: Session, booking: BookingRequest):
+        """Mark a booking cancelled and free its slot; the caller commits"""
+        booking.status = "cancelled"
+        self._release(db, booking.booking_date.date(), booking.booking_time)
+
+    def free_slots(self, db: Session, start: date, end: date) -> Dict[date, List[str]]:
+        """Free slots for every day in [start, end], one indexed range read"""
+        masks = dict(
+            db.query(BookingDayOccupancy.day, BookingDayOccupancy.occupied_mask)
+            .filter(BookingDayOccupancy.day >= start, BookingDayOccupancy.day <= end)
+            .all()
+        )
+        days = {}
+        day = start
+        while day <= end:
+            days[day] = self.free_slots_from_mask(masks.get(day, 0))
+            day += timedelta(days=1)
+        return days
+
+    def rebuild(self, db: Session):
+        """Recompute every day's mask from active bookings"""
+        masks: Dict[date, int] = {}
+        rows = (
+            db.query(BookingRequest.booking_date, BookingRequest.booking_time)
+            .filter(BookingRequest.status != "cancelled")
+            .all()
+        )
+        for booking_date, booking_time in rows:
+            try:
+                bit = self._slot_bits[self.normalize_time(booking_time)]
+            except InvalidSlotError:
+                logger.warning(f"Skipping off-grid booking at {booking_date} {booking_time}")
+                continue
+            day = booking_date.date()
+            masks[day] = masks.get(day, 0) | bit
+
+        db.query(BookingDayOccupancy).delete(synchronize_session=False)
+        db.add_all(BookingDayOccupancy(day=day, occupied_mask=mask) for day, mask in masks.items())
+        db.commit()
+        logger.info(f"Slot index rebuilt for {len(masks)} days")
+
+    def ensure_built(self, db: Session):
+        """Backfill the occupancy table for databases that predate it"""
+        if db.query(BookingDayOccupancy.day).first() is None and db.query(BookingRequest.id).first() is not None:
+            self.rebuild(db)
+
+# Global instance
+slot_index = SlotIndex()
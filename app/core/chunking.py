@@ -1,10 +1,14 @@
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
 from langchain.text_splitter import (
     RecursiveCharacterTextSplitter,
     TokenTextSplitter,
     CharacterTextSplitter
 )
 import tiktoken
+from app.core.metrics import track_stage
+from app.core.inference_client import RemoteSentenceModel
+from app.core.stub_models import StubSentenceModel
+from app.config import settings
 from sentence_transformers import SentenceTransformer
 import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
@@ -21,6 +25,14 @@ class DocumentChunker:
     def get_sentence_model(self):
         """Lazy load sentence transformer model"""
         if self._sentence_model is None:
+            if settings.MODEL_BACKEND == "stub":
+                self._sentence_model = StubSentenceModel(settings.EMBEDDING_DIMENSION)
+                logger.info("Using stub sentence model for semantic chunking")
+                return self._sentence_model
+            if settings.INFERENCE_SERVER_SOCKET:
+                self._sentence_model = RemoteSentenceModel()
+                logger.info(f"✅ Using inference server at {settings.INFERENCE_SERVER_SOCKET} for semantic chunking")
+                return self._sentence_model
             try:
                 self._sentence_model = SentenceTransformer('all-MiniLM-L6-v2')
                 logger.info("✅ Sentence model loaded for semantic chunking")
@@ -29,7 +41,12 @@ class DocumentChunker:
                 raise
         return self._sentence_model
     
-    def recursive_chunking(self, text: str, chunk_size: int = 1000, overlap: int = 200) -> Tuple[List[str], Dict]:
+    def recursive_chunking(
+        self,
+        text: str,
+        chunk_size: int = settings.DEFAULT_CHUNK_SIZE,
+        overlap: int = settings.DEFAULT_CHUNK_OVERLAP
+    ) -> Tuple[List[str], Dict]:
         """Recursive character-based chunking with metrics"""
         start_time = time.time()
         
@@ -59,7 +76,7 @@ class DocumentChunker:
             logger.error(f"❌ Recursive chunking failed: {e}")
             return [], {"error": str(e), "status": "failed"}
     
-    def semantic_chunking(self, text: str, similarity_threshold: float = 0.7) -> Tuple[List[str], Dict]:
+    def semantic_chunking(self, text: str, similarity_threshold: float = 0.7, max_chunk_size: int = 1500) -> Tuple[List[str], Dict]:
         """Semantic similarity-based chunking with metrics"""
         start_time = time.time()
         
@@ -73,7 +90,7 @@ class DocumentChunker:
                     "total_chunks": 1,
                     "avg_chunk_size": len(text),
                     "processing_time": time.time() - start_time,
-                    "parameters": {"similarity_threshold": similarity_threshold},
+                    "parameters": {"similarity_threshold": similarity_threshold, "max_chunk_size": max_chunk_size},
                     "status": "success"
                 }
             
@@ -90,7 +107,7 @@ class DocumentChunker:
                     embeddings[i].reshape(1, -1)
                 )[0][0]
                 
-                if similarity > similarity_threshold and len('. '.join(current_chunk)) < 1500:
+                if similarity > similarity_threshold and len('. '.join(current_chunk)) < max_chunk_size:
                     current_chunk.append(sentences[i])
                 else:
                     chunks.append('. '.join(current_chunk) + '.')
@@ -106,7 +123,7 @@ class DocumentChunker:
                 "total_chunks": len(chunks),
                 "avg_chunk_size": sum(len(chunk) for chunk in chunks) / len(chunks) if chunks else 0,
                 "processing_time": processing_time,
-                "parameters": {"similarity_threshold": similarity_threshold},
+                "parameters": {"similarity_threshold": similarity_threshold, "max_chunk_size": max_chunk_size},
                 "status": "success"
             }
             
@@ -159,20 +176,47 @@ class DocumentChunker:
             logger.error(f"❌ Custom chunking failed: {e}")
             return [], {"error": str(e), "status": "failed"}
     
-    def chunk_document(self, text: str, method: str = "recursive") -> Tuple[List[str], Dict]:
-        """Main chunking method dispatcher with metrics"""
+    def chunk_document(
+        self,
+        text: str,
+        method: str = "recursive",
+        chunk_size: Optional[int] = None,
+        overlap: Optional[int] = None
+    ) -> Tuple[List[str], Dict]:
+        """Main chunking method dispatcher with metrics.
+
+        chunk_size and overlap are in the method's own unit: characters for
+        recursive (default DEFAULT_CHUNK_SIZE/DEFAULT_CHUNK_OVERLAP), tokens for
+        custom, and maximum chunk characters for semantic (overlap unused).
+        """
         if not text.strip():
             return [], {"error": "Empty text provided", "status": "failed"}
             
-        if method == "recursive":
-            return self.recursive_chunking(text)
-        elif method == "semantic":
-            return self.semantic_chunking(text)
-        elif method == "custom":
-            return self.custom_chunking(text)
-        else:
+        if method not in ("recursive", "semantic", "custom"):
             logger.warning(f"Unknown chunking method: {method}, using recursive")
-            return self.recursive_chunking(text)
+            method = "recursive"
+
+        params = {}
+        with track_stage("chunking", method) as stage:
+            if method == "semantic":
+                if chunk_size is not None:
+                    params["max_chunk_size"] = chunk_size
+                chunks, metrics = self.semantic_chunking(text, **params)
+            elif method == "custom":
+                if chunk_size is not None:
+                    params["max_tokens"] = chunk_size
+                if overlap is not None:
+                    params["overlap_tokens"] = overlap
+                chunks, metrics = self.custom_chunking(text, **params)
+            else:
+                if chunk_size is not None:
+                    params["chunk_size"] = chunk_size
+                if overlap is not None:
+                    params["overlap"] = overlap
+                chunks, metrics = self.recursive_chunking(text, **params)
+            stage.status = metrics.get("status", "success")
+            
+        return chunks, metrics
 
 # Global instance
 chunker = DocumentChunker()
\ No newline at end of file
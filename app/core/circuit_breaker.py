@@ -0,0 +1,144 @@
+from typing import Callable, Optional
+from contextlib import contextmanager
+from app.config import settings
+from app.core.metrics import CIRCUIT_STATE, CIRCUIT_TRANSITIONS, CIRCUIT_REJECTED
+import smtplib
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+class CircuitOpen(Exception):
+    """A call was refused because the dependency's breaker is open"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is unavailable (circuit open)")
+        self.name = name
+        self.retry_after = retry_after
+
+def counts_every_exception(error: BaseException) -> bool:
+    return True
+
+def is_smtp_connection_failure(error: BaseException) -> bool:
+    """Connection-level SMTP failures. Per-message rejections (refused sender or
+    recipients, 5xx data errors) are answers from a working server and are left
+    to the outbox backoff"""
+    if isinstance(error, (smtplib.SMTPConnectError, smtplib.SMTPServerDisconnected)):
+        return True
+    # SMTPException subclasses OSError, so socket errors and timeouts are OSErrors that are not SMTPExceptions
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+def is_vector_db_outage(error: BaseException) -> bool:
+    """Anything but a rejected request: 4xx API errors (bad filter, dimension mismatch)
+    and local argument errors say nothing about the index's availability; 429 does"""
+    if isinstance(error, (ValueError, TypeError)):
+        return False
+    status = getattr(error, "status", None)
+    return not (isinstance(status, int) and 400 <= status < 500 and status != 429)
+
+class CircuitBreaker:
+    """Fail calls to a dependency fast once it keeps failing.
+
+    Closed, calls go through and failure_threshold consecutive failures open the
+    breaker. Open, calls raise CircuitOpen at once for reset_timeout seconds.
+    Half-open, a single trial call goes through: success closes the breaker,
+    failure opens it again. The dependency monitor feeds its probes into the same
+    breaker, so a dependency that recovers is noticed without user traffic.
+
+    is_failure decides which exceptions raised inside guard() count towards
+    opening the breaker; the others prove the dependency answered and count as
+    successes.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = settings.CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout: float = settings.CIRCUIT_RESET_TIMEOUT,
+        is_failure: Optional[Callable[[BaseException], bool]] = None
+    ):
+        self.name = name
+        self.is_failure = is_failure or counts_every_exception
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        CIRCUIT_STATE.labels(name).set(STATE_VALUES[CLOSED])
+
+    def _transition(self, state: str):
+        """Caller holds the lock"""
+        if state == self.state:
+            return
+        if state == OPEN:
+            logger.warning(f"❌ Circuit for {self.name} opened after {self.failures} failures")
+        elif state == CLOSED:
+            logger.info(f"✅ Circuit for {self.name} closed")
+        self.state = state
+        CIRCUIT_STATE.labels(self.name).set(STATE_VALUES[state])
+        CIRCUIT_TRANSITIONS.labels(self.name, state).inc()
+
+    @property
+    def retry_after(self) -> float:
+        """Seconds until an open breaker lets a trial call through"""
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    @property
+    def rejecting(self) -> bool:
+        """Open and still within the reset timeout, so calls would fail fast"""
+        return self.state == OPEN and self.retry_after > 0
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == OPEN:
+                if self.retry_after > 0:
+                    return False
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._trial_in_flight:
+                    return False
+                self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._trial_in_flight = False
+            self._transition(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._transition(OPEN)
+
+    @contextmanager
+    def guard(self):
+        """Run a call through the breaker; raises CircuitOpen without running it when open"""
+        if not self.allow_request():
+            CIRCUIT_REJECTED.labels(self.name).inc()
+            raise CircuitOpen(self.name, self.retry_after)
+        try:
+            yield
+        except Exception as e:
+            if self.is_failure(e):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        self.record_success()
+
+# Global instances, named after the /health keys they back
+vector_db_breaker = CircuitBreaker("vector_db", is_failure=is_vector_db_outage)
+redis_breaker = CircuitBreaker("redis")
+smtp_breaker = CircuitBreaker("smtp", is_failure=is_smtp_connection_failure)
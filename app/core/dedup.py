@@ -0,0 +1,310 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.core.metrics import track_stage, DEDUP_CHUNKS, DEDUP_SAVED_EMBEDDING_SECONDS, DEDUP_SAVED_INDEX_BYTES
+from app.db.models import ChunkRecord, ChunkLSHBucket, ChunkReference
+import numpy as np
+import hashlib
+import re
+import time
+import zlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAX_HASH = np.uint64((1 << 32) - 1)
+# Polynomial base combining word hashes into a shingle hash
+SHINGLE_MULTIPLIER = np.uint64(0x100000001B3)
+WORD_PATTERN = re.compile(r"\w+")
+# Bound on bound parameters per IN (...) query; SQLite's default limit is 999
+QUERY_BATCH = 500
+
+def _batches(values: List, size: int = QUERY_BATCH) -> Iterable[List]:
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+class MinHasher:
+    """MinHash signatures over word shingles; deterministic across processes"""
+
+    def __init__(self, num_perm: int = settings.DEDUP_NUM_PERM, shingle_size: int = settings.DEDUP_SHINGLE_SIZE, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.RandomState(seed)
+        # Odd multipliers for multiply-shift hashing of the 32-bit shingle hashes
+        self._a = rng.randint(0, 1 << 63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.randint(0, 1 << 63, num_perm, dtype=np.uint64)
+
+    def shingle_hashes(self, text: str) -> np.ndarray:
+        """32-bit hashes of the word shingles, combined from per-word hashes without building shingle strings.
+        Repeated shingles are kept: they cannot change a minimum"""
+        words = WORD_PATTERN.findall(text.lower())
+        word_hashes = np.fromiter((zlib.crc32(w.encode("utf-8")) for w in words), dtype=np.uint64, count=len(words))
+        width = min(self.shingle_size, len(words))
+        count = len(words) - width + 1 if words else 0
+        hashes = np.zeros(count, dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            for k in range(width):
+                hashes = hashes * SHINGLE_MULTIPLIER + word_hashes[k:k + count]
+        return (hashes >> np.uint64(32)) ^ (hashes & MAX_HASH)
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """None for text without word tokens, which has nothing to compare"""
+        hashes = self.shingle_hashes(text)
+        if not len(hashes):
+            return None
+        # Multiply-shift: the top 32 bits of (a*x + b) mod 2^64, one permutation per column.
+        # Avoids a 64-bit modulo per shingle and permutation
+        with np.errstate(over="ignore"):
+            permuted = (hashes[:, None] * self._a + self._b) >> np.uint64(32)
+        return permuted.min(axis=0)
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity: the share of permutations whose minimum agrees"""
+    return float(np.count_nonzero(a == b)) / len(a)
+
+class DedupPlan:
+    """Outcome of deduplicating one document's chunks"""
+    __slots__ = ("signatures", "unique", "stored_duplicates", "batch_duplicates", "processing_time")
+
+    def __init__(self, signatures: List[Optional[np.ndarray]]):
+        self.signatures = signatures
+        self.unique: List[int] = []  # positions to embed and store
+        self.stored_duplicates: Dict[int, int] = {}  # position -> ChunkRecord.id already in the corpus
+        self.batch_duplicates: Dict[int, int] = {}  # position -> earlier unique position in this document
+        self.processing_time = 0.0
+
+    @property
+    def duplicates(self) -> List[int]:
+        return sorted([*self.stored_duplicates, *self.batch_duplicates])
+
+class ChunkDeduplicator:
+    """Near-duplicate chunk elimination across the whole corpus with MinHash LSH.
+
+    Signatures are split into bands; chunks sharing any band hash are candidates
+    and become duplicates when their estimated Jaccard similarity reaches the
+    threshold. Band hashes of stored chunks live in chunk_lsh_buckets, so every
+    worker sees the same corpus. A duplicate is not embedded or stored again:
+    chunk_references maps each (document, chunk position) to the chunk record
+    that holds its vector. Only chunks embedded with the same model and
+    projection match, since other vectors live in a different space.
+
+    Chunks ingested before deduplication was enabled have no signatures and are
+    never matched. Two uploads racing on the same boilerplate may both store it.
+    """
+
+    def __init__(
+        self,
+        threshold: float = settings.DEDUP_THRESHOLD,
+        num_perm: int = settings.DEDUP_NUM_PERM,
+        bands: int = settings.DEDUP_BANDS,
+        shingle_size: int = settings.DEDUP_SHINGLE_SIZE
+    ):
+        if num_perm % bands:
+            raise ValueError(f"DEDUP_NUM_PERM ({num_perm}) must be a multiple of DEDUP_BANDS ({bands})")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm, shingle_size)
+
+    def band_hashes(self, signature: np.ndarray) -> List[int]:
+        """One signed 64-bit hash per band, the LSH bucket keys"""
+        return [
+            int.from_bytes(
+                hashlib.blake2b(signature[band * self.rows:(band + 1) * self.rows].tobytes(), digest_size=8).digest(),
+                "big",
+                signed=True
+            )
+            for band in range(self.bands)
+        ]
+
+    def _stored_candidates(self, db: Session, bands: List[List[int]], embedding_model: str, embedding_projection: Optional[str]) -> Tuple[Dict[Tuple[int, int], List[int]], Dict[int, np.ndarray]]:
+        """Bucket -> stored chunk ids for the buckets these chunks fall in, and those chunks' signatures"""
+        buckets = defaultdict(list)
+        keys = {(band, bucket) for chunk_bands in bands for band, bucket in enumerate(chunk_bands)}
+        for batch in _batches(sorted({bucket for _, bucket in keys})):
+            rows = db.query(ChunkLSHBucket.band, ChunkLSHBucket.bucket, ChunkLSHBucket.chunk_id).filter(
+                ChunkLSHBucket.bucket.in_(batch)
+            ).all()
+            for band, bucket, chunk_id in rows:
+                if (band, bucket) in keys:
+                    buckets[(band, bucket)].append(chunk_id)
+
+        signatures = {}
+        for batch in _batches(sorted({chunk_id for ids in buckets.values() for chunk_id in ids})):
+            rows = db.query(ChunkRecord.id, ChunkRecord.signature).filter(
+                ChunkRecord.id.in_(batch),
+                ChunkRecord.embedding_model == embedding_model,
+                # == None compiles to IS NULL for full-width vectors
+                ChunkRecord.embedding_projection == embedding_projection
+            ).all()
+            for chunk_id, signature in rows:
+                signatures[chunk_id] = np.frombuffer(signature, dtype=np.uint64)
+        return buckets, signatures
+
+    def plan(self, db: Session, chunks: List[str], embedding_model: str, embedding_projection: Optional[str] = None) -> DedupPlan:
+        """Decide which chunks to embed and which duplicate a stored or earlier chunk"""
+        start_time = time.time()
+        with track_stage("deduplication", "minhash"):
+            signatures = [self.hasher.signature(chunk) for chunk in chunks]
+            # Chunks without shingles (no word tokens) get no bands: always unique, never matched
+            bands = [self.band_hashes(signature) if signature is not None else [] for signature in signatures]
+            stored_buckets, stored_signatures = self._stored_candidates(db, bands, embedding_model, embedding_projection)
+
+            plan = DedupPlan(signatures)
+            local_buckets = defaultdict(list)
+            for i, (signature, chunk_bands) in enumerate(zip(signatures, bands)):
+                if signature is None:
+                    plan.unique.append(i)
+                    continue
+                best: Optional[Tuple[float, str, int]] = None
+                stored = {c for band, bucket in enumerate(chunk_bands) for c in stored_buckets.get((band, bucket), ())}
+                for chunk_id in stored:
+                    if chunk_id in stored_signatures:
+                        score = similarity(signature, stored_signatures[chunk_id])
+                        if score >= self.threshold and (best is None or score > best[0]):
+                            best = (score, "stored", chunk_id)
+                earlier = {j for band, bucket in enumerate(chunk_bands) for j in local_buckets.get((band, bucket), ())}
+                for j in earlier:
+                    score = similarity(signature, signatures[j])
+                    if score >= self.threshold and (best is None or score > best[0]):
+                        best = (score, "batch", j)
+
+                if best is None:
+                    plan.unique.append(i)
+                    for band, bucket in enumerate(chunk_bands):
+                        local_buckets[(band, bucket)].append(i)
+                elif best[1] == "stored":
+                    plan.stored_duplicates[i] = best[2]
+                else:
+                    plan.batch_duplicates[i] = best[2]
+
+        plan.processing_time = time.time() - start_time
+        return plan
+
+    def record(
+        self,
+        db: Session,
+        plan: DedupPlan,
+        document_id: str,
+        embedding_model: str,
+        embedding_projection: Optional[str],
+        chunks: List[str],
+        vector_ids: List[str]
+    ):
+        """Add chunk records for the stored chunks and back-references for all of them; the caller commits"""
+        if len(vector_ids) != len(plan.unique):
+            raise ValueError(
+                f"Got {len(vector_ids)} vector ids for {len(plan.unique)} unique chunks; "
+                f"store every unique chunk before recording the document"
+            )
+        # Core executemany inserts: one upload adds bands x chunks bucket rows, too many for ORM units of work
+        chunk_ids = {}
+        if plan.unique:
+            rows = db.execute(
+                ChunkRecord.__table__.insert().returning(ChunkRecord.__table__.c.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "vector_id": vector_id,
+                        "document_id": document_id,
+                        "chunk_index": position,
+                        "embedding_model": embedding_model,
+                        "embedding_projection": embedding_projection,
+                        # Empty for chunks without shingles, which are never matched
+                        "signature": plan.signatures[position].tobytes() if plan.signatures[position] is not None else b"",
+                        "text_length": len(chunks[position]),
+                        "created_at": datetime.utcnow()
+                    }
+                    for position, vector_id in zip(plan.unique, vector_ids)
+                ]
+            ).scalars().all()
+            chunk_ids = dict(zip(plan.unique, rows))
+
+            buckets = [
+                {"band": band, "bucket": bucket, "chunk_id": chunk_id}
+                for position, chunk_id in chunk_ids.items()
+                if plan.signatures[position] is not None
+                for band, bucket in enumerate(self.band_hashes(plan.signatures[position]))
+            ]
+            if buckets:
+                db.execute(ChunkLSHBucket.__table__.insert(), buckets)
+
+        references = []
+        for position in range(len(chunks)):
+            if position in chunk_ids:
+                chunk_id = chunk_ids[position]
+            elif position in plan.stored_duplicates:
+                chunk_id = plan.stored_duplicates[position]
+            else:
+                chunk_id = chunk_ids[plan.batch_duplicates[position]]
+            references.append({"chunk_id": chunk_id, "document_id": document_id, "chunk_index": position})
+        if references:
+            db.execute(ChunkReference.__table__.insert(), references)
+
+    def report(self, plan: DedupPlan, chunks: List[str], embedding_seconds: float, dimension: int) -> Dict:
+        """What deduplication saved, estimated from this upload's per-chunk embedding time and vector size"""
+        duplicates = plan.duplicates
+        per_chunk_seconds = embedding_seconds / len(plan.unique) if plan.unique else 0.0
+        saved_seconds = per_chunk_seconds * len(duplicates)
+        # A stored vector costs its floats plus the chunk text kept as metadata
+        saved_bytes = sum(dimension * 4 + len(chunks[i].encode("utf-8")) for i in duplicates)
+
+        DEDUP_CHUNKS.labels("unique").inc(len(plan.unique))
+        DEDUP_CHUNKS.labels("duplicate").inc(len(duplicates))
+        DEDUP_SAVED_EMBEDDING_SECONDS.inc(saved_seconds)
+        DEDUP_SAVED_INDEX_BYTES.inc(saved_bytes)
+        if duplicates:
+            logger.info(f"✅ Deduplication skipped {len(duplicates)}/{len(chunks)} chunks, saving ~{saved_seconds:.2f}s of embedding")
+
+        return {
+            "total_chunks": len(chunks),
+            "unique_chunks": len(plan.unique),
+            "duplicate_chunks": len(duplicates),
+            "duplicates_of_corpus": len(plan.stored_duplicates),
+            "duplicates_within_document": len(plan.batch_duplicates),
+            "saved_embedding_seconds": saved_seconds,
+            "saved_index_bytes": saved_bytes,
+            "processing_time": plan.processing_time,
+            "status": "success"
+        }
+
+    def forget(self, db: Session, document_id: str) -> Optional[List[str]]:
+        """Drop a document's back-references and the stored chunks no other document
+        still references; the caller deletes their vectors and commits. Returns None
+        for documents uploaded without deduplication, which have no references"""
+        chunk_ids = [
+            chunk_id for (chunk_id,) in
+            db.query(ChunkReference.chunk_id).filter(ChunkReference.document_id == document_id).distinct()
+        ]
+        if not chunk_ids:
+            return None
+        db.query(ChunkReference).filter(ChunkReference.document_id == document_id).delete(synchronize_session=False)
+
+        vector_ids = []
+        for batch in _batches(chunk_ids):
+            shared = {
+                chunk_id for (chunk_id,) in
+                db.query(ChunkReference.chunk_id).filter(ChunkReference.chunk_id.in_(batch)).distinct()
+            }
+            orphans = [chunk_id for chunk_id in batch if chunk_id not in shared]
+            if not orphans:
+                continue
+            vector_ids.extend(vector_id for (vector_id,) in db.query(ChunkRecord.vector_id).filter(ChunkRecord.id.in_(orphans)))
+            db.query(ChunkLSHBucket).filter(ChunkLSHBucket.chunk_id.in_(orphans)).delete(synchronize_session=False)
+            db.query(ChunkRecord).filter(ChunkRecord.id.in_(orphans)).delete(synchronize_session=False)
+        return vector_ids
+
+    def source_documents(self, db: Session, vector_ids: List[str]) -> Dict[str, List[str]]:
+        """Every document containing each stored chunk, by vector id"""
+        documents = defaultdict(list)
+        for batch in _batches(list(dict.fromkeys(vector_ids))):
+            rows = db.query(ChunkRecord.vector_id, ChunkReference.document_id).join(
+                ChunkReference, ChunkReference.chunk_id == ChunkRecord.id
+            ).filter(ChunkRecord.vector_id.in_(batch)).distinct().all()
+            for vector_id, document_id in rows:
+                documents[vector_id].append(document_id)
+        return dict(documents)
+
+# Global instance
+deduplicator = ChunkDeduplicator()
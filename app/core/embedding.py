@@ -1,6 +1,11 @@
 from typing import List, Dict, Tuple
 from sentence_transformers import SentenceTransformer
 import numpy as np
+from app.core.metrics import track_stage
+from app.core.inference_client import RemoteSentenceModel
+from app.core.stub_models import StubSentenceModel
+from app.core.projection import load_active_projection
+from app.config import settings
 import time
 import logging
 
@@ -14,6 +19,14 @@ class EmbeddingGenerator:
     def get_sentence_transformer(self):
         """Lazy load sentence transformer"""
         if self._sentence_transformer is None:
+            if settings.MODEL_BACKEND == "stub":
+                self._sentence_transformer = StubSentenceModel(settings.EMBEDDING_DIMENSION)
+                logger.info("Using stub sentence model for embeddings")
+                return self._sentence_transformer
+            if settings.INFERENCE_SERVER_SOCKET:
+                self._sentence_transformer = RemoteSentenceModel()
+                logger.info(f"✅ Using inference server at {settings.INFERENCE_SERVER_SOCKET} for embeddings")
+                return self._sentence_transformer
             try:
                 logger.info(f"Loading sentence transformer model: {self._model_name}")
                 self._sentence_transformer = SentenceTransformer(self._model_name)
@@ -23,8 +36,8 @@ class EmbeddingGenerator:
                 raise
         return self._sentence_transformer
 
-    def generate_sentence_transformer_embeddings(self, texts: List[str]) -> Tuple[List[List[float]], Dict]:
-        """Generate embeddings using sentence transformers with metrics"""
+    def generate_sentence_transformer_embeddings(self, texts: List[str], batch_size: int = 32, project: bool = True) -> Tuple[List[List[float]], Dict]:
+        """Generate embeddings using sentence transformers with metrics; project=False skips the PCA stage"""
         if not texts:
             return [], {"error": "No texts provided"}
             
@@ -35,16 +48,23 @@ class EmbeddingGenerator:
             embeddings = model.encode(
                 texts, 
                 show_progress_bar=len(texts) > 10,
-                batch_size=32,
+                batch_size=batch_size,
                 normalize_embeddings=True
             )
+
+            # Same projection for documents and queries, so they stay comparable
+            projection = load_active_projection() if project else None
+            if projection is not None and len(embeddings) > 0:
+                embeddings = projection.transform(embeddings)
             
             processing_time = time.time() - start_time
             
             metrics = {
                 "model": self._model_name,
                 "total_texts": len(texts),
+                "batch_size": batch_size,
                 "embedding_dimension": embeddings.shape[1] if len(embeddings) > 0 else 0,
+                "projection": projection.version if projection is not None else None,
                 "processing_time": processing_time,
                 "avg_text_length": sum(len(text) for text in texts) / len(texts) if texts else 0,
                 "status": "success"
@@ -56,10 +76,13 @@ class EmbeddingGenerator:
             logger.error(f"❌ Embedding generation failed: {e}")
             return [], {"error": str(e), "status": "failed"}
 
-    def generate_embeddings(self, texts: List[str], model: str = "sentence-transformer") -> Tuple[List[List[float]], Dict]:
+    def generate_embeddings(self, texts: List[str], model: str = "sentence-transformer", batch_size: int = 32, project: bool = True) -> Tuple[List[List[float]], Dict]:
         """Main embedding generation method with metrics"""
         if model == "sentence-transformer":
-            return self.generate_sentence_transformer_embeddings(texts)
+            with track_stage("embedding", self._model_name) as stage:
+                embeddings, metrics = self.generate_sentence_transformer_embeddings(texts, batch_size=batch_size, project=project)
+                stage.status = metrics.get("status", "success")
+            return embeddings, metrics
         else:
             raise ValueError(f"Unknown embedding model: {model}")
 
@@ -0,0 +1,159 @@
+from typing import Callable, Dict, Optional, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime
+from sqlalchemy import text
+from app.config import settings
+from app.core.circuit_breaker import CLOSED, CircuitBreaker, vector_db_breaker, redis_breaker, smtp_breaker
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Statuses that leave the service fully functional
+HEALTHY_STATUSES = {"connected", "fallback", "idle"}
+
+class DependencyMonitor:
+    """Background thread polling dependencies and caching their status for /health.
+
+    Each check runs on its own worker with HEALTH_CHECK_TIMEOUT, so a hanging
+    dependency never delays the others or a /health request. Active checks
+    registered with a breaker feed it: a failing probe counts towards opening it,
+    and a passing probe closes it, so recovery is picked up without user traffic.
+    Passive checks only report what the breaker already knows.
+    """
+
+    def __init__(self, interval: float = settings.HEALTH_CHECK_INTERVAL, timeout: float = settings.HEALTH_CHECK_TIMEOUT):
+        self.interval = interval
+        self.timeout = timeout
+        self._checks: Dict[str, Callable[[], str]] = {}
+        self._breakers: Dict[str, Optional[CircuitBreaker]] = {}
+        self._passive: set = set()
+        self._pending: Dict[str, Tuple[Future, float]] = {}  # in-flight check and its start time
+        self._status: Dict[str, Dict] = {}
+        self._checked_at: Optional[str] = None
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="health-check")
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, name: str, check: Callable[[], str], breaker: Optional[CircuitBreaker] = None, passive: bool = False):
+        """check returns a status string and raises when the dependency is unreachable"""
+        self._checks[name] = check
+        self._breakers[name] = breaker
+        if passive:
+            self._passive.add(name)
+
+    def check_all(self) -> Dict[str, Dict]:
+        """Run every check once, feed the breakers and replace the cached status"""
+        for name, check in self._checks.items():
+            pending = self._pending.get(name)
+            # A check still stuck from an earlier round is not started twice
+            if pending is None or pending[0].done():
+                self._pending[name] = (self._executor.submit(check), time.perf_counter())
+
+        deadline = time.monotonic() + self.timeout
+        status = {}
+        for name, (future, started) in self._pending.items():
+            error = None
+            try:
+                result = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                result, error = "disconnected", f"no response within {self.timeout}s"
+            except Exception as e:
+                result, error = "disconnected", str(e)
+
+            breaker = self._breakers.get(name)
+            if breaker is not None and name not in self._passive:
+                if result == "disconnected":
+                    breaker.record_failure()
+                elif breaker.state != CLOSED or breaker.failures:
+                    breaker.record_success()
+
+            previous = self._status.get(name, {}).get("status")
+            if result != previous:
+                if result in HEALTHY_STATUSES:
+                    logger.info(f"✅ {name} is {result}")
+                else:
+                    logger.warning(f"❌ {name} is {result}: {error}")
+
+            status[name] = {
+                "status": result,
+                "latency": time.perf_counter() - started,
+                "error": error,
+                "breaker": breaker.state if breaker is not None else None
+            }
+
+        self._status = status
+        self._checked_at = datetime.utcnow().isoformat() + "Z"
+        return status
+
+    def health(self) -> Dict:
+        """The cached /health payload; no dependency is contacted"""
+        status = self._status
+        breakers = {name: entry["breaker"] for name, entry in status.items() if entry["breaker"] is not None}
+        degraded = any(entry["status"] not in HEALTHY_STATUSES for entry in status.values())
+        degraded = degraded or any(state != CLOSED for state in breakers.values())
+        return {
+            "status": "degraded" if degraded else "healthy",
+            **{name: entry["status"] for name, entry in status.items()},
+            "breakers": breakers,
+            "checked_at": self._checked_at
+        }
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="dependency-monitor", daemon=True)
+        self._thread.start()
+        logger.info(f"Dependency monitor started, polling every {self.interval}s")
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check_all()
+            except Exception as e:
+                logger.error(f"Dependency check round failed: {e}")
+
+def check_database() -> str:
+    from app.db.metadata_db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        db.execute(text("SELECT 1"))
+        return "connected"
+    finally:
+        db.close()
+
+def check_redis() -> str:
+    from app.db.redis_memory import memory_store
+
+    if memory_store.redis_client is None:
+        return "fallback"
+    memory_store.redis_client.ping()
+    return "connected"
+
+def check_vector_db() -> str:
+    from app.core.vector_store import vector_store
+
+    return "connected" if vector_store.test_connection() else "disconnected"
+
+def check_smtp() -> str:
+    """Passive: SMTP is only contacted by the outbox sender, so report what it last saw"""
+    from app.utils.email_utils import email_outbox_sender
+
+    if smtp_breaker.state != CLOSED:
+        return "disconnected"
+    return "connected" if email_outbox_sender.connection.connected else "idle"
+
+# Global instance
+dependency_monitor = DependencyMonitor()
+dependency_monitor.register("database", check_database)
+dependency_monitor.register("redis", check_redis, redis_breaker)
+dependency_monitor.register("vector_db", check_vector_db, vector_db_breaker)
+dependency_monitor.register("smtp", check_smtp, smtp_breaker, passive=True)
@@ -0,0 +1,144 @@
+from typing import Callable, List, Dict, Optional
+from app.db.redis_memory import memory_store, RedisMemoryStore
+from app.core.metrics import track_stage
+from app.core.stub_models import StubTokenizer
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Each evicted message is cut to at most this many tokens in the summarizing prompt
+SUMMARY_INPUT_TOKENS = 80
+
+SUMMARY_PROMPT = """Update the summary of a conversation with its newest messages.
+Keep names, dates, times, requests and decisions. Write at most a few sentences.
+
+Summary so far:
+{summary}
+
+Newest messages:
+{messages}
+
+Updated summary:"""
+
+ROLE_LABELS = {"user": "User", "assistant": "Assistant"}
+
+class ConversationHistoryManager:
+    """Rolling window of recent turns plus a compact running summary per session.
+
+    Once summary_batch_messages messages have fallen out of the window, the LLM
+    rewrites the summary from its previous version and those messages alone, so
+    a fold costs the same however long the session is and the work per turn is
+    bounded by the window size and the summary budget. Tokens are counted with
+    the LLM's own tokenizer; both are registered with use_llm and loaded on
+    first use. Without an LLM, evicted messages are dropped.
+    """
+
+    def __init__(
+        self,
+        store: RedisMemoryStore,
+        window_messages: int = settings.HISTORY_WINDOW_MESSAGES,
+        max_tokens: int = settings.HISTORY_MAX_TOKENS,
+        summary_max_tokens: int = settings.HISTORY_SUMMARY_MAX_TOKENS,
+        summary_batch_messages: int = settings.HISTORY_SUMMARY_BATCH_MESSAGES
+    ):
+        self.store = store
+        self.window_messages = window_messages
+        self.max_tokens = max_tokens
+        self.summary_max_tokens = min(summary_max_tokens, max_tokens)
+        self.summary_batch_messages = max(1, summary_batch_messages)
+        self._llm_loader: Optional[Callable] = None
+        self._tokenizer_loader: Optional[Callable] = None
+        self._word_tokenizer = StubTokenizer()
+
+    def use_llm(self, llm_loader: Callable, tokenizer_loader: Callable):
+        """Summarize with the pipeline returned by llm_loader and count tokens with tokenizer_loader's"""
+        self._llm_loader = llm_loader
+        self._tokenizer_loader = tokenizer_loader
+
+    @property
+    def tokenizer(self):
+        # Without an LLM, words are a close enough budget
+        return self._tokenizer_loader() if self._tokenizer_loader is not None else self._word_tokenizer
+
+    def _count_tokens(self, text: str) -> int:
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
+
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        """Cut text down to at most max_tokens tokens"""
+        tokens = self.tokenizer.encode(text, add_special_tokens=False)
+        if len(tokens) <= max_tokens:
+            return text
+        return self.tokenizer.decode(tokens[:max_tokens], skip_special_tokens=True).rstrip() + "..."
+
+    def _format_message(self, message: Dict) -> str:
+        role = ROLE_LABELS.get(message.get("role"), str(message.get("role", "")).title())
+        return f"{role}: {message.get('content', '')}"
+
+    def _fold_into_summary(self, summary: str, evicted: List[Dict]) -> str:
+        """Have the LLM rewrite the summary to cover the evicted messages"""
+        messages = "\n".join(self._truncate(self._format_message(message), SUMMARY_INPUT_TOKENS) for message in evicted)
+        prompt = SUMMARY_PROMPT.format(summary=summary or "Nothing yet.", messages=messages)
+        llm = self._llm_loader()
+        with track_stage("history_summary", "llm"):
+            updated = llm(prompt, max_length=self.summary_max_tokens, do_sample=False)[0]["generated_text"]
+        return self._truncate(updated.strip(), self.summary_max_tokens)
+
+    def add_message(self, session_id: str, message: Dict):
+        """Add a message, folding a full batch of messages that left the window into the summary"""
+        try:
+            conversation = self.store.get_conversation(session_id)
+            conversation.append(message)
+
+            overflow = len(conversation) - self.window_messages
+            if overflow >= self.summary_batch_messages:
+                evicted = conversation[:overflow]
+                conversation = conversation[overflow:]
+                if self._llm_loader is not None:
+                    try:
+                        summary = self._fold_into_summary(self.store.get_summary(session_id), evicted)
+                        self.store.store_summary(session_id, summary)
+                    except Exception as e:
+                        logger.error(f"❌ Failed to update the conversation summary, {len(evicted)} messages dropped: {e}")
+
+            self.store.store_conversation(session_id, conversation)
+        except Exception as e:
+            logger.error(f" Failed to add message to history: {e}")
+
+    def get_prompt_history(self, session_id: str, max_tokens: Optional[int] = None) -> str:
+        """Render summary and most recent turns within the prompt token budget"""
+        budget = max_tokens if max_tokens is not None else self.max_tokens
+        summary = self.store.get_summary(session_id)
+        conversation = self.store.get_conversation(session_id)[-self.window_messages:]
+
+        sections = []
+        if summary:
+            summary = self._truncate(summary, min(self.summary_max_tokens, budget))
+            budget -= self._count_tokens(summary)
+            sections.append(f"Earlier in the conversation:\n{summary}")
+
+        recent = []
+        for message in reversed(conversation):
+            if budget <= 0:
+                break
+            line = self._format_message(message)
+            tokens = self._count_tokens(line)
+            if tokens > budget:
+                # Only the newest turns are worth truncating; older ones are dropped
+                if not recent:
+                    recent.append(self._truncate(line, budget))
+                break
+            recent.append(line)
+            budget -= tokens
+
+        if recent:
+            sections.append("Recent messages:\n" + "\n".join(reversed(recent)))
+
+        return "\n\n".join(sections)
+
+    def clear(self, session_id: str):
+        """Clear both the recent window and the summary"""
+        self.store.clear_conversation(session_id)
+
+# Global instance
+history_manager = ConversationHistoryManager(memory_store)
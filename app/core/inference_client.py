@@ -0,0 +1,132 @@
+from typing import List, Dict, Union
+from app.config import settings
+import numpy as np
+import json
+import socket
+import struct
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Frames: request = op, payload length, payload; response = status, payload length, payload
+FRAME_HEADER = struct.Struct("<BI")
+OP_EMBED = 1
+OP_GENERATE = 2
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+# Embedding response payload: rows, dimension, then float32 row-major values
+EMBEDDING_HEADER = struct.Struct("<II")
+
+MAX_FRAME_SIZE = 256 * 1024 * 1024
+
+class InferenceServerError(Exception):
+    """The inference server failed to run a request"""
+
+def recv_exact(sock: socket.socket, size: int) -> bytearray:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:])
+        if n == 0:
+            raise ConnectionError("Inference server closed the connection")
+        received += n
+    return buffer
+
+class InferenceClient:
+    """Blocking client for the inference server, one connection per thread"""
+
+    def __init__(self, socket_path: str = settings.INFERENCE_SERVER_SOCKET, timeout: float = settings.INFERENCE_SERVER_TIMEOUT):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self._local.sock = sock
+        return sock
+
+    def close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def _roundtrip(self, op: int, payload: bytes) -> bytearray:
+        sock = getattr(self._local, "sock", None) or self._connect()
+        sock.sendall(FRAME_HEADER.pack(op, len(payload)) + payload)
+        status, length = FRAME_HEADER.unpack(recv_exact(sock, FRAME_HEADER.size))
+        if length > MAX_FRAME_SIZE:
+            raise ConnectionError(f"Oversized inference response: {length} bytes")
+        body = recv_exact(sock, length)
+        if status != STATUS_OK:
+            raise InferenceServerError(body.decode("utf-8", errors="replace"))
+        return body
+
+    def request(self, op: int, payload: bytes) -> bytearray:
+        """Send one request, reconnecting once if the server restarted; requests are idempotent"""
+        try:
+            return self._roundtrip(op, payload)
+        except socket.timeout:
+            # The response may still arrive later and would desync the stream
+            self.close()
+            raise
+        except ConnectionError as e:
+            logger.warning(f"Inference server connection lost, reconnecting: {e}")
+            self.close()
+            try:
+                return self._roundtrip(op, payload)
+            except Exception:
+                self.close()
+                raise
+
+    def embed(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        payload = json.dumps({"texts": texts, "batch_size": batch_size}).encode("utf-8")
+        body = self.request(OP_EMBED, payload)
+        rows, dimension = EMBEDDING_HEADER.unpack_from(body)
+        # Zero-copy view over the received buffer
+        return np.frombuffer(body, dtype=np.float32, offset=EMBEDDING_HEADER.size).reshape(rows, dimension)
+
+    def generate(self, prompt: str, max_length: int = 256, **kwargs) -> str:
+        payload = json.dumps({"prompt": prompt, "max_length": max_length, "kwargs": kwargs}).encode("utf-8")
+        return json.loads(self.request(OP_GENERATE, payload))["generated_text"]
+
+class RemoteSentenceModel:
+    """SentenceTransformer-compatible encoder backed by the inference server"""
+
+    def __init__(self, client: "InferenceClient" = None):
+        self.client = client or inference_client
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        show_progress_bar: bool = False,
+        normalize_embeddings: bool = False,
+        **kwargs
+    ) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        embeddings = self.client.embed(texts, batch_size=batch_size)
+        if normalize_embeddings and len(texts):
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.where(norms == 0, 1.0, norms)
+
+        return embeddings[0] if single else embeddings
+
+class RemoteText2TextPipeline:
+    """text2text-generation pipeline stand-in backed by the inference server"""
+
+    def __init__(self, client: "InferenceClient" = None):
+        self.client = client or inference_client
+
+    def __call__(self, prompt: str, max_length: int = 256, **kwargs) -> List[Dict]:
+        return [{"generated_text": self.client.generate(prompt, max_length=max_length, **kwargs)}]
+
+# Global instance
+inference_client = InferenceClient()
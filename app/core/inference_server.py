@@ -0,0 +1,223 @@
+# app/core/inference_server.py
+"""Shared inference server: hosts the embedding and generation models once per node.
+
+API workers started with INFERENCE_SERVER_SOCKET set send their embedding and
+generation calls here over a unix socket instead of loading their own copies of
+the models. Requests from all workers are coalesced into batches, and embeddings
+travel back as raw float32 buffers.
+
+    python -m app.core.inference_server --socket /run/rag/inference.sock
+"""
+
+from typing import Callable, Dict, List
+from concurrent.futures import ThreadPoolExecutor
+from app.config import settings
+from app.core.inference_client import (
+    FRAME_HEADER,
+    EMBEDDING_HEADER,
+    MAX_FRAME_SIZE,
+    OP_EMBED,
+    OP_GENERATE,
+    STATUS_OK,
+    STATUS_ERROR
+)
+import numpy as np
+import argparse
+import asyncio
+import json
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+LLM_MODEL_NAME = "google/flan-t5-base"
+
+class Batcher:
+    """Coalesces queued requests into one model call.
+
+    Waits up to ``max_wait`` after the first request for more to arrive, or until
+    ``max_batch`` items are collected, then runs ``run_batch`` on its own thread
+    so the event loop keeps accepting requests while the model is busy.
+    """
+
+    def __init__(self, name: str, run_batch: Callable[[List], List], max_batch: int, max_wait: float):
+        self.name = name
+        self.run_batch = run_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"inference-{name}")
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    async def submit(self, request, size: int = 1):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((request, size, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            size = batch[0][1]
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch:
+                timeout = deadline - loop.time()
+                try:
+                    item = self.queue.get_nowait() if timeout <= 0 else await asyncio.wait_for(self.queue.get(), timeout)
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+                batch.append(item)
+                size += item[1]
+
+            start_time = time.time()
+            try:
+                results = await loop.run_in_executor(self.executor, self.run_batch, [request for request, _, _ in batch])
+                for (_, _, future), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+            except Exception as e:
+                logger.error(f"❌ {self.name} batch failed: {e}")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            logger.debug(f"{self.name} batch: {len(batch)} requests, {size} items in {time.time() - start_time:.3f}s")
+
+class InferenceServer:
+    def __init__(
+        self,
+        sentence_model,
+        llm,
+        max_batch: int = settings.INFERENCE_MAX_BATCH,
+        max_wait: float = settings.INFERENCE_BATCH_WAIT
+    ):
+        self.sentence_model = sentence_model
+        self.llm = llm
+        self.embedder = Batcher("embedding", self._embed_batch, max_batch, max_wait)
+        self.generator = Batcher("generation", self._generate_batch, max_batch, max_wait)
+
+    def _embed_batch(self, requests: List[Dict]) -> List[np.ndarray]:
+        texts = [text for request in requests for text in request["texts"]]
+        batch_size = max(request.get("batch_size", 32) for request in requests)
+        # Unnormalized; clients normalize when they ask for it
+        embeddings = np.asarray(
+            self.sentence_model.encode(texts, batch_size=batch_size, show_progress_bar=False),
+            dtype=np.float32
+        )
+
+        results, offset = [], 0
+        for request in requests:
+            count = len(request["texts"])
+            results.append(embeddings[offset:offset + count])
+            offset += count
+        return results
+
+    def _generate_batch(self, requests: List[Dict]) -> List[str]:
+        # Requests can only share a pipeline call when their generation options match
+        groups: Dict[str, List[int]] = {}
+        for i, request in enumerate(requests):
+            key = json.dumps([request.get("max_length", 256), request.get("kwargs", {})], sort_keys=True)
+            groups.setdefault(key, []).append(i)
+
+        results: List[str] = [""] * len(requests)
+        for indices in groups.values():
+            first = requests[indices[0]]
+            outputs = self.llm(
+                [requests[i]["prompt"] for i in indices],
+                max_length=first.get("max_length", 256),
+                **first.get("kwargs", {})
+            )
+            for i, output in zip(indices, outputs):
+                # Pipelines return either a dict or a one-element list per prompt
+                results[i] = (output[0] if isinstance(output, list) else output)["generated_text"]
+        return results
+
+    async def _handle(self, op: int, payload: bytes) -> bytes:
+        request = json.loads(payload)
+        if op == OP_EMBED:
+            texts = request["texts"]
+            if not texts:
+                dimension = getattr(self.sentence_model, "get_sentence_embedding_dimension", lambda: settings.EMBEDDING_DIMENSION)()
+                return EMBEDDING_HEADER.pack(0, dimension)
+            embeddings = await self.embedder.submit(request, size=len(texts))
+            return EMBEDDING_HEADER.pack(*embeddings.shape) + np.ascontiguousarray(embeddings).tobytes()
+        elif op == OP_GENERATE:
+            text = await self.generator.submit(request)
+            return json.dumps({"generated_text": text}).encode("utf-8")
+        raise ValueError(f"Unknown inference op: {op}")
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(FRAME_HEADER.size)
+                except asyncio.IncompleteReadError:
+                    break
+                op, length = FRAME_HEADER.unpack(header)
+                if length > MAX_FRAME_SIZE:
+                    logger.error(f"❌ Oversized inference request: {length} bytes")
+                    break
+                payload = await reader.readexactly(length)
+
+                try:
+                    body, status = await self._handle(op, payload), STATUS_OK
+                except Exception as e:
+                    body, status = str(e).encode("utf-8"), STATUS_ERROR
+                writer.write(FRAME_HEADER.pack(status, len(body)))
+                writer.write(body)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, socket_path: str):
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = await asyncio.start_unix_server(self.handle_connection, path=socket_path)
+        os.chmod(socket_path, 0o660)
+        tasks = [asyncio.create_task(self.embedder.run()), asyncio.create_task(self.generator.run())]
+        logger.info(f"✅ Inference server listening on {socket_path}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in tasks:
+                task.cancel()
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+
+def load_models(stub: bool = False):
+    if stub:
+        from app.core.stub_models import StubSentenceModel, StubText2TextPipeline
+        return StubSentenceModel(settings.EMBEDDING_DIMENSION), StubText2TextPipeline()
+
+    from sentence_transformers import SentenceTransformer
+    from transformers import pipeline
+
+    logger.info(f"Loading sentence transformer model: {EMBEDDING_MODEL_NAME}")
+    sentence_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    logger.info(f"Loading generation model: {LLM_MODEL_NAME}")
+    llm = pipeline("text2text-generation", model=LLM_MODEL_NAME)
+    logger.info("✅ Inference models loaded")
+    return sentence_model, llm
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared embedding and generation server for API workers")
+    parser.add_argument("--socket", default=settings.INFERENCE_SERVER_SOCKET or "/tmp/rag-inference.sock")
+    parser.add_argument("--max-batch", type=int, default=settings.INFERENCE_MAX_BATCH)
+    parser.add_argument("--batch-wait", type=float, default=settings.INFERENCE_BATCH_WAIT,
+                        help="seconds to wait for more requests before running a batch")
+    parser.add_argument("--stub-models", action="store_true", help="serve deterministic stub models (no downloads)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    sentence_model, llm = load_models(args.stub_models or settings.MODEL_BACKEND == "stub")
+    server = InferenceServer(sentence_model, llm, max_batch=args.max_batch, max_wait=args.batch_wait)
+    try:
+        asyncio.run(server.serve(args.socket))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,538 @@
+from typing import List, Dict, Tuple, Optional
+from contextlib import contextmanager
+from app.config import settings
+from app.core.metrics import track_stage
+from app.core.similarity import batch_top_k, merge_top_k
+from app.core.retrieval import ChunkBuffer, ScoredChunk
+import numpy as np
+import fcntl
+import json
+import os
+import shutil
+import struct
+import threading
+import time
+import uuid
+import zlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "MANIFEST.json"
+LOCK_FILE = "LOCK"
+WAL_PREFIX = "wal-"
+SNAPSHOT_PREFIX = "snapshot-"
+
+# WAL record: crc32, lsn, op, payload length, then the payload
+RECORD_HEADER = struct.Struct("<IQBI")
+UPSERT_HEADER = struct.Struct("<II")  # json length, row count
+OP_UPSERT = 1
+OP_DELETE_DOCUMENT = 2
+OP_DELETE_IDS = 3
+
+# Rows copied per step when writing a snapshot from the mmapped base
+COPY_BLOCK_ROWS = 65536
+
+def _fsync_dir(path: str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _load_array(path: str, rows: int) -> np.ndarray:
+    """mmap an .npy file; empty arrays cannot be mapped so they are read normally"""
+    return np.load(path, mmap_mode="r") if rows else np.load(path)
+
+class LocalVectorStore:
+    """Durable on-disk vector index with the same interface as VectorStore.
+
+    Layout of LOCAL_INDEX_DIR:
+
+    - ``wal-<first lsn>.log``: append-only log of upserts and deletes (by document or ids).
+      Every record carries a CRC so a torn tail from a crash is detected and cut.
+    - ``snapshot-<lsn>/``: a compacted, memory-mappable copy of all live rows up
+      to that LSN: ``vectors.npy`` (float32), ``norms.npy``, ``ids.npy``,
+      ``doc_ids.npy``, ``meta.bin`` (JSON per row) and ``meta_offsets.npy``.
+    - ``MANIFEST.json``: names the current snapshot and the LSN it covers.
+
+    Startup maps the snapshot and replays only WAL records newer than it.
+    Compaction runs in a background thread once the log or the share of deleted
+    rows grows past a threshold, writes a new snapshot without deleted rows and
+    drops the log segments it covers.
+
+    Several processes (uvicorn workers) can open the same directory: appends and
+    compaction hold an exclusive flock, and every process tails the log and
+    follows manifest changes before serving a query.
+    """
+
+    def __init__(
+        self,
+        directory: str = settings.LOCAL_INDEX_DIR,
+        dimension: int = settings.EMBEDDING_DIMENSION,
+        compact_wal_records: int = settings.LOCAL_INDEX_COMPACT_WAL_RECORDS,
+        compact_deleted_ratio: float = settings.LOCAL_INDEX_COMPACT_DELETED_RATIO,
+        fsync: bool = settings.LOCAL_INDEX_FSYNC,
+        background_compaction: bool = True
+    ):
+        self.directory = directory
+        self.dimension = dimension
+        self.compact_wal_records = compact_wal_records
+        self.compact_deleted_ratio = compact_deleted_ratio
+        self.fsync = fsync
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._manifest_mtime = None
+
+        os.makedirs(directory, exist_ok=True)
+        self._lock_fd = os.open(os.path.join(directory, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+
+        with self._exclusive():
+            if not os.path.exists(os.path.join(directory, MANIFEST)):
+                self._write_manifest({"snapshot": None, "lsn": 0, "rows": 0, "dimension": dimension})
+            if not self._segments():
+                open(self._segment_file(1), "ab").close()
+            start_time = time.time()
+            self._load()
+            if self.dimension != dimension:
+                raise ValueError(
+                    f"Index at {directory} holds {self.dimension}-dim vectors, expected {dimension}; "
+                    f"re-index after changing EMBEDDING_PROJECTION"
+                )
+            logger.info(
+                f"✅ Local vector index opened: {len(self)} rows, "
+                f"snapshot lsn {self.snapshot_lsn}, wal lsn {self.lsn} in {time.time() - start_time:.2f}s"
+            )
+
+        self._compact_event = threading.Event()
+        self._compactor = None
+        if background_compaction:
+            self._compactor = threading.Thread(target=self._compaction_loop, name="local-index-compactor", daemon=True)
+            self._compactor.start()
+
+    # ----- files -----
+
+    @contextmanager
+    def _exclusive(self):
+        """Serialize writers across threads and processes"""
+        with self._lock:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _segment_file(self, first_lsn: int) -> str:
+        return os.path.join(self.directory, f"{WAL_PREFIX}{first_lsn:016d}.log")
+
+    def _segments(self) -> List[str]:
+        return sorted(
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if name.startswith(WAL_PREFIX) and name.endswith(".log")
+        )
+
+    def _read_manifest(self) -> Dict:
+        with open(os.path.join(self.directory, MANIFEST)) as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest: Dict):
+        path = os.path.join(self.directory, MANIFEST)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        _fsync_dir(self.directory)
+
+    # ----- loading and replay -----
+
+    def _load(self):
+        """Map the manifest's snapshot and replay the log after it"""
+        # Stat first: a manifest replaced after the stat only makes the next catch-up reload
+        self._manifest_mtime = os.stat(os.path.join(self.directory, MANIFEST)).st_mtime_ns
+        manifest = self._read_manifest()
+        self.snapshot_name = manifest["snapshot"]
+        self.snapshot_lsn = manifest["lsn"]
+        self.dimension = manifest.get("dimension", self.dimension)
+        rows = manifest["rows"]
+
+        if self.snapshot_name:
+            path = os.path.join(self.directory, self.snapshot_name)
+            self._base_vectors = _load_array(os.path.join(path, "vectors.npy"), rows)
+            self._base_norms = _load_array(os.path.join(path, "norms.npy"), rows)
+            self._base_ids = _load_array(os.path.join(path, "ids.npy"), rows)
+            self._base_doc_ids = _load_array(os.path.join(path, "doc_ids.npy"), rows)
+            self._base_meta_offsets = _load_array(os.path.join(path, "meta_offsets.npy"), rows)
+            self._base_meta = (
+                np.memmap(os.path.join(path, "meta.bin"), dtype=np.uint8, mode="r")
+                if self._base_meta_offsets[-1] else np.empty(0, dtype=np.uint8)
+            )
+        else:
+            self._base_vectors = np.empty((0, self.dimension), dtype=np.float32)
+            self._base_norms = np.empty(0, dtype=np.float32)
+            self._base_ids = np.empty(0, dtype="S1")
+            self._base_doc_ids = np.empty(0, dtype="S1")
+            self._base_meta_offsets = np.zeros(1, dtype=np.int64)
+            self._base_meta = np.empty(0, dtype=np.uint8)
+        self._base_deleted = np.zeros(rows, dtype=bool)
+
+        self._tail_vectors: List[np.ndarray] = []
+        self._tail_norms: List[np.ndarray] = []
+        self._tail_matrix: Optional[np.ndarray] = None
+        self._tail_norm_array: Optional[np.ndarray] = None
+        self._tail_ids: List[str] = []
+        self._tail_doc_ids: List[str] = []
+        self._tail_records: List[Tuple[str, Dict]] = []
+        self._tail_deleted: List[bool] = []
+        self._deleted_count = 0
+
+        self.lsn = self.snapshot_lsn
+        self._segment_path = None
+        self._segment_offset = 0
+        self._replay()
+
+    def _replay(self) -> bool:
+        """Apply complete log records newer than self.lsn; returns whether the tail is clean"""
+        clean = True
+        for segment in self._segments():
+            if self._segment_path is not None and segment < self._segment_path:
+                continue
+            if segment != self._segment_path:
+                self._segment_path = segment
+                self._segment_offset = 0
+
+            try:
+                with open(segment, "rb") as f:
+                    f.seek(self._segment_offset)
+                    while True:
+                        header = f.read(RECORD_HEADER.size)
+                        if not header:
+                            break
+                        if len(header) < RECORD_HEADER.size:
+                            clean = False
+                            break
+                        crc, lsn, op, length = RECORD_HEADER.unpack(header)
+                        payload = f.read(length)
+                        if len(payload) < length or zlib.crc32(header[4:] + payload) != crc:
+                            clean = False
+                            break
+                        if lsn > self.lsn:
+                            self._apply(op, payload)
+                            self.lsn = lsn
+                        self._segment_offset = f.tell()
+            except FileNotFoundError:
+                # Segment dropped by a concurrent compaction; the manifest check reloads
+                return True
+        return clean
+
+    def _catch_up(self):
+        """Follow other processes' appends and compactions"""
+        mtime = os.stat(os.path.join(self.directory, MANIFEST)).st_mtime_ns
+        if mtime != self._manifest_mtime and self._read_manifest()["snapshot"] != self.snapshot_name:
+            self._load()
+        else:
+            self._manifest_mtime = mtime
+            self._replay()
+
+    def _apply(self, op: int, payload: bytes):
+        if op == OP_UPSERT:
+            json_length, rows = UPSERT_HEADER.unpack_from(payload)
+            header = json.loads(payload[UPSERT_HEADER.size:UPSERT_HEADER.size + json_length])
+            vectors = np.frombuffer(
+                payload, dtype=np.float32, offset=UPSERT_HEADER.size + json_length
+            ).reshape(rows, self.dimension)
+            self._tail_vectors.append(vectors)
+            self._tail_norms.append(np.linalg.norm(vectors, axis=1))
+            self._tail_matrix = None
+            self._tail_ids.extend(header["ids"])
+            self._tail_records.extend(zip(header["texts"], header["metadata"]))
+            self._tail_doc_ids.extend(str(meta.get("document_id", "")) for meta in header["metadata"])
+            self._tail_deleted.extend([False] * rows)
+        elif op == OP_DELETE_DOCUMENT:
+            document_id = json.loads(payload)["document_id"]
+            if len(self._base_doc_ids):
+                hits = (self._base_doc_ids == document_id.encode("utf-8")) & ~self._base_deleted
+                self._deleted_count += int(hits.sum())
+                self._base_deleted = self._base_deleted | hits
+            for i, doc_id in enumerate(self._tail_doc_ids):
+                if doc_id == document_id and not self._tail_deleted[i]:
+                    self._tail_deleted[i] = True
+                    self._deleted_count += 1
+        elif op == OP_DELETE_IDS:
+            vector_ids = json.loads(payload)["ids"]
+            if len(self._base_ids):
+                hits = np.isin(self._base_ids, np.array([v.encode("utf-8") for v in vector_ids], dtype="S")) & ~self._base_deleted
+                self._deleted_count += int(hits.sum())
+                self._base_deleted = self._base_deleted | hits
+            wanted = set(vector_ids)
+            for i, vector_id in enumerate(self._tail_ids):
+                if vector_id in wanted and not self._tail_deleted[i]:
+                    self._tail_deleted[i] = True
+                    self._deleted_count += 1
+        else:
+            raise ValueError(f"Unknown WAL op: {op}")
+
+    def _append(self, op: int, payload: bytes):
+        """Durably log a record and apply it; caller holds the exclusive lock"""
+        if not self._replay():
+            # Torn record left by a crashed writer: we hold the lock, so cut it off
+            with open(self._segment_path, "r+b") as f:
+                f.truncate(self._segment_offset)
+            logger.warning(f"Truncated torn WAL tail in {self._segment_path} at {self._segment_offset}")
+
+        lsn = self.lsn + 1
+        header_fields = RECORD_HEADER.pack(0, lsn, op, len(payload))[4:]
+        record = struct.pack("<I", zlib.crc32(header_fields + payload)) + header_fields + payload
+        with open(self._segment_path, "ab") as f:
+            f.write(record)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+
+        self._apply(op, payload)
+        self.lsn = lsn
+        self._segment_offset += len(record)
+
+    # ----- public interface -----
+
+    def __len__(self):
+        return len(self._base_ids) + len(self._tail_ids) - self._deleted_count
+
+    def test_connection(self):
+        return True
+
+    def store_embeddings(self, embeddings: List[List[float]], texts: List[str], metadata: List[Dict]) -> List[str]:
+        vector_ids = [str(uuid.uuid4()) for _ in embeddings]
+        if not vector_ids:
+            return []
+
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32).reshape(len(vector_ids), self.dimension)
+        header = json.dumps({"ids": vector_ids, "texts": list(texts), "metadata": [dict(m) for m in metadata]}).encode("utf-8")
+        payload = UPSERT_HEADER.pack(len(header), len(vector_ids)) + header + vectors.tobytes()
+
+        with track_stage("vector_upsert", "local"):
+            with self._exclusive():
+                self._append(OP_UPSERT, payload)
+        self._maybe_schedule_compaction()
+        return vector_ids
+
+    def delete_by_document(self, document_id: str):
+        with self._exclusive():
+            self._append(OP_DELETE_DOCUMENT, json.dumps({"document_id": document_id}).encode("utf-8"))
+        self._maybe_schedule_compaction()
+
+    def delete_vectors(self, vector_ids: List[str]):
+        if not vector_ids:
+            return
+        with self._exclusive():
+            self._append(OP_DELETE_IDS, json.dumps({"ids": list(vector_ids)}).encode("utf-8"))
+        self._maybe_schedule_compaction()
+
+    def _tail(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._tail_matrix is None:
+            if self._tail_vectors:
+                self._tail_matrix = np.vstack(self._tail_vectors)
+                self._tail_norm_array = np.concatenate(self._tail_norms)
+            else:
+                self._tail_matrix = np.empty((0, self.dimension), dtype=np.float32)
+                self._tail_norm_array = np.empty(0, dtype=np.float32)
+            self._tail_vectors = [self._tail_matrix]
+            self._tail_norms = [self._tail_norm_array]
+        return self._tail_matrix, self._tail_norm_array
+
+    def _search(self, query_embeddings, top_k: int, method: str) -> List[List[ScoredChunk]]:
+        # Capture the current rows under the lock and scan without it: base arrays are
+        # replaced rather than modified, tail lists only grow and deletes copy the masks
+        with self._lock:
+            self._catch_up()
+            tail_matrix, tail_norms = self._tail()
+            base_vectors, base_norms = self._base_vectors, self._base_norms
+            base_ids, base_meta_offsets, base_meta = self._base_ids, self._base_meta_offsets, self._base_meta
+            tail_ids, tail_records = self._tail_ids, self._tail_records
+            tail_deleted = np.asarray(self._tail_deleted[:len(tail_matrix)], dtype=bool) if self._deleted_count else None
+            base_deleted = self._base_deleted if self._deleted_count else None
+        base_rows = len(base_ids)
+
+        # Snapshot and log tail are searched separately so the mmapped base is never copied
+        base_indices, base_scores = batch_top_k(base_vectors, query_embeddings, top_k, method, base_norms, base_deleted)
+        tail_indices, tail_scores = batch_top_k(tail_matrix, query_embeddings, top_k, method, tail_norms, tail_deleted)
+        indices, scores = merge_top_k([(base_indices, base_scores), (tail_indices + base_rows, tail_scores)], top_k)
+
+        # Rows hit by several queries of a batch are decoded once
+        buffer = ChunkBuffer()
+        rows: Dict[int, Tuple[str, int, Dict]] = {}
+        results = []
+        for row_indices, row_scores in zip(indices, scores):
+            hits = []
+            for i, score in zip(row_indices, row_scores):
+                i = int(i)
+                if i not in rows:
+                    if i < base_rows:
+                        start, end = base_meta_offsets[i], base_meta_offsets[i + 1]
+                        record = json.loads(base_meta[start:end].tobytes())
+                        vector_id, text, metadata = base_ids[i].decode("utf-8"), record["text"], record["metadata"]
+                    else:
+                        vector_id = tail_ids[i - base_rows]
+                        text, metadata = tail_records[i - base_rows]
+                    rows[i] = (vector_id, buffer.add(vector_id, text), metadata)
+                vector_id, slot, metadata = rows[i]
+                hits.append(ScoredChunk(vector_id, float(score), slot, metadata, buffer))
+            results.append(hits)
+        return results
+
+    def similarity_search(self, query_embedding: List[float], top_k: int = 5, method: str = "cosine") -> Tuple[List[ScoredChunk], Dict]:
+        start_time = time.time()
+
+        try:
+            with track_stage("vector_search", "local"):
+                results = self._search([query_embedding], top_k, method)[0]
+
+            metrics = {
+                "backend": "local",
+                "method": method,
+                "top_k": top_k,
+                "total_results": len(results),
+                "index_size": len(self),
+                "processing_time": time.time() - start_time,
+                "status": "success"
+            }
+            return results, metrics
+
+        except Exception as e:
+            logger.error(f"❌ Similarity search failed: {e}")
+            return [], {"error": str(e), "status": "failed"}
+
+    def similarity_search_batch(self, query_embeddings: List[List[float]], top_k: int = 5, method: str = "cosine") -> Tuple[List[List[ScoredChunk]], Dict]:
+        start_time = time.time()
+
+        try:
+            with track_stage("vector_search_batch", "local"):
+                results = self._search(query_embeddings, top_k, method)
+
+            metrics = {
+                "backend": "local",
+                "method": method,
+                "top_k": top_k,
+                "total_queries": len(results),
+                "total_results": sum(len(hits) for hits in results),
+                "index_size": len(self),
+                "processing_time": time.time() - start_time,
+                "status": "success"
+            }
+            return results, metrics
+
+        except Exception as e:
+            logger.error(f"❌ Batch similarity search failed: {e}")
+            return [], {"error": str(e), "status": "failed"}
+
+    # ----- compaction -----
+
+    def _needs_compaction(self) -> bool:
+        total = len(self._base_ids) + len(self._tail_ids)
+        return (
+            self.lsn - self.snapshot_lsn >= self.compact_wal_records
+            or (total and self._deleted_count / total >= self.compact_deleted_ratio)
+        )
+
+    def _maybe_schedule_compaction(self):
+        if self._compactor is not None and self._needs_compaction():
+            self._compact_event.set()
+
+    def _compaction_loop(self):
+        while True:
+            self._compact_event.wait()
+            self._compact_event.clear()
+            try:
+                self.compact()
+            except Exception as e:
+                logger.error(f"❌ Local index compaction failed: {e}")
+
+    def compact(self):
+        """Write a snapshot of all live rows and drop the log it covers"""
+        with self._compact_lock:
+            # 1. Capture the state to snapshot and start a new log segment for later writes
+            with self._exclusive():
+                self._catch_up()
+                if self.lsn == self.snapshot_lsn:
+                    return
+                lsn = self.lsn
+                base = (self._base_vectors, self._base_norms, self._base_ids, self._base_doc_ids,
+                        self._base_meta_offsets, self._base_meta, self._base_deleted.copy())
+                tail_matrix, tail_norms = self._tail()
+                tail_rows = len(self._tail_ids)
+                tail = (tail_matrix, tail_norms, list(self._tail_ids), list(self._tail_doc_ids),
+                        list(self._tail_records), np.asarray(self._tail_deleted[:tail_rows], dtype=bool))
+                open(self._segment_file(lsn + 1), "ab").close()
+
+            # 2. Write the snapshot without holding any lock; writers append to the new segment
+            start_time = time.time()
+            name = f"{SNAPSHOT_PREFIX}{lsn:016d}"
+            rows = self._write_snapshot(name, base, tail)
+
+            # 3. Publish it and drop what it replaces
+            with self._exclusive():
+                old_snapshot = self.snapshot_name
+                self._write_manifest({"snapshot": name, "lsn": lsn, "rows": rows, "dimension": self.dimension})
+                for segment in self._segments():
+                    if segment < self._segment_file(lsn + 1):
+                        os.remove(segment)
+                if old_snapshot and old_snapshot != name:
+                    shutil.rmtree(os.path.join(self.directory, old_snapshot), ignore_errors=True)
+                self._load()
+
+            logger.info(f"✅ Local index compacted to {name}: {rows} rows in {time.time() - start_time:.2f}s")
+
+    def _write_snapshot(self, name: str, base: tuple, tail: tuple) -> int:
+        base_vectors, base_norms, base_ids, base_doc_ids, base_offsets, base_meta, base_deleted = base
+        tail_matrix, tail_norms, tail_ids, tail_doc_ids, tail_records, tail_deleted = tail
+
+        base_live = np.flatnonzero(~base_deleted)
+        tail_live = np.flatnonzero(~tail_deleted)
+        rows = len(base_live) + len(tail_live)
+
+        path = os.path.join(self.directory, name)
+        tmp_path = f"{path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        vectors = np.lib.format.open_memmap(
+            os.path.join(tmp_path, "vectors.npy"), mode="w+", dtype=np.float32, shape=(rows, self.dimension)
+        )
+        for start in range(0, len(base_live), COPY_BLOCK_ROWS):
+            block = base_live[start:start + COPY_BLOCK_ROWS]
+            vectors[start:start + len(block)] = base_vectors[block]
+        vectors[len(base_live):] = tail_matrix[tail_live]
+        vectors.flush()
+        del vectors
+
+        np.save(os.path.join(tmp_path, "norms.npy"), np.concatenate([base_norms[base_live], tail_norms[tail_live]]).astype(np.float32))
+        tail_id_array = np.array([tail_ids[i].encode("utf-8") for i in tail_live], dtype="S") if len(tail_live) else np.empty(0, dtype="S1")
+        tail_doc_array = np.array([tail_doc_ids[i].encode("utf-8") for i in tail_live], dtype="S") if len(tail_live) else np.empty(0, dtype="S1")
+        np.save(os.path.join(tmp_path, "ids.npy"), np.concatenate([base_ids[base_live], tail_id_array]))
+        np.save(os.path.join(tmp_path, "doc_ids.npy"), np.concatenate([base_doc_ids[base_live], tail_doc_array]))
+
+        offsets = np.zeros(rows + 1, dtype=np.int64)
+        with open(os.path.join(tmp_path, "meta.bin"), "wb") as f:
+            row = 0
+            for i in base_live:
+                # Copy the encoded record as-is; no JSON round trip
+                f.write(base_meta[base_offsets[i]:base_offsets[i + 1]].tobytes())
+                row += 1
+                offsets[row] = f.tell()
+            for i in tail_live:
+                text, metadata = tail_records[i]
+                f.write(json.dumps({"text": text, "metadata": metadata}).encode("utf-8"))
+                row += 1
+                offsets[row] = f.tell()
+            f.flush()
+            os.fsync(f.fileno())
+        np.save(os.path.join(tmp_path, "meta_offsets.npy"), offsets)
+
+        for filename in os.listdir(tmp_path):
+            with open(os.path.join(tmp_path, filename), "rb+") as f:
+                os.fsync(f.fileno())
+        os.rename(tmp_path, path)
+        _fsync_dir(self.directory)
+        return rows
@@ -0,0 +1,172 @@
+from typing import Optional
+from contextlib import contextmanager
+from prometheus_client import (
+    Counter,
+    Histogram,
+    Gauge,
+    CollectorRegistry,
+    generate_latest
+)
+from prometheus_client import multiprocess
+from starlette.routing import Match
+from app.core.profiling import record_span
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Pipeline stages: extraction, chunking, deduplication, embedding, vector_upsert, vector_search,
+# vector_search_batch, llm_generation, redis, smtp. "method" is the chunking method, model, backend or op.
+STAGE_LATENCY = Histogram(
+    "rag_stage_duration_seconds",
+    "Latency of a single pipeline stage",
+    ["stage", "method"],
+    buckets=LATENCY_BUCKETS
+)
+STAGE_TOTAL = Counter(
+    "rag_stage_total",
+    "Pipeline stage executions by outcome",
+    ["stage", "method", "status"]
+)
+REQUEST_LATENCY = Histogram(
+    "rag_http_request_duration_seconds",
+    "HTTP request latency",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "rag_http_requests_in_flight",
+    "HTTP requests currently being served",
+    ["route"],
+    multiprocess_mode="livesum"
+)
+# Hit ratio: rate(rag_cache_requests_total{result="hit"}) / rate(rag_cache_requests_total)
+CACHE_REQUESTS = Counter(
+    "rag_cache_requests_total",
+    "Cache lookups by outcome",
+    ["cache", "result"]
+)
+# Admission control
+REQUESTS_SHED = Counter(
+    "rag_requests_shed_total",
+    "Requests rejected by admission control",
+    ["route_class", "reason"]
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "rag_admission_queue_depth",
+    "Requests waiting for an admission slot",
+    ["route_class"],
+    multiprocess_mode="livesum"
+)
+ADMISSION_WAIT = Histogram(
+    "rag_admission_wait_seconds",
+    "Time admitted requests waited for a slot",
+    ["route_class"],
+    buckets=LATENCY_BUCKETS
+)
+# Near-duplicate chunk elimination at ingest
+DEDUP_CHUNKS = Counter(
+    "rag_dedup_chunks_total",
+    "Ingested chunks by deduplication outcome",
+    ["result"]
+)
+DEDUP_SAVED_EMBEDDING_SECONDS = Counter(
+    "rag_dedup_saved_embedding_seconds_total",
+    "Estimated embedding time not spent on duplicate chunks"
+)
+DEDUP_SAVED_INDEX_BYTES = Counter(
+    "rag_dedup_saved_index_bytes_total",
+    "Estimated vector index bytes not spent on duplicate chunks"
+)
+# Circuit breakers; state is 0 closed, 1 half-open, 2 open
+CIRCUIT_STATE = Gauge(
+    "rag_circuit_breaker_state",
+    "Circuit breaker state per dependency (0 closed, 1 half-open, 2 open)",
+    ["dependency"],
+    multiprocess_mode="max"
+)
+CIRCUIT_TRANSITIONS = Counter(
+    "rag_circuit_breaker_transitions_total",
+    "Circuit breaker state changes by new state",
+    ["dependency", "state"]
+)
+CIRCUIT_REJECTED = Counter(
+    "rag_circuit_breaker_rejected_total",
+    "Calls failed fast by an open circuit breaker",
+    ["dependency"]
+)
+
+class StageTimer:
+    """Handle yielded by track_stage; set status when a stage fails without raising"""
+    __slots__ = ("stage", "method", "status")
+
+    def __init__(self, stage: str, method: str):
+        self.stage = stage
+        self.method = method
+        self.status = "success"
+
+@contextmanager
+def track_stage(stage: str, method: str = "default"):
+    """Time a pipeline stage; recorded in the stage metrics and the active request trace"""
+    timer = StageTimer(stage, str(method))
+    start = time.perf_counter()
+    try:
+        yield timer
+    except Exception:
+        timer.status = "failed"
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        STAGE_LATENCY.labels(timer.stage, timer.method).observe(duration)
+        STAGE_TOTAL.labels(timer.stage, timer.method, timer.status).inc()
+        record_span(timer.stage, timer.method, timer.status, start, duration)
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+def render_metrics() -> bytes:
+    """Serialize metrics, aggregating across workers in multiprocess mode"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest()
+
+class PrometheusMiddleware:
+    """ASGI middleware recording request latency and in-flight requests per route template"""
+
+    def __init__(self, app, excluded_paths: Optional[set] = None):
+        self.app = app
+        self.excluded_paths = excluded_paths or {"/metrics"}
+
+    def _route_template(self, scope) -> str:
+        for route in scope["app"].routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+
+        route = self._route_template(scope)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.labels(route).inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_LATENCY.labels(scope["method"], route, str(status_code)).observe(time.perf_counter() - start)
+            REQUESTS_IN_FLIGHT.labels(route).dec()
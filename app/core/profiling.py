@@ -0,0 +1,268 @@
+from typing import Callable, Dict, List, Optional, TypeVar
+from contextvars import ContextVar
+from collections import Counter
+from starlette.concurrency import run_in_threadpool as starlette_run_in_threadpool
+from app.config import settings
+import cProfile
+import functools
+import json
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+TRACE_ID_HEADER = b"x-trace-id"
+
+T = TypeVar("T")
+
+class RequestTrace:
+    """Span log for a single profiled request, and the threads currently working on it.
+
+    The event loop thread is registered for the whole request; threadpool workers
+    are registered while they run a call submitted through run_in_threadpool below.
+    """
+
+    def __init__(self, trace_id: str, method: str, path: str):
+        self.trace_id = trace_id
+        self.method = method
+        self.path = path
+        self.start = time.perf_counter()
+        self.spans: List[Dict] = []
+        self.threads: Counter = Counter({threading.get_ident(): 1})
+        # cProfile profiles of threadpool calls, set while a deterministic profiler is active
+        self.thread_profiles: Optional[List[cProfile.Profile]] = None
+        self._lock = threading.Lock()
+
+    def add_span(self, stage: str, method: str, status: str, start: float, duration: float):
+        span = {
+            "stage": stage,
+            "method": method,
+            "status": status,
+            "start_ms": round((start - self.start) * 1000, 3),
+            "duration_ms": round(duration * 1000, 3),
+            "thread": threading.get_ident()
+        }
+        with self._lock:
+            self.spans.append(span)
+
+    def enter_thread(self):
+        with self._lock:
+            self.threads[threading.get_ident()] += 1
+
+    def exit_thread(self):
+        thread_id = threading.get_ident()
+        with self._lock:
+            self.threads[thread_id] -= 1
+            if self.threads[thread_id] <= 0:
+                del self.threads[thread_id]
+
+    def add_thread_profile(self, profile: cProfile.Profile):
+        with self._lock:
+            if self.thread_profiles is not None:
+                self.thread_profiles.append(profile)
+
+_active_trace: ContextVar[Optional[RequestTrace]] = ContextVar("active_trace", default=None)
+
+def current_trace() -> Optional[RequestTrace]:
+    return _active_trace.get()
+
+def record_span(stage: str, method: str, status: str, start: float, duration: float):
+    """Attach a pipeline stage to the active request trace, if any"""
+    trace = _active_trace.get()
+    if trace is not None:
+        trace.add_span(stage, method, status, start, duration)
+
+def _traced_call(trace: RequestTrace, func: Callable[..., T], *args, **kwargs) -> T:
+    trace.enter_thread()
+    profile = None
+    if trace.thread_profiles is not None:
+        # cProfile only sees the thread that enabled it, so each worker call gets its own
+        profile = cProfile.Profile()
+        profile.enable()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        if profile is not None:
+            profile.disable()
+            trace.add_thread_profile(profile)
+        trace.exit_thread()
+
+async def run_in_threadpool(func: Callable[..., T], *args, **kwargs) -> T:
+    """starlette's run_in_threadpool, registering the worker thread with the active
+    request trace so profiles cover work done off the event loop"""
+    trace = _active_trace.get()
+    if trace is None:
+        return await starlette_run_in_threadpool(func, *args, **kwargs)
+    return await starlette_run_in_threadpool(functools.partial(_traced_call, trace, func), *args, **kwargs)
+
+class StackSampler:
+    """Samples the stacks of a trace's registered threads and aggregates them as folded stacks.
+
+    Threads the request reaches other than through run_in_threadpool (for
+    example a ThreadPoolExecutor fan-out inside a stage) are not sampled.
+
+    Output is the collapsed format understood by flamegraph.pl and speedscope:
+    one ``frame;frame;frame count`` line per distinct stack.
+    """
+
+    def __init__(self, trace: RequestTrace, interval: float):
+        self.trace = trace
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"profiler-{trace.trace_id[:8]}", daemon=True)
+
+    def _fold(self, frame) -> str:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ";".join(reversed(stack))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in list(self.trace.threads):
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self.samples[self._fold(frame)] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path: str):
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+class DeterministicProfiler:
+    """cProfile wrapper; output is a pstats file (snakeviz, flameprof, speedscope).
+
+    The event loop thread is profiled for the whole request and every
+    run_in_threadpool call of the request gets its own profile; the dump merges them.
+    """
+
+    # cProfile hooks the whole thread, so only one request can be profiled at a time
+    _lock = threading.Lock()
+
+    def __init__(self, trace: RequestTrace):
+        self.trace = trace
+        self.profile = cProfile.Profile()
+        self.active = False
+
+    def start(self):
+        self.active = self._lock.acquire(blocking=False)
+        if self.active:
+            self.trace.thread_profiles = []
+            self.profile.enable()
+
+    def stop(self):
+        if self.active:
+            self.profile.disable()
+            self._lock.release()
+
+    def dump(self, path: str):
+        if self.active:
+            stats = pstats.Stats(self.profile)
+            for profile in self.trace.thread_profiles or []:
+                stats.add(profile)
+            stats.dump_stats(path)
+
+class ProfilingMiddleware:
+    """Profile requests selected by a privileged header or a sampling rate.
+
+    Only installed when PROFILING_ENABLED is set, so it costs nothing otherwise.
+    Each profiled request gets an X-Trace-Id response header, a profile file and
+    a JSON span log of the pipeline stages in PROFILING_DIR.
+    """
+
+    def __init__(
+        self,
+        app,
+        output_dir: str = settings.PROFILING_DIR,
+        header: str = settings.PROFILING_HEADER,
+        token: str = settings.PROFILING_TOKEN,
+        sample_rate: float = settings.PROFILING_SAMPLE_RATE,
+        mode: str = settings.PROFILING_MODE,
+        interval: float = settings.PROFILING_SAMPLE_INTERVAL
+    ):
+        if mode not in ("sampling", "deterministic"):
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        self.app = app
+        self.output_dir = output_dir
+        self.header = header.lower().encode("latin-1")
+        self.token = token
+        self.sample_rate = sample_rate
+        self.mode = mode
+        self.interval = interval
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _should_profile(self, scope) -> bool:
+        if self.token:
+            for name, value in scope["headers"]:
+                if name == self.header and value.decode("latin-1") == self.token:
+                    return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace(uuid.uuid4().hex, scope["method"], scope["path"])
+        if self.mode == "sampling":
+            profiler = StackSampler(trace, self.interval)
+        else:
+            profiler = DeterministicProfiler(trace)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (TRACE_ID_HEADER, trace.trace_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        token = _active_trace.set(trace)
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.stop()
+            _active_trace.reset(token)
+            self._write(trace, profiler, status_code)
+
+    def _write(self, trace: RequestTrace, profiler, status_code: int):
+        try:
+            extension = "folded" if self.mode == "sampling" else "prof"
+            profile_path = os.path.join(self.output_dir, f"{trace.trace_id}.{extension}")
+            profiler.dump(profile_path)
+
+            record = {
+                "trace_id": trace.trace_id,
+                "method": trace.method,
+                "path": trace.path,
+                "status": status_code,
+                "duration_ms": round((time.perf_counter() - trace.start) * 1000, 3),
+                "profile": os.path.basename(profile_path) if os.path.exists(profile_path) else None,
+                "spans": trace.spans
+            }
+            with open(os.path.join(self.output_dir, f"{trace.trace_id}.spans.json"), "w") as f:
+                json.dump(record, f, indent=2)
+
+            logger.info(f"Profiled {trace.method} {trace.path} trace_id={trace.trace_id} spans={len(trace.spans)}")
+        except Exception as e:
+            logger.error(f"❌ Failed to write profile {trace.trace_id}: {e}")
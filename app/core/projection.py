@@ -0,0 +1,198 @@
+# app/core/projection.py
+"""Optional PCA projection of embeddings to a smaller stored dimension.
+
+A projection is fitted on embeddings of the indexed corpus, saved under
+PROJECTION_DIR as ``pca-<dims>-<version>.npz`` and enabled by setting
+EMBEDDING_PROJECTION to its version (or file path). EmbeddingGenerator then
+projects both document and query embeddings, so vector stores hold and scan
+``output_dimension`` floats per vector instead of EMBEDDING_DIMENSION.
+
+Vectors written under one projection are not comparable with vectors written
+under another (or none): changing EMBEDDING_PROJECTION requires re-indexing.
+Use ``python -m benchmarks.projection_loss`` to see what each dimension costs in
+retrieval quality before choosing one.
+
+    python -m app.core.projection fit --dimensions 192
+    python -m app.core.projection list
+"""
+
+from typing import Dict, List, Optional
+from datetime import datetime
+from functools import lru_cache
+from app.config import settings
+import numpy as np
+import argparse
+import glob
+import hashlib
+import json
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+class PCAProjection:
+    def __init__(self, mean: np.ndarray, components: np.ndarray, explained_variance_ratio: float, info: Optional[Dict] = None):
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.ascontiguousarray(components, dtype=np.float32)
+        self.explained_variance_ratio = float(explained_variance_ratio)
+        self.info = info or {}
+        digest = hashlib.sha256(self.mean.tobytes() + self.components.tobytes()).hexdigest()
+        self.version = digest[:12]
+
+    @property
+    def input_dimension(self) -> int:
+        return self.components.shape[1]
+
+    @property
+    def output_dimension(self) -> int:
+        return self.components.shape[0]
+
+    @classmethod
+    def fit(cls, embeddings: np.ndarray, output_dimension: int, **info) -> "PCAProjection":
+        """Fit on corpus embeddings (rows) via an eigendecomposition of their covariance"""
+        embeddings = np.asarray(embeddings, dtype=np.float64)
+        if output_dimension < 1 or output_dimension > embeddings.shape[1]:
+            raise ValueError(f"Output dimension must be in 1..{embeddings.shape[1]}, got {output_dimension}")
+        if len(embeddings) < 2:
+            raise ValueError("At least two embeddings are needed to fit a projection")
+
+        mean = embeddings.mean(axis=0)
+        centered = embeddings - mean
+        covariance = centered.T @ centered / (len(embeddings) - 1)
+        eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+        order = np.argsort(eigenvalues)[::-1]
+        eigenvalues, eigenvectors = eigenvalues[order], eigenvectors[:, order]
+
+        total = eigenvalues.sum()
+        ratio = eigenvalues[:output_dimension].sum() / total if total > 0 else 1.0
+        return cls(
+            mean,
+            eigenvectors[:, :output_dimension].T,
+            ratio,
+            {"fitted_at": datetime.utcnow().isoformat() + "Z", "num_samples": len(embeddings), **info}
+        )
+
+    def transform(self, embeddings: np.ndarray) -> np.ndarray:
+        """Project and re-normalize, so cosine and dot scores keep their meaning"""
+        projected = (np.asarray(embeddings, dtype=np.float32) - self.mean) @ self.components.T
+        norms = np.linalg.norm(projected, axis=1, keepdims=True)
+        return projected / np.where(norms == 0, 1.0, norms)
+
+    def save(self, directory: str = settings.PROJECTION_DIR) -> str:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"pca-{self.output_dimension}-{self.version}.npz")
+        info = {
+            **self.info,
+            "version": self.version,
+            "input_dimension": self.input_dimension,
+            "output_dimension": self.output_dimension,
+            "explained_variance_ratio": self.explained_variance_ratio
+        }
+        with open(path, "wb") as f:
+            np.savez(f, mean=self.mean, components=self.components, info=np.array(json.dumps(info)))
+        return path
+
+    @classmethod
+    def load(cls, version_or_path: str, directory: str = settings.PROJECTION_DIR) -> "PCAProjection":
+        path = version_or_path
+        if not os.path.exists(path):
+            matches = glob.glob(os.path.join(directory, f"pca-*-{version_or_path}.npz"))
+            if not matches:
+                raise FileNotFoundError(f"No projection {version_or_path} in {directory}")
+            path = matches[0]
+
+        with np.load(path) as data:
+            info = json.loads(str(data["info"]))
+            projection = cls(data["mean"], data["components"], info.get("explained_variance_ratio", 0.0), info)
+        if info.get("version") and info["version"] != projection.version:
+            raise ValueError(f"Projection file {path} is corrupt: version mismatch")
+        return projection
+
+@lru_cache(maxsize=1)
+def load_active_projection() -> Optional[PCAProjection]:
+    """The projection selected by EMBEDDING_PROJECTION, or None"""
+    if not settings.EMBEDDING_PROJECTION:
+        return None
+    projection = PCAProjection.load(settings.EMBEDDING_PROJECTION)
+    logger.info(
+        f"✅ Embedding projection {projection.version} loaded: {projection.input_dimension} -> "
+        f"{projection.output_dimension} dims, {projection.explained_variance_ratio:.1%} variance kept"
+    )
+    return projection
+
+def active_projection_version() -> Optional[str]:
+    """Version of the projection applied to stored vectors, None when they are full width.
+    Part of every dedup key, so re-uploads after a projection change are re-embedded"""
+    projection = load_active_projection()
+    return projection.version if projection else None
+
+def output_dimension() -> int:
+    """Dimension of the vectors actually stored and searched"""
+    projection = load_active_projection()
+    return projection.output_dimension if projection else settings.EMBEDDING_DIMENSION
+
+def corpus_embeddings(max_chunks: Optional[int] = None) -> np.ndarray:
+    """Full-width embeddings of every processed upload, chunked as it was ingested"""
+    from app.core.chunking import chunker
+    from app.core.embedding import embedding_generator
+    from app.db.metadata_db import SessionLocal
+    from app.db.models import DocumentMetadata
+    from app.utils.text_extraction import extract_text
+
+    db = SessionLocal()
+    try:
+        documents = db.query(DocumentMetadata.file_path, DocumentMetadata.chunking_method).filter(
+            DocumentMetadata.processed == True
+        ).all()
+    finally:
+        db.close()
+
+    batches: List[np.ndarray] = []
+    total = 0
+    for file_path, chunking_method in documents:
+        if not os.path.exists(file_path):
+            logger.warning(f"Skipping missing upload {file_path}")
+            continue
+        chunks, _ = chunker.chunk_document(extract_text(file_path), method=chunking_method)
+        if max_chunks is not None:
+            chunks = chunks[:max_chunks - total]
+        if not chunks:
+            continue
+        embeddings, metrics = embedding_generator.generate_embeddings(chunks, project=False)
+        if metrics.get("status") != "success":
+            raise RuntimeError(f"Embedding {file_path} failed: {metrics.get('error')}")
+        batches.append(np.asarray(embeddings, dtype=np.float32))
+        total += len(chunks)
+        if max_chunks is not None and total >= max_chunks:
+            break
+
+    if not batches:
+        raise RuntimeError("No processed documents to fit a projection on")
+    return np.vstack(batches)
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit and inspect embedding projections")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    fit_parser = subcommands.add_parser("fit", help="Fit a PCA projection on the uploaded corpus")
+    fit_parser.add_argument("--dimensions", type=int, required=True)
+    fit_parser.add_argument("--max-chunks", type=int, default=None, help="Cap on corpus chunks used for fitting")
+    fit_parser.add_argument("--output-dir", default=settings.PROJECTION_DIR)
+    subcommands.add_parser("list", help="List saved projections")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "fit":
+        embeddings = corpus_embeddings(args.max_chunks)
+        projection = PCAProjection.fit(embeddings, args.dimensions)
+        path = projection.save(args.output_dir)
+        print(f"Saved {path}: {projection.input_dimension} -> {projection.output_dimension} dims, "
+              f"{projection.explained_variance_ratio:.1%} variance kept, fitted on {len(embeddings)} chunks")
+        print(f"Enable with EMBEDDING_PROJECTION={projection.version} and re-index the corpus")
+    else:
+        for path in sorted(glob.glob(os.path.join(settings.PROJECTION_DIR, "pca-*.npz"))):
+            projection = PCAProjection.load(path)
+            print(f"{projection.version}  {projection.input_dimension} -> {projection.output_dimension}  "
+                  f"{projection.explained_variance_ratio:.1%} variance  {projection.info.get('fitted_at', '')}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+from typing import Dict, List, Optional
+
+# Chunk text shown per hit in prompts and tool output
+SNIPPET_CHARS = 500
+
+class ChunkBuffer:
+    """Chunk texts returned by one search call, each held once.
+
+    Hits refer to their text by slot, so a chunk retrieved by many queries of a
+    batch is stored once, and text is only sliced or copied at the JSON boundary.
+    """
+    __slots__ = ("texts", "_slots")
+
+    def __init__(self):
+        self.texts: List[str] = []
+        self._slots: Dict[str, int] = {}
+
+    def add(self, chunk_id: str, text: str) -> int:
+        slot = self._slots.get(chunk_id)
+        if slot is None:
+            slot = len(self.texts)
+            self._slots[chunk_id] = slot
+            self.texts.append(text)
+        return slot
+
+    def __len__(self):
+        return len(self.texts)
+
+class ScoredChunk:
+    """One search hit: vector id, score and the slot of its text in a shared ChunkBuffer"""
+    __slots__ = ("id", "score", "slot", "metadata", "buffer")
+
+    def __init__(self, id: str, score: float, slot: int, metadata: Dict, buffer: ChunkBuffer):
+        self.id = id
+        self.score = score
+        self.slot = slot
+        self.metadata = metadata
+        self.buffer = buffer
+
+    @classmethod
+    def create(cls, buffer: ChunkBuffer, id: str, score: float, text: str, metadata: Dict) -> "ScoredChunk":
+        return cls(id, float(score), buffer.add(id, text), metadata, buffer)
+
+    @property
+    def text(self) -> str:
+        return self.buffer.texts[self.slot]
+
+    def snippet(self, max_chars: int = SNIPPET_CHARS) -> str:
+        text = self.text
+        return text[:max_chars] + "..." if len(text) > max_chars else text
+
+    def source(self) -> Dict:
+        """Where the hit came from, as reported in QueryResponse.sources"""
+        return {
+            "id": self.id,
+            "document_id": self.metadata.get("document_id"),
+            "filename": self.metadata.get("filename", "unknown"),
+            "chunk_index": self.metadata.get("chunk_index", 0),
+            "score": self.score
+        }
+
+    def to_dict(self, max_chars: Optional[int] = None) -> Dict:
+        return {
+            "id": self.id,
+            "score": self.score,
+            "text": self.snippet(max_chars) if max_chars is not None else self.text,
+            "metadata": self.metadata
+        }
+
+    def __repr__(self):
+        return f"<ScoredChunk(id='{self.id}', score={self.score:.4f})>"
@@ -0,0 +1,75 @@
+from typing import Optional, Tuple
+import numpy as np
+
+SIMILARITY_METHODS = ("cosine", "dot", "euclidean")
+
+# Largest query x corpus score block materialized at once, in float32 entries (64 MB)
+SCORE_BLOCK_ENTRIES = 16 * 1024 * 1024
+
+def batch_top_k(
+    matrix: np.ndarray,
+    queries: np.ndarray,
+    top_k: int,
+    method: str = "cosine",
+    norms: Optional[np.ndarray] = None,
+    deleted: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Exact top-k rows of ``matrix`` for every query, best first.
+
+    Scores are one matrix product per block of queries, with blocks sized so the
+    score block stays under SCORE_BLOCK_ENTRIES, and top-k is a row-wise
+    argpartition. ``norms`` are the row norms of ``matrix`` if already known;
+    rows flagged in ``deleted`` never match. Returns (indices, scores), each of
+    shape (num_queries, k) with k = min(top_k, live rows).
+    """
+    if method not in SIMILARITY_METHODS:
+        raise ValueError(f"Unknown similarity method: {method}")
+
+    queries = np.asarray(queries, dtype=np.float32).reshape(-1, matrix.shape[1])
+    rows = matrix.shape[0]
+    live = rows - (int(deleted.sum()) if deleted is not None else 0)
+    k = min(top_k, live)
+    indices = np.empty((len(queries), max(k, 0)), dtype=np.int64)
+    scores = np.empty((len(queries), max(k, 0)), dtype=np.float32)
+    if k <= 0 or not len(queries):
+        return indices, scores
+
+    if method != "dot" and norms is None:
+        norms = np.linalg.norm(matrix, axis=1)
+    if method == "cosine":
+        row_scale = 1.0 / np.where(norms == 0, 1.0, norms)
+        query_norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(query_norms == 0, 1.0, query_norms)
+    elif method == "euclidean":
+        squared_norms = np.square(norms)
+
+    block = max(1, SCORE_BLOCK_ENTRIES // max(rows, 1))
+    for start in range(0, len(queries), block):
+        query_block = queries[start:start + block]
+        block_scores = query_block @ matrix.T
+
+        if method == "cosine":
+            block_scores *= row_scale
+        elif method == "euclidean":
+            # ||m - q||^2 = ||m||^2 - 2 m.q + ||q||^2
+            distances = squared_norms - 2 * block_scores + np.square(query_block).sum(axis=1, keepdims=True)
+            block_scores = -np.sqrt(np.maximum(distances, 0))
+
+        if deleted is not None:
+            block_scores[:, deleted] = -np.inf
+
+        top = np.argpartition(-block_scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(block_scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        indices[start:start + len(query_block)] = np.take_along_axis(top, order, axis=1)
+        scores[start:start + len(query_block)] = np.take_along_axis(top_scores, order, axis=1)
+
+    return indices, scores
+
+def merge_top_k(parts, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Merge per-part (indices, scores) results whose indices are already global"""
+    indices = np.concatenate([part[0] for part in parts], axis=1)
+    scores = np.concatenate([part[1] for part in parts], axis=1)
+    k = min(top_k, scores.shape[1])
+    order = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+    return np.take_along_axis(indices, order, axis=1), np.take_along_axis(scores, order, axis=1)
@@ -0,0 +1,94 @@
+from typing import List, Dict, Union
+import numpy as np
+import hashlib
+import re
+import threading
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+def _stable_hash(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+
+class StubSentenceModel:
+    """Deterministic stand-in for SentenceTransformer.
+
+    Embeds text by hashing word unigrams and bigrams into a fixed number of
+    signed buckets, so identical inputs always give identical vectors and
+    lexically similar texts land close together. No weights are downloaded.
+    """
+
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+        self._cache: Dict[str, tuple] = {}
+
+    def _features(self, token: str) -> tuple:
+        if token not in self._cache:
+            h = _stable_hash(token)
+            self._cache[token] = (h % self.dimension, 1.0 if (h >> 32) & 1 else -1.0)
+        return self._cache[token]
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        words = TOKEN_PATTERN.findall(text.lower())
+        for token in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            index, sign = self._features(token)
+            vector[index] += sign
+        return vector
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        show_progress_bar: bool = False,
+        normalize_embeddings: bool = False,
+        **kwargs
+    ) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            for i, text in enumerate(texts[start:start + batch_size], start):
+                embeddings[i] = self._embed(text)
+
+        if normalize_embeddings and len(texts):
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.where(norms == 0, 1.0, norms)
+
+        return embeddings[0] if single else embeddings
+
+class StubTokenizer:
+    """Stand-in for the LLM's tokenizer: one token per whitespace-separated word"""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._words: List[str] = []
+        self._lock = threading.Lock()
+
+    def encode(self, text: str, add_special_tokens: bool = False) -> List[int]:
+        ids = []
+        with self._lock:
+            for word in text.split():
+                if word not in self._ids:
+                    self._ids[word] = len(self._words)
+                    self._words.append(word)
+                ids.append(self._ids[word])
+        return ids
+
+    def decode(self, ids: List[int], skip_special_tokens: bool = True) -> str:
+        return " ".join(self._words[i] for i in ids)
+
+class StubText2TextPipeline:
+    """Deterministic stand-in for a transformers text2text-generation pipeline"""
+
+    def __init__(self):
+        self.tokenizer = StubTokenizer()
+
+    def __call__(self, prompt: Union[str, List[str]], max_length: int = 256, **kwargs) -> List[Dict]:
+        # Like the real pipeline, a list of prompts gives one dict per prompt
+        if not isinstance(prompt, str):
+            return [self(p, max_length=max_length, **kwargs)[0] for p in prompt]
+        question = prompt.rsplit("answer the user question:", 1)[-1].strip()
+        digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8]
+        answer = f"Stub answer {digest} to: {question}"
+        return [{"generated_text": answer[:max_length]}]
@@ -1,5 +1,5 @@
 # app/core/tools.py
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
 from app.core.vector_store import vector_store
@@ -7,8 +7,15 @@ from app.core.embedding import embedding_generator
 from app.db.redis_memory import memory_store
 from app.db.metadata_db import get_db
 from app.db.models import BookingRequest
-from app.utils.email_utils import send_booking_confirmation
+from app.utils.email_utils import enqueue_booking_confirmation, email_outbox_sender
+from app.core.availability import slot_index, SlotConflictError, InvalidSlotError
+from app.core.circuit_breaker import vector_db_breaker
+from app.core.retrieval import ScoredChunk
+from app.core.metrics import record_cache
+from app.config import settings
+from collections import OrderedDict
 from datetime import datetime
+import threading
 import json
 
 class DocumentSearchInput(BaseModel):
@@ -23,39 +30,87 @@ class BookingInput(BaseModel):
     time: str = Field(description="Time in HH:MM format")
     notes: str = Field(default="", description="Additional notes")
 
+class SearchResultCache:
+    """Bounded LRU of recent search results, the degraded-mode source while the vector store is down"""
+
+    def __init__(self, max_entries: int = settings.SEARCH_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, List[ScoredChunk]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, query: str, top_k: int, method: str) -> tuple:
+        return " ".join(query.lower().split()), top_k, method
+
+    def get(self, query: str, top_k: int, method: str) -> Optional[List[ScoredChunk]]:
+        key = self._key(query, top_k, method)
+        with self._lock:
+            results = self._entries.get(key)
+            if results is not None:
+                self._entries.move_to_end(key)
+            return results
+
+    def put(self, query: str, top_k: int, method: str, results: List[ScoredChunk]):
+        if self.max_entries <= 0:
+            return
+        key = self._key(query, top_k, method)
+        with self._lock:
+            self._entries[key] = results
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
 class DocumentSearchTool(BaseTool):
     name = "document_search"
     description = "Search through uploaded documents for relevant information"
     args_schema = DocumentSearchInput
     
-    def _run(self, query: str, top_k: int = 5, method: str = "cosine") -> str:
-        """Search documents for relevant information"""
-        try:
+    def search(self, query: str, top_k: int = 5, method: str = "cosine") -> Tuple[List[ScoredChunk], Dict]:
+        """Typed search for in-process callers; returns hits and metrics"""
+        # Vector store known to be down: skip embedding and answer from the cache
+        if vector_db_breaker.rejecting:
+            results, metrics = [], {"error": "vector store unavailable", "status": "failed"}
+        else:
             # Generate query embedding
-            query_embeddings, _ = embedding_generator.generate_embeddings([query])
-            query_embedding = query_embeddings[0]
+            query_embeddings, embedding_metrics = embedding_generator.generate_embeddings([query])
+            if embedding_metrics.get("status") != "success":
+                return [], {"error": embedding_metrics.get("error"), "status": "failed"}
             
             # Search vector store
             results, metrics = vector_store.similarity_search(
-                query_embedding, 
+                query_embeddings[0], 
                 top_k=top_k,
                 method=method
             )
+        
+        if metrics.get("status") == "success":
+            search_result_cache.put(query, top_k, method, results)
+        else:
+            # Degraded mode: the last results seen for this query, else nothing
+            cached = search_result_cache.get(query, top_k, method)
+            record_cache("search_fallback", cached is not None)
+            results = cached or []
+            metrics = {**metrics, "degraded": True, "source": "cache" if cached is not None else "none"}
+        
+        return results, metrics
+    
+    def _run(self, query: str, top_k: int = 5, method: str = "cosine") -> str:
+        """Search documents for relevant information; JSON for LangChain agents"""
+        try:
+            results, metrics = self.search(query, top_k, method)
             
-            # Format results
             formatted_results = {
-                "search_results": [],
+                "search_results": [
+                    {
+                        "text": result.snippet(),
+                        "score": result.score,
+                        "filename": result.metadata.get("filename", "unknown"),
+                        "chunk_index": result.metadata.get("chunk_index", 0)
+                    }
+                    for result in results
+                ],
                 "metrics": metrics
             }
             
-            for result in results:
-                formatted_results["search_results"].append({
-                    "text": result["text"][:500] + "..." if len(result["text"]) > 500 else result["text"],
-                    "score": result["score"],
-                    "filename": result["metadata"].get("filename", "unknown"),
-                    "chunk_index": result["metadata"].get("chunk_index", 0)
-                })
-            
             return json.dumps(formatted_results, indent=2)
             
         except Exception as e:
@@ -89,18 +144,24 @@ class BookingTool(BaseTool):
                     notes=notes
                 )
                 
-                db.add(booking)
+                try:
+                    slot_index.book(db, booking)
+                except SlotConflictError:
+                    db.rollback()
+                    free = slot_index.free_slots(db, booking_date.date(), booking_date.date())[booking_date.date()]
+                    return f"Error: {date} at {time} is already booked. Free times that day: {', '.join(free) or 'none'}"
+                
+                # Queue confirmation email in the same transaction as the booking
+                enqueue_booking_confirmation(db, booking)
                 db.commit()
                 db.refresh(booking)
-                
-                # Send confirmation email
-                email_sent = send_booking_confirmation(email, full_name, date, time)
+                email_outbox_sender.notify()
                 
                 result = {
                     "success": True,
                     "booking_id": booking.id,
                     "message": f"Interview booked successfully for {full_name} on {date} at {time}",
-                    "email_sent": email_sent
+                    "email_status": "queued"
                 }
                 
                 return json.dumps(result, indent=2)
@@ -108,10 +169,16 @@ class BookingTool(BaseTool):
             finally:
                 db.close()
                 
+        except InvalidSlotError as e:
+            return f"Error: {str(e)}. Bookable times: {', '.join(slot_index.slots)}"
         except ValueError as e:
             return f"Error: Invalid date or time format - {str(e)}"
         except Exception as e:
             return f"Error booking interview: {str(e)}"
     
     async def _arun(self, full_name: str, email: str, date: str, time: str, notes: str = "") -> str:
-        return self._run(full_name, email, date, time, notes)
\ No newline at end of file
+        return self._run(full_name, email, date, time, notes)
+# Global instances
+search_result_cache = SearchResultCache()
+document_search_tool = DocumentSearchTool()
+booking_tool = BookingTool()
@@ -2,10 +2,19 @@ from typing import List, Dict, Tuple, Optional
 import pinecone
 from pinecone import Pinecone, ServerlessSpec
 from app.config import settings
+from app.core.metrics import track_stage
+from app.core.circuit_breaker import vector_db_breaker
+from app.core.local_index import LocalVectorStore
+from app.core.similarity import batch_top_k
+from app.core.retrieval import ChunkBuffer, ScoredChunk
+from app.core.projection import output_dimension
+from concurrent.futures import ThreadPoolExecutor
 import uuid
+import threading
 import time
 import logging
 import os
+import numpy as np
 from dotenv import load_dotenv  # ✅ load .env
 
 # Load environment variables from .env
@@ -13,6 +22,12 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+UPSERT_BATCH_SIZE = 100
+# Pinecone accepts at most 1000 ids per delete
+DELETE_BATCH_SIZE = 1000
+# Concurrent single-vector queries when Pinecone serves a batch search
+QUERY_CONCURRENCY = 8
+
 class VectorStore:
     def __init__(self):
         self.pc = None
@@ -25,7 +40,7 @@ class VectorStore:
             api_key = os.getenv("PINECONE_API_KEY") or settings.PINECONE_API_KEY
             environment = os.getenv("PINECONE_ENVIRONMENT") or settings.PINECONE_ENVIRONMENT
             index_name = os.getenv("PINECONE_INDEX_NAME") or settings.PINECONE_INDEX_NAME
-            embedding_dim = int(os.getenv("EMBEDDING_DIMENSION", settings.EMBEDDING_DIMENSION))
+            embedding_dim = output_dimension()
 
             if not api_key:
                 raise ValueError("❌ PINECONE_API_KEY is missing. Check your .env file.")
@@ -48,6 +63,13 @@ class VectorStore:
                     )
                 )
                 time.sleep(10)  # Wait for index to be created
+            else:
+                index_dim = self.pc.describe_index(index_name).dimension
+                if index_dim != embedding_dim:
+                    raise ValueError(
+                        f"Pinecone index {index_name} holds {index_dim}-dim vectors, expected {embedding_dim}; "
+                        f"re-index after changing EMBEDDING_PROJECTION"
+                    )
             
             self.index = self.pc.Index(index_name)
             logger.info("✅ Pinecone initialized successfully")
@@ -57,18 +79,265 @@ class VectorStore:
             raise
     
     def test_connection(self):
+        """Probe the index directly; bypasses the circuit breaker so recovery is noticed"""
         try:
             if self.index:
                 stats = self.index.describe_index_stats()
-                logger.info(f"Pinecone connection test successful. Index stats: {stats}")
+                logger.debug(f"Pinecone connection test successful. Index stats: {stats}")
                 return True
         except Exception as e:
             logger.error(f"Pinecone connection test failed: {e}")
             raise
         return False
 
-    # Other methods (store_embeddings, similarity_search, delete_by_document) remain unchanged
-    # Keep them as in your current file — no change needed below this point
+    def store_embeddings(self, embeddings: List[List[float]], texts: List[str], metadata: List[Dict]) -> List[str]:
+        """Upsert embeddings with their chunk text and metadata, returns vector IDs"""
+        vector_ids = [str(uuid.uuid4()) for _ in embeddings]
+        vectors = [
+            {
+                "id": vector_id,
+                "values": embedding,
+                "metadata": {**meta, "text": text}
+            }
+            for vector_id, embedding, text, meta in zip(vector_ids, embeddings, texts, metadata)
+        ]
+
+        try:
+            with vector_db_breaker.guard(), track_stage("vector_upsert", "pinecone"):
+                for i in range(0, len(vectors), UPSERT_BATCH_SIZE):
+                    self.index.upsert(vectors=vectors[i:i + UPSERT_BATCH_SIZE])
+            logger.info(f"✅ Stored {len(vectors)} vectors in Pinecone")
+            return vector_ids
+        except Exception as e:
+            logger.error(f"❌ Failed to store embeddings: {e}")
+            raise
+
+    def _to_result(self, match, buffer: ChunkBuffer) -> ScoredChunk:
+        metadata = dict(match.metadata or {})
+        return ScoredChunk.create(buffer, match.id, match.score, metadata.pop("text", ""), metadata)
+
+    def similarity_search(self, query_embedding: List[float], top_k: int = 5, method: str = "cosine") -> Tuple[List[ScoredChunk], Dict]:
+        """Query the index, returns results and metrics (the index metric is fixed at creation)"""
+        start_time = time.time()
+
+        try:
+            with vector_db_breaker.guard(), track_stage("vector_search", "pinecone"):
+                response = self.index.query(
+                    vector=list(query_embedding),
+                    top_k=top_k,
+                    include_metadata=True
+                )
+
+            buffer = ChunkBuffer()
+            results = [self._to_result(match, buffer) for match in response.matches]
+
+            metrics = {
+                "backend": "pinecone",
+                "method": method,
+                "top_k": top_k,
+                "total_results": len(results),
+                "processing_time": time.time() - start_time,
+                "status": "success"
+            }
+            return results, metrics
+
+        except Exception as e:
+            logger.error(f"❌ Similarity search failed: {e}")
+            return [], {"error": str(e), "status": "failed"}
+
+    def similarity_search_batch(self, query_embeddings: List[List[float]], top_k: int = 5, method: str = "cosine") -> Tuple[List[List[ScoredChunk]], Dict]:
+        """Pinecone has no multi-vector query, so the batch is fanned out over a thread pool"""
+        start_time = time.time()
+
+        def query(embedding):
+            return self.index.query(vector=list(embedding), top_k=top_k, include_metadata=True)
+
+        try:
+            with vector_db_breaker.guard(), track_stage("vector_search_batch", "pinecone"):
+                with ThreadPoolExecutor(max_workers=QUERY_CONCURRENCY) as pool:
+                    responses = list(pool.map(query, query_embeddings))
+
+            buffer = ChunkBuffer()
+            results = [[self._to_result(match, buffer) for match in response.matches] for response in responses]
+            metrics = {
+                "backend": "pinecone",
+                "method": method,
+                "top_k": top_k,
+                "total_queries": len(results),
+                "total_results": sum(len(hits) for hits in results),
+                "processing_time": time.time() - start_time,
+                "status": "success"
+            }
+            return results, metrics
+
+        except Exception as e:
+            logger.error(f"❌ Batch similarity search failed: {e}")
+            return [], {"error": str(e), "status": "failed"}
+
+    def delete_by_document(self, document_id: str):
+        """Delete every vector belonging to a document"""
+        try:
+            with vector_db_breaker.guard():
+                self.index.delete(filter={"document_id": {"$eq": document_id}})
+            logger.info(f"Deleted vectors for document {document_id}")
+        except Exception as e:
+            logger.error(f"❌ Failed to delete vectors for {document_id}: {e}")
+            raise
+
+    def delete_vectors(self, vector_ids: List[str]):
+        """Delete vectors by id"""
+        try:
+            for i in range(0, len(vector_ids), DELETE_BATCH_SIZE):
+                with vector_db_breaker.guard():
+                    self.index.delete(ids=vector_ids[i:i + DELETE_BATCH_SIZE])
+            logger.info(f"Deleted {len(vector_ids)} vectors")
+        except Exception as e:
+            logger.error(f"❌ Failed to delete {len(vector_ids)} vectors: {e}")
+            raise
+
+class InMemoryVectorStore:
+    """Exact brute-force index held in process memory.
+
+    Used for offline runs (benchmarks, load tests, local development) where
+    Pinecone is not reachable. Exposes the same interface as VectorStore.
+    Writes and the stacked-matrix snapshot taken by searches share a lock, so
+    searches running in the threadpool never see a matrix and norms from
+    different writes.
+    """
+
+    def __init__(self, dimension: int = settings.EMBEDDING_DIMENSION):
+        self.dimension = dimension
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadata: List[Dict] = []
+        self._vectors: List[np.ndarray] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._norms: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    def test_connection(self):
+        return True
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _get_matrix(self) -> np.ndarray:
+        """Stack pending vectors into one matrix, cached until the next write; caller holds the lock"""
+        if self._matrix is None:
+            if self._vectors:
+                self._matrix = np.vstack(self._vectors).astype(np.float32, copy=False)
+            else:
+                self._matrix = np.empty((0, self.dimension), dtype=np.float32)
+            self._vectors = [self._matrix]
+            self._norms = np.linalg.norm(self._matrix, axis=1)
+        return self._matrix
+
+    def store_embeddings(self, embeddings: List[List[float]], texts: List[str], metadata: List[Dict]) -> List[str]:
+        vector_ids = [str(uuid.uuid4()) for _ in embeddings]
+        if not vector_ids:
+            return []
+
+        with self._lock, track_stage("vector_upsert", "memory"):
+            self._vectors.append(np.asarray(embeddings, dtype=np.float32).reshape(len(vector_ids), -1))
+            self._matrix = None
+            self._ids.extend(vector_ids)
+            self._texts.extend(texts)
+            self._metadata.extend(dict(meta) for meta in metadata)
+        return vector_ids
+
+    def _search(self, query_embeddings, top_k: int, method: str) -> List[List[ScoredChunk]]:
+        with self._lock:
+            matrix, norms = self._get_matrix(), self._norms
+            ids, texts, metadata = self._ids, self._texts, self._metadata
+        indices, scores = batch_top_k(matrix, query_embeddings, top_k, method, norms=norms)
+        buffer = ChunkBuffer()
+        return [
+            [
+                ScoredChunk.create(buffer, ids[i], score, texts[i], metadata[i])
+                for i, score in zip(row_indices, row_scores)
+            ]
+            for row_indices, row_scores in zip(indices, scores)
+        ]
+
+    def similarity_search(self, query_embedding: List[float], top_k: int = 5, method: str = "cosine") -> Tuple[List[ScoredChunk], Dict]:
+        start_time = time.time()
+
+        try:
+            with track_stage("vector_search", "memory"):
+                results = self._search([query_embedding], top_k, method)[0]
+
+            metrics = {
+                "backend": "memory",
+                "method": method,
+                "top_k": top_k,
+                "total_results": len(results),
+                "index_size": len(self._ids),
+                "processing_time": time.time() - start_time,
+                "status": "success"
+            }
+            return results, metrics
+
+        except Exception as e:
+            logger.error(f"❌ Similarity search failed: {e}")
+            return [], {"error": str(e), "status": "failed"}
+
+    def similarity_search_batch(self, query_embeddings: List[List[float]], top_k: int = 5, method: str = "cosine") -> Tuple[List[List[ScoredChunk]], Dict]:
+        start_time = time.time()
+
+        try:
+            with track_stage("vector_search_batch", "memory"):
+                results = self._search(query_embeddings, top_k, method)
+
+            metrics = {
+                "backend": "memory",
+                "method": method,
+                "top_k": top_k,
+                "total_queries": len(results),
+                "total_results": sum(len(hits) for hits in results),
+                "index_size": len(self._ids),
+                "processing_time": time.time() - start_time,
+                "status": "success"
+            }
+            return results, metrics
+
+        except Exception as e:
+            logger.error(f"❌ Batch similarity search failed: {e}")
+            return [], {"error": str(e), "status": "failed"}
+
+    def delete_by_document(self, document_id: str):
+        with self._lock:
+            self._keep([i for i, meta in enumerate(self._metadata) if meta.get("document_id") != document_id])
+
+    def delete_vectors(self, vector_ids: List[str]):
+        wanted = set(vector_ids)
+        with self._lock:
+            self._keep([i for i, vector_id in enumerate(self._ids) if vector_id not in wanted])
+
+    def _keep(self, keep: List[int]):
+        """Drop every row not listed; caller holds the lock"""
+        if len(keep) == len(self._ids):
+            return
+
+        matrix = self._get_matrix()
+        self._vectors = [matrix[keep]]
+        self._matrix = None
+        self._ids = [self._ids[i] for i in keep]
+        self._texts = [self._texts[i] for i in keep]
+        self._metadata = [self._metadata[i] for i in keep]
+
+def create_vector_store():
+    """Build the vector store selected by VECTOR_STORE_BACKEND"""
+    backend = settings.VECTOR_STORE_BACKEND
+    if backend == "pinecone":
+        return VectorStore()
+    elif backend == "memory":
+        logger.info("Using in-memory vector store")
+        return InMemoryVectorStore(output_dimension())
+    elif backend == "local":
+        logger.info(f"Using local vector index at {settings.LOCAL_INDEX_DIR}")
+        return LocalVectorStore(dimension=output_dimension())
+    else:
+        raise ValueError(f"Unknown vector store backend: {backend}")
 
 # Global instance
-vector_store = VectorStore()
+vector_store = create_vector_store()
\ No newline at end of file
@@ -1,8 +1,11 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect
 from sqlalchemy.orm import sessionmaker, Session
 from app.db.models import Base
 from app.config import settings
 import os
+import logging
+
+logger = logging.getLogger(__name__)
 
 # Ensure uploads directory exists
 os.makedirs("uploads", exist_ok=True)
@@ -13,8 +16,29 @@ engine = create_engine(
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def _add_missing_columns():
+    """Add nullable columns introduced after a table was first created"""
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                column_type = column.type.compile(dialect=engine.dialect)
+                with engine.begin() as conn:
+                    conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+                logger.info(f"Added column {table.name}.{column.name}")
+
 def create_tables():
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+    # create_all skips indexes on tables that already exist
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except Exception as e:
+                # e.g. existing rows violate a new unique index; the app still starts
+                logger.error(f" Failed to create index {index.name}: {e}")
 
 def get_db():
     db = SessionLocal()
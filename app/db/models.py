@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Float, Boolean
+from sqlalchemy import Column, Integer, BigInteger, String, Date, DateTime, Text, Float, Boolean, ForeignKey, Index, LargeBinary, text
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 
@@ -13,14 +13,58 @@ class DocumentMetadata(Base):
     file_path = Column(String, nullable=False)
     chunking_method = Column(String, nullable=False)
     embedding_model = Column(String, nullable=False)
+    embedding_projection = Column(String, nullable=True)  # PCA projection version, None for full-width vectors
     total_chunks = Column(Integer, nullable=False)
     upload_timestamp = Column(DateTime, default=datetime.utcnow)
     file_size = Column(Integer, nullable=False)
+    content_hash = Column(String, index=True, nullable=True)  # sha256 of the uploaded file
     processed = Column(Boolean, default=True)
 
     def __repr__(self):
         return f"<DocumentMetadata(id={self.id}, filename='{self.filename}')>"
 
+class ChunkRecord(Base):
+    """A chunk embedded and stored once in the vector store; near-duplicates reference it"""
+    __tablename__ = "chunk_records"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    vector_id = Column(String, unique=True, index=True, nullable=False)
+    document_id = Column(String, index=True, nullable=False)  # document whose copy was embedded
+    chunk_index = Column(Integer, nullable=False)
+    embedding_model = Column(String, nullable=False)
+    embedding_projection = Column(String, nullable=True)  # PCA projection version, None for full-width vectors
+    signature = Column(LargeBinary, nullable=False)  # MinHash signature, uint64 per permutation; empty without word shingles
+    text_length = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ChunkRecord(id={self.id}, vector_id='{self.vector_id}')>"
+
+class ChunkLSHBucket(Base):
+    """One LSH band hash of a stored chunk's signature"""
+    __tablename__ = "chunk_lsh_buckets"
+    
+    id = Column(Integer, primary_key=True)
+    band = Column(Integer, nullable=False)
+    bucket = Column(BigInteger, nullable=False)
+    chunk_id = Column(Integer, ForeignKey("chunk_records.id"), nullable=False)
+
+    __table_args__ = (
+        Index("ix_chunk_lsh_buckets_bucket_band", "bucket", "band"),
+    )
+
+class ChunkReference(Base):
+    """Back-reference from every (document, chunk position) to the stored chunk that holds its text"""
+    __tablename__ = "chunk_references"
+    
+    id = Column(Integer, primary_key=True)
+    chunk_id = Column(Integer, ForeignKey("chunk_records.id"), nullable=False, index=True)
+    document_id = Column(String, index=True, nullable=False)
+    chunk_index = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<ChunkReference(chunk_id={self.chunk_id}, document_id='{self.document_id}', chunk_index={self.chunk_index})>"
+
 class BookingRequest(Base):
     __tablename__ = "booking_requests"
     
@@ -33,5 +77,53 @@ class BookingRequest(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     notes = Column(Text, nullable=True)
 
+    # Composite (filter, id) indexes back the keyset-paginated list filters
+    __table_args__ = (
+        Index("ix_booking_requests_email_id", "email", "id"),
+        Index("ix_booking_requests_status_id", "status", "id"),
+        Index("ix_booking_requests_date_id", "booking_date", "id"),
+        # At most one active booking per slot; cancelled bookings free the slot again
+        Index(
+            "uq_booking_requests_active_slot",
+            "booking_date",
+            "booking_time",
+            unique=True,
+            sqlite_where=text("status != 'cancelled'"),
+            postgresql_where=text("status != 'cancelled'")
+        ),
+    )
+
     def __repr__(self):
         return f"<BookingRequest(id={self.id}, full_name='{self.full_name}', date={self.booking_date})>"
+
+class BookingDayOccupancy(Base):
+    __tablename__ = "booking_day_occupancy"
+    
+    # Bit i of occupied_mask is set when the i-th slot of the day is booked
+    day = Column(Date, primary_key=True)
+    occupied_mask = Column(BigInteger, default=0, nullable=False)
+
+    def __repr__(self):
+        return f"<BookingDayOccupancy(day={self.day}, occupied_mask={self.occupied_mask:#x})>"
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    booking_id = Column(Integer, ForeignKey("booking_requests.id"), nullable=True, index=True)
+    recipient = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+    status = Column(String, default="pending", nullable=False)  # pending | sending | sent | failed
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+    def __repr__(self):
+        return f"<EmailOutbox(id={self.id}, recipient='{self.recipient}', status='{self.status}')>"
@@ -1,7 +1,12 @@
 import redis
 import json
-from typing import Dict, List, Optional
+import heapq
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
 from app.config import settings
+from app.core.metrics import track_stage, record_cache
+from app.core.circuit_breaker import redis_breaker
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,10 +15,15 @@ class RedisMemoryStore:
     def __init__(self):
         self.redis_client = None
         self._memory_store = {}
+        self._counter_expiry: List[Tuple[float, str]] = []  # (expires_at, key) of fallback counters
+        self._counter_lock = threading.Lock()
         self._initialize_redis()
     
     def _initialize_redis(self):
         """Initialize Redis connection with fallback"""
+        if settings.REDIS_BACKEND == "memory":
+            logger.info("Using in-memory conversation store (REDIS_BACKEND=memory)")
+            return
         try:
             self.redis_client = redis.Redis(
                 host=settings.REDIS_HOST,
@@ -36,16 +46,25 @@ class RedisMemoryStore:
             logger.error(f" Redis initialization error: {e}")
             self.redis_client = None
     
+    def _use_redis(self) -> bool:
+        """Redis is configured and its circuit breaker is not failing calls fast"""
+        return self.redis_client is not None and not redis_breaker.rejecting
+    
     def _get_conversation_key(self, session_id: str) -> str:
         """Get Redis key for conversation"""
         return f"conversation:{session_id}"
     
+    def _get_summary_key(self, session_id: str) -> str:
+        """Get Redis key for the compacted conversation summary"""
+        return f"conversation_summary:{session_id}"
+    
     def store_conversation(self, session_id: str, conversation: List[Dict]):
         """Store conversation history"""
         try:
-            if self.redis_client:
+            if self._use_redis():
                 key = self._get_conversation_key(session_id)
-                self.redis_client.setex(key, 3600, json.dumps(conversation))
+                with redis_breaker.guard(), track_stage("redis", "store_conversation"):
+                    self.redis_client.setex(key, 3600, json.dumps(conversation))
             else:
                 self._memory_store[self._get_conversation_key(session_id)] = conversation
         except Exception as e:
@@ -58,11 +77,16 @@ class RedisMemoryStore:
         try:
             key = self._get_conversation_key(session_id)
             
-            if self.redis_client:
-                data = self.redis_client.get(key)
-                return json.loads(data) if data else []
+            if self._use_redis():
+                with redis_breaker.guard(), track_stage("redis", "get_conversation"):
+                    data = self.redis_client.get(key)
             else:
-                return self._memory_store.get(key, [])
+                data = self._memory_store.get(key)
+            
+            record_cache("conversation", bool(data))
+            if isinstance(data, str):
+                return json.loads(data)
+            return data or []
                 
         except Exception as e:
             logger.error(f" Failed to get conversation: {e}")
@@ -80,24 +104,84 @@ class RedisMemoryStore:
         except Exception as e:
             logger.error(f" Failed to add message: {e}")
     
+    def store_summary(self, session_id: str, summary: str):
+        """Store the running summary of turns evicted from the history window"""
+        try:
+            if self._use_redis():
+                key = self._get_summary_key(session_id)
+                with redis_breaker.guard(), track_stage("redis", "store_summary"):
+                    self.redis_client.setex(key, 3600, summary)
+            else:
+                self._memory_store[self._get_summary_key(session_id)] = summary
+        except Exception as e:
+            logger.error(f" Failed to store summary: {e}")
+            self._memory_store[self._get_summary_key(session_id)] = summary
+    
+    def get_summary(self, session_id: str) -> str:
+        """Retrieve the running conversation summary"""
+        try:
+            key = self._get_summary_key(session_id)
+            
+            if self._use_redis():
+                with redis_breaker.guard(), track_stage("redis", "get_summary"):
+                    return self.redis_client.get(key) or ""
+            else:
+                return self._memory_store.get(key, "")
+                
+        except Exception as e:
+            logger.error(f" Failed to get summary: {e}")
+            return ""
+    
     def clear_conversation(self, session_id: str):
         """Clear conversation history"""
         try:
             key = self._get_conversation_key(session_id)
+            summary_key = self._get_summary_key(session_id)
             
-            if self.redis_client:
-                self.redis_client.delete(key)
+            if self._use_redis():
+                with redis_breaker.guard(), track_stage("redis", "delete"):
+                    self.redis_client.delete(key, summary_key)
             else:
                 self._memory_store.pop(key, None)
+                self._memory_store.pop(summary_key, None)
                 
         except Exception as e:
             logger.error(f" Failed to clear conversation: {e}")
     
+    def increment_counter(self, key: str, ttl: int) -> int:
+        """Increment a counter that expires ttl seconds after its last increment, returns the new value"""
+        try:
+            if self._use_redis():
+                with redis_breaker.guard(), track_stage("redis", "increment_counter"):
+                    pipe = self.redis_client.pipeline()
+                    pipe.incr(key)
+                    pipe.expire(key, ttl)
+                    return pipe.execute()[0]
+        except Exception as e:
+            logger.error(f" Failed to increment counter: {e}")
+
+        # Fallback counters carry their own expiry. Expired ones are dropped lazily from the
+        # front of an expiry heap, so each increment costs O(log n) rather than a scan of the store
+        with self._counter_lock:
+            now = time.time()
+            while self._counter_expiry and self._counter_expiry[0][0] <= now:
+                _, stale = heapq.heappop(self._counter_expiry)
+                value = self._memory_store.get(stale)
+                if isinstance(value, tuple) and value[1] <= now:
+                    del self._memory_store[stale]
+
+            count, expires_at = self._memory_store.get(key, (0, 0))
+            count = count + 1 if expires_at > now else 1
+            self._memory_store[key] = (count, now + ttl)
+            heapq.heappush(self._counter_expiry, (now + ttl, key))
+            return count
+    
     def get_all_sessions(self) -> List[str]:
         """Get all active session IDs"""
         try:
-            if self.redis_client:
-                keys = self.redis_client.keys("conversation:*")
+            if self._use_redis():
+                with redis_breaker.guard():
+                    keys = self.redis_client.keys("conversation:*")
                 return [key.replace("conversation:", "") for key in keys]
             else:
                 keys = list(self._memory_store.keys())
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import logging
@@ -8,6 +8,11 @@ import os
 from app.api import upload, rag_agent, booking
 from app.db.metadata_db import create_tables
 from app.config import settings
+from prometheus_client import CONTENT_TYPE_LATEST
+from app.core.metrics import PrometheusMiddleware, render_metrics
+from app.core.profiling import ProfilingMiddleware
+from app.api.upload import UploadSizeLimitMiddleware
+from app.core.admission import AdmissionControlMiddleware
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -24,23 +29,26 @@ async def lifespan(app: FastAPI):
         create_tables()
         logger.info("Database tables created successfully")
         
-        # Test connections
-        from app.db.redis_memory import memory_store
-        from app.core.vector_store import vector_store
-        
-        # Test Redis connection
+        # Backfill the slot occupancy index for bookings made before it existed
+        from app.db.metadata_db import SessionLocal
+        from app.core.availability import slot_index
+        db = SessionLocal()
         try:
-            memory_store.redis_client.ping() if memory_store.redis_client else None
-            logger.info("Redis connection successful")
-        except Exception as e:
-            logger.warning(f" Redis connection failed, using in-memory fallback: {e}")
+            slot_index.ensure_built(db)
+        finally:
+            db.close()
         
-        # Test Pinecone connection
-        try:
-            vector_store.test_connection()
-            logger.info(" Pinecone connection successful")
-        except Exception as e:
-            logger.error(f" Pinecone connection failed: {e}")
+        # Start delivering queued confirmation emails
+        if settings.EMAIL_OUTBOX_ENABLED:
+            from app.utils.email_utils import email_outbox_sender
+            email_outbox_sender.start()
+        
+        # Probe dependencies once so startup logs their state, then keep polling in the
+        # background; /health serves the cached result
+        from app.core.health import dependency_monitor
+        dependency_monitor.check_all()
+        if settings.HEALTH_CHECK_INTERVAL > 0:
+            dependency_monitor.start()
             
         logger.info(" Application startup complete")
         
@@ -51,6 +59,11 @@ async def lifespan(app: FastAPI):
     yield
     
     # Shutdown
+    from app.core.health import dependency_monitor
+    dependency_monitor.stop()
+    if settings.EMAIL_OUTBOX_ENABLED:
+        from app.utils.email_utils import email_outbox_sender
+        email_outbox_sender.stop()
     logger.info(" Application shutdown")
 
 # Create FastAPI app instance
@@ -61,6 +74,11 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Concurrency limits, bounded queues and per-session rate limits; inside CORS and metrics
+# so shed responses still carry CORS headers and show up in request metrics
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(AdmissionControlMiddleware)
+
 # Enable CORS
 app.add_middleware(
     CORSMiddleware,
@@ -70,6 +88,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency and in-flight metrics
+app.add_middleware(PrometheusMiddleware)
+
+# Refuse oversized uploads before the multipart body is parsed
+app.add_middleware(UploadSizeLimitMiddleware)
+
+# Opt-in per-request profiling; not installed at all unless enabled
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
 # Include API routers
 app.include_router(upload.router, prefix="/api/v1/upload", tags=["Upload"])
 app.include_router(rag_agent.router, prefix="/api/v1/rag", tags=["RAG Agent"])
@@ -84,36 +112,16 @@ async def root():
         "status": "healthy"
     }
 
-# Health check route
+# Health check route; served from the dependency monitor's cache, never blocks on a dependency
 @app.get("/health")
 async def health_check():
-    health_status = {
-        "status": "healthy",
-        "database": "connected",
-        "redis": "unknown",
-        "vector_db": "unknown"
-    }
-    
-    # Check Redis
-    try:
-        from app.db.redis_memory import memory_store
-        if memory_store.redis_client:
-            memory_store.redis_client.ping()
-            health_status["redis"] = "connected"
-        else:
-            health_status["redis"] = "fallback"
-    except Exception:
-        health_status["redis"] = "disconnected"
-    
-    # Check Pinecone
-    try:
-        from app.core.vector_store import vector_store
-        vector_store.test_connection()
-        health_status["vector_db"] = "connected"
-    except Exception:
-        health_status["vector_db"] = "disconnected"
-    
-    return health_status
+    from app.core.health import dependency_monitor
+    return dependency_monitor.health()
+
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE_LATEST)
 
 # Error handlers
 @app.exception_handler(Exception)
@@ -2,52 +2,352 @@
 
 import smtplib
 import ssl
+import random
+import threading
+import time
+from datetime import datetime, timedelta
 from email.message import EmailMessage
+from collections import deque
+from typing import Deque, Optional, Tuple, Union
+from sqlalchemy.orm import Session
 from app.config import settings
+from app.core.metrics import track_stage
+from app.core.circuit_breaker import smtp_breaker
+from app.db.metadata_db import SessionLocal
+from app.db.models import BookingRequest, EmailOutbox
 import logging
 
 logger = logging.getLogger(__name__)
 
-def send_booking_confirmation(receiver_email: str, full_name: str, date: str, time: str) -> bool:
-    """
-    Sends a booking confirmation email.
-    Returns True if successful, False otherwise.
-    """
-    try:
-        smtp_server = settings.SMTP_SERVER
-        port = settings.SMTP_PORT
-        sender_email = settings.SMTP_SENDER_EMAIL
-        password = settings.SMTP_PASSWORD
-
-        subject = "Interview Booking Confirmation"
-        body = f"""
+def get_sender_email() -> str:
+    return settings.SMTP_SENDER_EMAIL or settings.SMTP_USERNAME
+
+def build_booking_confirmation(full_name: str, date: str, booking_time: str) -> Tuple[str, str]:
+    """Returns the subject and body of a booking confirmation email"""
+    subject = "Interview Booking Confirmation"
+    body = f"""
 Dear {full_name},
 
 Your interview has been successfully booked for:
 📅 Date: {date}
-⏰ Time: {time}
+⏰ Time: {booking_time}
 
 We look forward to speaking with you!
 
-Best regards,  
+Best regards,
 Team
         """
+    return subject, body
 
-        message = EmailMessage()
-        message.set_content(body)
-        message["Subject"] = subject
-        message["From"] = sender_email
-        message["To"] = receiver_email
+def enqueue_booking_confirmation(db: Session, booking: BookingRequest) -> EmailOutbox:
+    """
+    Adds a confirmation email for the booking to the outbox.
+    The caller commits, so the email is written in the same transaction as the booking.
+    """
+    subject, body = build_booking_confirmation(
+        booking.full_name,
+        booking.booking_date.strftime("%Y-%m-%d"),
+        booking.booking_time
+    )
+    email = EmailOutbox(
+        booking_id=booking.id,
+        recipient=booking.email,
+        subject=subject,
+        body=body,
+        status="pending",
+        attempts=0,
+        next_attempt_at=datetime.utcnow()
+    )
+    db.add(email)
+    return email
+
+class SMTPConnection:
+    """A single SMTP session that is opened lazily and reused across messages"""
+
+    def __init__(
+        self,
+        host: str = settings.SMTP_SERVER,
+        port: int = settings.SMTP_PORT,
+        security: str = settings.SMTP_SECURITY,
+        username: str = settings.SMTP_USERNAME,
+        password: str = settings.SMTP_PASSWORD,
+        timeout: float = settings.SMTP_TIMEOUT,
+        idle_timeout: float = settings.SMTP_IDLE_TIMEOUT
+    ):
+        if security not in ("ssl", "starttls", "none"):
+            raise ValueError(f"Unknown SMTP security mode: {security}")
+        self.host = host
+        self.port = port
+        self.security = security
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self._server: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+
+    def _connect(self):
+        with track_stage("smtp", "connect"):
+            if self.security == "ssl":
+                server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout, context=ssl.create_default_context())
+            else:
+                server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+                if self.security == "starttls":
+                    server.starttls(context=ssl.create_default_context())
+            if self.username:
+                server.login(self.username, self.password)
+        self._server = server
+        logger.info(f"SMTP connection opened to {self.host}:{self.port}")
+
+    def send(self, message: EmailMessage):
+        """Send over the open session, reconnecting once if the server dropped it"""
+        with smtp_breaker.guard():
+            if self._server is None:
+                self._connect()
+            try:
+                with track_stage("smtp", "send"):
+                    self._server.send_message(message)
+            except smtplib.SMTPServerDisconnected:
+                self.close()
+                self._connect()
+                with track_stage("smtp", "send"):
+                    self._server.send_message(message)
+        self._last_used = time.monotonic()
+
+    @property
+    def connected(self) -> bool:
+        return self._server is not None
 
-        context = ssl.create_default_context()
+    def close_if_idle(self):
+        if self._server is not None and time.monotonic() - self._last_used > self.idle_timeout:
+            self.close()
 
-        with smtplib.SMTP_SSL(smtp_server, port, context=context) as server:
-            server.login(sender_email, password)
-            server.send_message(message)
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+            self._server = None
 
-        logger.info(f"Confirmation email sent to {receiver_email}")
+class SMTPSink:
+    """Stand-in for SMTPConnection that keeps the latest messages in memory instead of sending them.
+
+    Selected with SMTP_BACKEND=sink for load tests and offline runs.
+    """
+
+    def __init__(self, keep: int = 1000):
+        self.messages: Deque[EmailMessage] = deque(maxlen=keep)
+        self.sent = 0
+
+    def send(self, message: EmailMessage):
+        with track_stage("smtp", "sink"):
+            self.messages.append(message)
+            self.sent += 1
+
+    @property
+    def connected(self) -> bool:
         return True
 
-    except Exception as e:
-        logger.error(f"Failed to send email: {str(e)}")
-        return False
+    def close_if_idle(self):
+        pass
+
+    def close(self):
+        pass
+
+def create_smtp_connection():
+    """Build the SMTP connection selected by SMTP_BACKEND"""
+    backend = settings.SMTP_BACKEND
+    if backend == "smtp":
+        return SMTPConnection()
+    elif backend == "sink":
+        logger.info("Using in-memory SMTP sink, confirmation emails are not delivered")
+        return SMTPSink()
+    else:
+        raise ValueError(f"Unknown SMTP backend: {backend}")
+
+class EmailOutboxSender:
+    """
+    Background thread draining the email outbox over a persistent SMTP connection.
+
+    Rows are claimed with a compare-and-set on (status, next_attempt_at) so several
+    API workers can run a sender against the same database without double sending.
+    A claim is a lease and counts as an attempt: a row left in "sending" by a crashed
+    worker becomes claimable again once its lease expires, and a message that keeps
+    crashing or hanging its sender still runs out of attempts. Failed sends are
+    retried with exponential backoff until EMAIL_OUTBOX_MAX_ATTEMPTS, then marked
+    "failed".
+
+    For local testing point SMTP_SERVER/SMTP_PORT at a stand-in such as
+    ``python -m aiosmtpd -n -l localhost:1025`` with SMTP_SECURITY=none, or set
+    SMTP_BACKEND=sink to keep messages in memory.
+    """
+
+    def __init__(
+        self,
+        connection: Optional[Union[SMTPConnection, SMTPSink]] = None,
+        session_factory=SessionLocal,
+        batch_size: int = settings.EMAIL_OUTBOX_BATCH_SIZE,
+        poll_interval: float = settings.EMAIL_OUTBOX_POLL_INTERVAL,
+        max_attempts: int = settings.EMAIL_OUTBOX_MAX_ATTEMPTS,
+        backoff_base: float = settings.EMAIL_OUTBOX_BACKOFF_BASE,
+        backoff_max: float = settings.EMAIL_OUTBOX_BACKOFF_MAX,
+        lease_seconds: int = settings.EMAIL_OUTBOX_LEASE_SECONDS
+    ):
+        self.connection = connection or create_smtp_connection()
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease_seconds = lease_seconds
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="email-outbox-sender", daemon=True)
+        self._thread.start()
+        logger.info("Email outbox sender started")
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self.connection.close()
+
+    def notify(self):
+        """Wake the sender after new mail was committed"""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            # While the SMTP breaker is open, leave the outbox alone instead of
+            # spending delivery attempts on a server known to be down
+            if smtp_breaker.rejecting:
+                claimed = 0
+            else:
+                try:
+                    claimed = self.drain_once()
+                except Exception as e:
+                    logger.error(f"Email outbox drain failed: {e}")
+                    claimed = 0
+
+            # A full batch means there is probably more waiting
+            if claimed < self.batch_size:
+                self.connection.close_if_idle()
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+        self.connection.close()
+
+    def _backoff(self, attempts: int) -> timedelta:
+        delay = min(self.backoff_base * (2 ** (attempts - 1)), self.backoff_max)
+        return timedelta(seconds=delay * random.uniform(0.5, 1.5))
+
+    def _build_message(self, email: EmailOutbox) -> EmailMessage:
+        message = EmailMessage()
+        message.set_content(email.body)
+        message["Subject"] = email.subject
+        message["From"] = get_sender_email()
+        message["To"] = email.recipient
+        return message
+
+    def _claim(self, db: Session) -> list:
+        now = datetime.utcnow()
+        candidates = (
+            db.query(EmailOutbox.id, EmailOutbox.status, EmailOutbox.next_attempt_at)
+            .filter(EmailOutbox.status.in_(("pending", "sending")), EmailOutbox.next_attempt_at <= now)
+            .order_by(EmailOutbox.id)
+            .limit(self.batch_size)
+            .all()
+        )
+
+        claimed = []
+        lease_until = now + timedelta(seconds=self.lease_seconds)
+        for email_id, status, next_attempt_at in candidates:
+            updated = (
+                db.query(EmailOutbox)
+                .filter(
+                    EmailOutbox.id == email_id,
+                    EmailOutbox.status == status,
+                    EmailOutbox.next_attempt_at == next_attempt_at
+                )
+                .update(
+                    {"status": "sending", "next_attempt_at": lease_until, "attempts": EmailOutbox.attempts + 1},
+                    synchronize_session=False
+                )
+            )
+            if updated:
+                claimed.append(email_id)
+        db.commit()
+        return claimed
+
+    def drain_once(self) -> int:
+        """Claim and send one batch, returns the number of claimed emails"""
+        db = self.session_factory()
+        try:
+            claimed = self._claim(db)
+            if not claimed:
+                return 0
+
+            emails = db.query(EmailOutbox).filter(EmailOutbox.id.in_(claimed)).order_by(EmailOutbox.id).all()
+            for position, email in enumerate(emails):
+                if smtp_breaker.rejecting:
+                    # Breaker opened mid-batch: hand the rest back without spending attempts
+                    retry_at = datetime.utcnow() + timedelta(seconds=smtp_breaker.retry_after)
+                    for remaining in emails[position:]:
+                        remaining.status = "pending"
+                        remaining.next_attempt_at = retry_at
+                        remaining.attempts -= 1
+                    db.commit()
+                    break
+
+                if email.attempts > self.max_attempts:
+                    # Failed sends stop at max_attempts, so only claims lost mid-send get here
+                    email.status = "failed"
+                    email.last_error = email.last_error or "Sender lost the message while sending"
+                    logger.error(f"Giving up on email {email.id} to {email.recipient} after {self.max_attempts} lost attempts")
+                    db.commit()
+                    continue
+
+                try:
+                    self.connection.send(self._build_message(email))
+                    email.status = "sent"
+                    email.sent_at = datetime.utcnow()
+                    email.last_error = None
+                    logger.info(f"Confirmation email sent to {email.recipient}")
+                except Exception as e:
+                    email.last_error = str(e)
+                    if email.attempts >= self.max_attempts:
+                        email.status = "failed"
+                        logger.error(f"Giving up on email {email.id} to {email.recipient}: {e}")
+                    else:
+                        email.status = "pending"
+                        email.next_attempt_at = datetime.utcnow() + self._backoff(email.attempts)
+                        logger.warning(f"Email {email.id} to {email.recipient} failed, will retry: {e}")
+
+                    if not self.connection.connected:
+                        # Server unreachable: hand the rest of the batch back instead of
+                        # paying a connect timeout per message
+                        retry_at = datetime.utcnow() + self._backoff(1)
+                        for remaining in emails[position + 1:]:
+                            remaining.status = "pending"
+                            remaining.next_attempt_at = retry_at
+                            remaining.attempts -= 1
+                        db.commit()
+                        break
+                # Persist per message so a crash mid-batch does not resend delivered mail
+                db.commit()
+
+            return len(claimed)
+        finally:
+            db.close()
+
+# Global instance
+email_outbox_sender = EmailOutboxSender()
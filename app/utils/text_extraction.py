@@ -0,0 +1,19 @@
+# app/utils/text_extraction.py
+
+import os
+import PyPDF2
+
+def extract_text_from_pdf(file_path: str) -> str:
+    with open(file_path, "rb") as f:
+        pdf_reader = PyPDF2.PdfReader(f)
+        return ''.join([page.extract_text() for page in pdf_reader.pages if page.extract_text()])
+
+def extract_text_from_txt(file_path: str) -> str:
+    with open(file_path, "r", encoding="utf-8") as f:
+        return f.read()
+
+def extract_text(file_path: str) -> str:
+    """Extract text from a stored .pdf or .txt upload"""
+    if os.path.splitext(file_path)[1].lower() == ".pdf":
+        return extract_text_from_pdf(file_path)
+    return extract_text_from_txt(file_path)
@@ -0,0 +1,71 @@
+# benchmarks/common.py
+"""Timing, statistics and result-file helpers shared by the benchmark suites"""
+
+from typing import Callable, Dict, List, Optional
+from datetime import datetime
+import json
+import os
+import platform
+import subprocess
+import time
+
+import numpy as np
+
+def summarize(samples: List[float]) -> Dict:
+    """Latency summary in seconds"""
+    if not samples:
+        return {"count": 0}
+    values = np.asarray(samples, dtype=np.float64)
+    return {
+        "count": len(samples),
+        "mean": float(values.mean()),
+        "min": float(values.min()),
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+        "p99": float(np.percentile(values, 99)),
+        "max": float(values.max())
+    }
+
+def measure(fn: Callable[[], object], repeat: int = 5, warmup: int = 1) -> Dict:
+    """Run fn warmup + repeat times and summarize the timed runs"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+def environment_info(**extra) -> Dict:
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        **extra
+    }
+
+def result_key(result: Dict) -> str:
+    """Stable identity of a benchmark case, used to line up runs across commits"""
+    params = ",".join(f"{k}={result['params'][k]}" for k in sorted(result["params"]))
+    return f"{result['suite']}/{result['name']}[{params}]"
+
+def write_results(path: str, meta: Dict, results: List[Dict]):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2)
+
+def load_results(path: str) -> Dict:
+    with open(path) as f:
+        return json.load(f)
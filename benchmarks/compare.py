@@ -0,0 +1,47 @@
+# benchmarks/compare.py
+"""Compare two benchmark result files and flag latency regressions.
+
+    python -m benchmarks.compare benchmarks/results/base.json benchmarks/results/head.json
+"""
+
+import argparse
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.common import load_results, result_key
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare benchmark results between two runs")
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--stat", default="p50", choices=["mean", "p50", "p95", "p99", "max"])
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative slowdown counted as a regression")
+    args = parser.parse_args()
+
+    base, head = load_results(args.base), load_results(args.head)
+    base_by_key = {result_key(r): r for r in base["results"]}
+
+    print(f"base {base['meta'].get('commit')}  head {head['meta'].get('commit')}  stat {args.stat}")
+    regressions = 0
+    for result in head["results"]:
+        key = result_key(result)
+        previous = base_by_key.get(key)
+        new_value = result["latency"].get(args.stat)
+        if previous is None or not previous["latency"].get(args.stat) or new_value is None:
+            print(f"  {'new':>9}  {key}")
+            continue
+
+        old_value = previous["latency"][args.stat]
+        change = (new_value - old_value) / old_value
+        flag = "REGRESSED" if change > args.threshold else ""
+        regressions += bool(flag)
+        print(f"  {change:+9.1%}  {key}  {old_value * 1000:.2f} -> {new_value * 1000:.2f} ms  {flag}")
+
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# benchmarks/corpus.py
+"""Deterministic synthetic corpus generator (plain text and PDF)"""
+
+from typing import List
+import argparse
+import os
+import random
+import re
+
+WORDS = (
+    "candidate interview schedule document retrieval vector embedding search "
+    "policy benefit salary contract engineer manager team project deadline "
+    "report analysis customer support product release feature request review "
+    "security compliance audit training onboarding office remote hybrid travel "
+    "expense budget forecast revenue quarter annual meeting agenda summary "
+    "question answer context chunk index latency throughput memory storage"
+).split()
+
+SIZE_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*(B|KB|MB|GB)?\s*$", re.IGNORECASE)
+SIZE_UNITS = {"B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}
+
+# PDF page layout
+PDF_LINE_CHARS = 90
+PDF_LINES_PER_PAGE = 60
+
+def parse_size(size: str) -> int:
+    """Parse sizes like '64KB' or '10MB' into bytes"""
+    match = SIZE_PATTERN.match(str(size))
+    if not match:
+        raise ValueError(f"Invalid size: {size}")
+    return int(float(match.group(1)) * SIZE_UNITS[(match.group(2) or "B").upper()])
+
+def generate_text(num_bytes: int, seed: int = 0) -> str:
+    """Generate roughly num_bytes of sentence/paragraph structured text"""
+    rng = random.Random(seed)
+    parts: List[str] = []
+    total = 0
+
+    while total < num_bytes:
+        sentences = []
+        for _ in range(rng.randint(3, 8)):
+            words = rng.choices(WORDS, k=rng.randint(6, 20))
+            sentences.append(" ".join(words).capitalize() + ".")
+        paragraph = " ".join(sentences)
+        parts.append(paragraph)
+        total += len(paragraph) + 2
+
+    return "\n\n".join(parts)[:num_bytes]
+
+def _pdf_escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def _wrap(text: str, width: int) -> List[str]:
+    lines = []
+    for paragraph in text.split("\n"):
+        while len(paragraph) > width:
+            cut = paragraph.rfind(" ", 0, width)
+            cut = cut if cut > 0 else width
+            lines.append(paragraph[:cut])
+            paragraph = paragraph[cut:].lstrip()
+        lines.append(paragraph)
+    return lines
+
+def write_pdf(text: str, path: str):
+    """Write text as a minimal multi-page PDF that PyPDF2 can extract"""
+    lines = _wrap(text, PDF_LINE_CHARS)
+    pages = [lines[i:i + PDF_LINES_PER_PAGE] for i in range(0, len(lines), PDF_LINES_PER_PAGE)] or [[]]
+
+    # Object numbers: 1 catalog, 2 page tree, 3 font, then (page, content) pairs
+    objects = {3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+    page_refs = []
+    for i, page_lines in enumerate(pages):
+        page_num, content_num = 4 + 2 * i, 5 + 2 * i
+        ops = ["BT", "/F1 10 Tf", "12 TL", "40 800 Td"]
+        ops.extend(f"({_pdf_escape(line)}) Tj T*" for line in page_lines)
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1", errors="replace")
+        objects[content_num] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+        objects[page_num] = (
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_num
+        )
+        page_refs.append(b"%d 0 R" % page_num)
+
+    objects[1] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[2] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(page_refs), len(pages))
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = {}
+        for num in sorted(objects):
+            offsets[num] = f.tell()
+            f.write(b"%d 0 obj\n%s\nendobj\n" % (num, objects[num]))
+
+        xref_offset = f.tell()
+        count = max(objects) + 1
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % count)
+        for num in range(1, count):
+            f.write(b"%010d 00000 n \n" % offsets[num])
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (count, xref_offset))
+
+def generate_file(directory: str, size: str, kind: str = "txt", seed: int = 0) -> str:
+    """Generate a corpus file of the given size and kind, returns its path"""
+    os.makedirs(directory, exist_ok=True)
+    num_bytes = parse_size(size)
+    path = os.path.join(directory, f"synthetic_{num_bytes}_{seed}.{kind}")
+    if os.path.exists(path):
+        return path
+
+    text = generate_text(num_bytes, seed=seed)
+    if kind == "txt":
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+    elif kind == "pdf":
+        write_pdf(text, path)
+    else:
+        raise ValueError(f"Unknown corpus file kind: {kind}")
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic benchmark corpus")
+    parser.add_argument("--output", default="benchmarks/corpus")
+    parser.add_argument("--sizes", nargs="+", default=["4KB", "64KB", "1MB", "10MB"])
+    parser.add_argument("--kinds", nargs="+", default=["txt", "pdf"], choices=["txt", "pdf"])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        for kind in args.kinds:
+            print(generate_file(args.output, size, kind, seed=args.seed))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+# benchmarks/evaluate.py
+"""Offline retrieval evaluation: quality vs cost per chunking configuration and index mode.
+
+Ingests a corpus under each chunking configuration and index mode, asks every
+question, and reports recall@k, MRR, index size, ingest time and query latency
+side by side. A retrieved chunk counts as relevant when it covers at least
+``--min-coverage`` of a relevant passage's word trigrams, which works for every
+chunker regardless of how it reflows text.
+
+Dataset: ``--corpus`` is a directory of .txt/.pdf files and ``--questions`` a
+JSONL file with one ``{"question": ..., "relevant": ["passage", ...]}`` per
+line. Without them a synthetic corpus with planted facts is generated.
+
+    python -m benchmarks.evaluate --configs recursive:500:100 recursive:1000:200 custom:512:50
+    python -m benchmarks.evaluate --corpus data/docs --questions data/qa.jsonl --index-modes memory local
+"""
+
+from typing import Dict, List, Tuple
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.common import summarize, environment_info, write_results
+from benchmarks.corpus import generate_text
+from benchmarks.run import configure_environment, install_stub_models
+
+DEFAULT_CONFIGS = [
+    "recursive:500:100",
+    "recursive:1000:200",
+    "recursive:1500:300",
+    "custom:256:32",
+    "custom:512:50",
+    "semantic"
+]
+INDEX_MODES = ["memory", "local"]
+K_VALUES = [1, 3, 5, 10]
+
+WORD_PATTERN = re.compile(r"\w+")
+SYLLABLES = ["ka", "lo", "mi", "ren", "tas", "vo", "zu", "pel", "dra", "qui", "nor", "bex"]
+ATTRIBUTES = ["office", "budget", "manager", "deadline", "supplier", "region"]
+
+def parse_config(spec: str) -> Dict:
+    """'method[:chunk_size[:overlap]]' -> chunking parameters"""
+    parts = spec.split(":")
+    if parts[0] not in ("recursive", "semantic", "custom") or len(parts) > 3:
+        raise ValueError(f"Invalid chunking config: {spec}")
+    return {
+        "name": spec,
+        "method": parts[0],
+        "chunk_size": int(parts[1]) if len(parts) > 1 and parts[1] else None,
+        "overlap": int(parts[2]) if len(parts) > 2 and parts[2] else None
+    }
+
+def shingles(text: str, n: int = 3) -> set:
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < n:
+        return set(words)
+    return {" ".join(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+def _pseudo_word(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(3))
+
+def synthetic_dataset(num_documents: int, document_size: int, facts_per_document: int, seed: int = 0) -> Tuple[Dict[str, str], List[Dict]]:
+    """Filler documents with planted facts; each question asks for one fact"""
+    rng = random.Random(seed)
+    documents, questions = {}, []
+    for d in range(num_documents):
+        paragraphs = generate_text(document_size, seed=seed * 1000 + d).split("\n\n")
+        for _ in range(facts_per_document):
+            entity, value, attribute = _pseudo_word(rng), _pseudo_word(rng), rng.choice(ATTRIBUTES)
+            fact = f"The {attribute} of project {entity} is {value} according to the annual review."
+            position = rng.randrange(len(paragraphs))
+            paragraphs[position] = f"{paragraphs[position]} {fact}"
+            questions.append({"question": f"What is the {attribute} of project {entity}?", "relevant": [fact]})
+        documents[f"doc-{d:03d}.txt"] = "\n\n".join(paragraphs)
+    return documents, questions
+
+def load_dataset(corpus_dir: str, questions_path: str) -> Tuple[Dict[str, str], List[Dict]]:
+    from app.utils.text_extraction import extract_text_from_pdf, extract_text_from_txt
+
+    documents = {}
+    for name in sorted(os.listdir(corpus_dir)):
+        path = os.path.join(corpus_dir, name)
+        if name.lower().endswith(".pdf"):
+            documents[name] = extract_text_from_pdf(path)
+        elif name.lower().endswith(".txt"):
+            documents[name] = extract_text_from_txt(path)
+
+    with open(questions_path) as f:
+        questions = [json.loads(line) for line in f if line.strip()]
+    return documents, questions
+
+def create_store(mode: str, workdir: str):
+    from app.core.projection import output_dimension
+    from app.core.vector_store import InMemoryVectorStore
+    from app.core.local_index import LocalVectorStore
+
+    if mode == "memory":
+        return InMemoryVectorStore(output_dimension())
+    elif mode == "local":
+        directory = os.path.join(workdir, "index")
+        shutil.rmtree(directory, ignore_errors=True)
+        return LocalVectorStore(directory, output_dimension(), background_compaction=False)
+    raise ValueError(f"Unknown index mode: {mode}")
+
+def index_size(store, mode: str) -> int:
+    """Bytes held by the index: resident arrays and records for memory, files on disk for local"""
+    if mode == "local":
+        store.compact()
+        return sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(store.directory) for name in names
+        )
+    matrix = store._get_matrix()
+    return matrix.nbytes + sum(len(t.encode("utf-8")) for t in store._texts) + sum(len(json.dumps(m)) for m in store._metadata)
+
+def ingest(store, documents: Dict[str, str], config: Dict) -> Dict:
+    from app.core.chunking import chunker
+    from app.core.embedding import embedding_generator
+
+    timings = {"chunking": 0.0, "embedding": 0.0, "indexing": 0.0}
+    total_chunks, chunk_chars = 0, 0
+    for name, text in documents.items():
+        start = time.perf_counter()
+        chunks, metrics = chunker.chunk_document(text, method=config["method"], chunk_size=config["chunk_size"], overlap=config["overlap"])
+        timings["chunking"] += time.perf_counter() - start
+        if metrics.get("status") != "success" or not chunks:
+            raise RuntimeError(f"Chunking {name} with {config['name']} failed: {metrics.get('error')}")
+
+        start = time.perf_counter()
+        embeddings, metrics = embedding_generator.generate_embeddings(chunks)
+        timings["embedding"] += time.perf_counter() - start
+        if metrics.get("status") != "success":
+            raise RuntimeError(f"Embedding {name} failed: {metrics.get('error')}")
+
+        start = time.perf_counter()
+        store.store_embeddings(embeddings, chunks, [{"document_id": name, "filename": name, "chunk_index": i} for i in range(len(chunks))])
+        timings["indexing"] += time.perf_counter() - start
+
+        total_chunks += len(chunks)
+        chunk_chars += sum(len(chunk) for chunk in chunks)
+
+    return {
+        "chunks": total_chunks,
+        "avg_chunk_chars": chunk_chars / total_chunks if total_chunks else 0,
+        "ingest_seconds": sum(timings.values()),
+        "stage_seconds": timings
+    }
+
+def score_ranking(hit_texts: List[str], relevant: List[str], max_k: int, min_coverage: float) -> Tuple[Dict[int, float], float]:
+    """Recall@k for k in K_VALUES and reciprocal rank of one ranked hit list"""
+    passages = [shingles(passage) for passage in relevant]
+
+    # For each hit, the set of relevant passages it covers
+    covered = []
+    for text in hit_texts:
+        chunk = shingles(text)
+        covered.append({
+            i for i, passage in enumerate(passages)
+            if passage and len(passage & chunk) / len(passage) >= min_coverage
+        })
+
+    recall = {}
+    for k in K_VALUES:
+        if k <= max_k:
+            found = set().union(*covered[:k]) if covered[:k] else set()
+            recall[k] = len(found) / len(passages) if passages else 0.0
+    first = next((rank for rank, hit_passages in enumerate(covered, 1) if hit_passages), None)
+    return recall, 1.0 / first if first else 0.0
+
+def evaluate_queries(store, questions: List[Dict], max_k: int, min_coverage: float) -> Dict:
+    from app.core.embedding import embedding_generator
+
+    recall = {k: [] for k in K_VALUES if k <= max_k}
+    reciprocal_ranks, latencies = [], []
+
+    for item in questions:
+        # Per-query latency as the API sees it: embed one question, then search
+        start = time.perf_counter()
+        embeddings, _ = embedding_generator.generate_embeddings([item["question"]])
+        hits, metrics = store.similarity_search(embeddings[0], top_k=max_k)
+        latencies.append(time.perf_counter() - start)
+        if metrics.get("status") != "success":
+            raise RuntimeError(f"Search failed: {metrics.get('error')}")
+
+        query_recall, reciprocal_rank = score_ranking([hit.text for hit in hits], item["relevant"], max_k, min_coverage)
+        for k, value in query_recall.items():
+            recall[k].append(value)
+        reciprocal_ranks.append(reciprocal_rank)
+
+    return {
+        "recall": {f"@{k}": float(np.mean(values)) for k, values in recall.items()},
+        "mrr": float(np.mean(reciprocal_ranks)),
+        "latency": summarize(latencies)
+    }
+
+def print_table(results: List[Dict], max_k: int):
+    recall_columns = [f"@{k}" for k in K_VALUES if k <= max_k]
+    header = f"{'config':<20} {'index':<7} {'chunks':>7} " + " ".join(f"{'R' + c:>6}" for c in recall_columns)
+    header += f" {'MRR':>6} {'size MB':>8} {'ingest s':>9} {'q p50 ms':>9} {'q p95 ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        metrics = result["metrics"]
+        row = f"{result['params']['config']:<20} {result['params']['index']:<7} {metrics['chunks']:>7} "
+        row += " ".join(f"{metrics['recall'][c]:>6.3f}" for c in recall_columns)
+        row += f" {metrics['mrr']:>6.3f} {metrics['index_bytes'] / 1024 ** 2:>8.2f} {metrics['ingest_seconds']:>9.2f}"
+        row += f" {result['latency']['p50'] * 1000:>9.2f} {result['latency']['p95'] * 1000:>9.2f}"
+        print(row)
+
+def run_evaluation(documents: Dict[str, str], questions: List[Dict], configs: List[Dict], index_modes: List[str],
+                   max_k: int, min_coverage: float, workdir: str) -> List[Dict]:
+    results = []
+    for config in configs:
+        for mode in index_modes:
+            store = create_store(mode, workdir)
+            ingest_metrics = ingest(store, documents, config)
+            size = index_size(store, mode)
+            query_metrics = evaluate_queries(store, questions, max_k, min_coverage)
+
+            results.append({
+                "suite": "retrieval",
+                "name": config["method"],
+                "params": {"config": config["name"], "index": mode, "documents": len(documents), "questions": len(questions)},
+                "latency": query_metrics["latency"],
+                "metrics": {
+                    **ingest_metrics,
+                    "index_bytes": size,
+                    "recall": query_metrics["recall"],
+                    "mrr": query_metrics["mrr"]
+                }
+            })
+            print(f"evaluated {config['name']} on {mode}: MRR {query_metrics['mrr']:.3f}")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate retrieval quality and cost per chunking config and index mode")
+    parser.add_argument("--corpus", default=None, help="Directory of .txt/.pdf documents")
+    parser.add_argument("--questions", default=None, help="JSONL of {question, relevant: [passage, ...]}")
+    parser.add_argument("--configs", nargs="+", default=DEFAULT_CONFIGS, help="method[:chunk_size[:overlap]]")
+    parser.add_argument("--index-modes", nargs="+", default=INDEX_MODES, choices=INDEX_MODES)
+    parser.add_argument("--top-k", type=int, default=max(K_VALUES))
+    parser.add_argument("--min-coverage", type=float, default=0.5, help="share of a passage's trigrams a chunk must contain")
+    parser.add_argument("--synthetic-docs", type=int, default=20)
+    parser.add_argument("--synthetic-doc-size", type=int, default=32 * 1024)
+    parser.add_argument("--synthetic-facts", type=int, default=5, help="planted facts (questions) per document")
+    parser.add_argument("--output", default=None, help="JSON results path (default: benchmarks/results/retrieval-<commit>.json)")
+    parser.add_argument("--real-models", action="store_true", help="Use the real models instead of stubs")
+    args = parser.parse_args()
+
+    if bool(args.corpus) != bool(args.questions):
+        parser.error("--corpus and --questions must be given together")
+    configs = [parse_config(spec) for spec in args.configs]
+    corpus = os.path.abspath(args.corpus) if args.corpus else None
+    questions_path = os.path.abspath(args.questions) if args.questions else None
+
+    meta = environment_info(
+        stub_models=not args.real_models,
+        dataset=corpus or f"synthetic:{args.synthetic_docs}x{args.synthetic_doc_size}",
+        min_coverage=args.min_coverage
+    )
+    output = os.path.abspath(args.output or os.path.join(
+        REPO_ROOT, "benchmarks", "results", f"retrieval-{meta['commit'] or 'local'}.json"
+    ))
+
+    with tempfile.TemporaryDirectory(prefix="rag-eval-") as workdir:
+        configure_environment(workdir)
+        if not args.real_models:
+            install_stub_models()
+
+        if corpus:
+            documents, questions = load_dataset(corpus, questions_path)
+        else:
+            documents, questions = synthetic_dataset(args.synthetic_docs, args.synthetic_doc_size, args.synthetic_facts)
+        print(f"Evaluating {len(questions)} questions over {len(documents)} documents")
+
+        results = run_evaluation(documents, questions, configs, args.index_modes, args.top_k, args.min_coverage, workdir)
+        os.chdir(REPO_ROOT)
+
+    print()
+    print_table(results, args.top_k)
+    write_results(output, meta, results)
+    print(f"Results written to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+# benchmarks/load.py
+"""Load generator for the API: concurrent virtual users replaying a weighted request mix.
+
+Each virtual user sends requests back to back (plus optional think time), picking
+the endpoint from --mix with its own seeded RNG, so a run with the same options
+issues the same request sequence. Throughput and p50/p95/p99 latency are reported
+per endpoint and written as JSON that ``python -m benchmarks.compare`` can diff.
+Latency percentiles cover 2xx responses only; shed (503) and rate limited (429)
+requests are fast and counted separately in status_codes.
+
+By default the app runs in-process behind an ASGI transport with every backend
+replaced by its local stand-in through settings: in-memory vector store
+(VECTOR_STORE_BACKEND=memory), in-memory Redis (REDIS_BACKEND=memory), SMTP sink
+(SMTP_BACKEND=sink), deterministic stub models (MODEL_BACKEND=stub) and a
+throwaway SQLite database. Nothing leaves the machine.
+
+    python -m benchmarks.load --users 16 --duration 30 --mix query=8,upload=1,book=1
+
+To measure one uvicorn worker without the client sharing its event loop, start
+the worker with the same stand-in settings and a fresh database, then pass --url:
+
+    VECTOR_STORE_BACKEND=memory REDIS_BACKEND=memory SMTP_BACKEND=sink MODEL_BACKEND=stub \\
+        uvicorn app.main:app --workers 1 --port 8000
+    python -m benchmarks.load --url http://localhost:8000 --users 32
+"""
+
+from typing import Dict, List, Tuple
+from datetime import date, timedelta
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.common import summarize, environment_info, write_results
+from benchmarks.corpus import generate_text, parse_size
+
+# Stand-in backends selected through settings; must be set before importing app
+STAND_IN_SETTINGS = {
+    "VECTOR_STORE_BACKEND": "memory",
+    "REDIS_BACKEND": "memory",
+    "SMTP_BACKEND": "sink",
+    "MODEL_BACKEND": "stub"
+}
+
+ENDPOINTS = ("query", "upload", "book")
+DEFAULT_MIX = "query=8,upload=1,book=1"
+
+QUESTIONS = [
+    "what is the interview schedule policy",
+    "how is remote and hybrid work handled",
+    "summarize the security compliance audit",
+    "what does onboarding training cover",
+    "when is the annual budget forecast meeting",
+    "how are expense reports reviewed",
+    "what is the release process for a new feature",
+    "who owns customer support escalations"
+]
+
+# Bookings start far in the future so a run never collides with real data
+BOOKING_START = date(2100, 1, 4)
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """Parse 'query=8,upload=1,book=1' into endpoint weights"""
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint in mix: {name} (expected one of {', '.join(ENDPOINTS)})")
+        weights[name] = float(weight) if weight else 1.0
+    if not any(weights.values()):
+        raise ValueError("Mix needs at least one endpoint with a positive weight")
+    return weights
+
+class LoadGenerator:
+    """Builds each endpoint's requests and records per-endpoint samples"""
+
+    def __init__(self, client, upload_size: int, session_length: int, slots: List[str]):
+        self.client = client
+        self.upload_size = upload_size
+        self.session_length = session_length
+        self.slots = slots
+        self._uploads = 0
+        self._bookings = 0
+        self.samples: Dict[str, List[float]] = {name: [] for name in ENDPOINTS}
+        self.statuses: Dict[str, Dict[int, int]] = {name: {} for name in ENDPOINTS}
+        self.errors: Dict[str, int] = {name: 0 for name in ENDPOINTS}
+
+    def session_id(self, user: int, sequence: int) -> str:
+        # A user starts a new session every session_length requests, which keeps closed-loop
+        # users without think time under the per-session rate limit
+        return f"load-{user}-{sequence // self.session_length}"
+
+    async def query(self, user: int, sequence: int, rng: random.Random):
+        return await self.client.post("/api/v1/rag/query", json={
+            "query": f"{rng.choice(QUESTIONS)} {sequence}",
+            "session_id": self.session_id(user, sequence)
+        })
+
+    async def upload(self, user: int, sequence: int, rng: random.Random):
+        # Distinct content per upload, otherwise the content hash short-circuits ingestion
+        self._uploads += 1
+        text = generate_text(self.upload_size, seed=1_000_000 + self._uploads)
+        return await self.client.post(
+            "/api/v1/upload/upload",
+            files={"file": (f"load-{self._uploads}.txt", text.encode("utf-8"), "text/plain")},
+            headers={"X-Session-Id": self.session_id(user, sequence)}
+        )
+
+    async def book(self, user: int, sequence: int, rng: random.Random):
+        # Walk the slot grid so every booking claims a free slot
+        day, slot = divmod(self._bookings, len(self.slots))
+        self._bookings += 1
+        return await self.client.post("/api/v1/booking/book", json={
+            "full_name": f"Load User {user}",
+            "email": f"load-{user}@example.com",
+            "booking_date": (BOOKING_START + timedelta(days=day)).isoformat(),
+            "booking_time": self.slots[slot]
+        }, headers={"X-Session-Id": self.session_id(user, sequence)})
+
+    async def send(self, endpoint: str, user: int, sequence: int, rng: random.Random, record: bool = True):
+        start = time.perf_counter()
+        try:
+            response = await getattr(self, endpoint)(user, sequence, rng)
+        except Exception:
+            if record:
+                self.errors[endpoint] += 1
+            return
+        elapsed = time.perf_counter() - start
+        if record:
+            statuses = self.statuses[endpoint]
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if 200 <= response.status_code < 300:
+                self.samples[endpoint].append(elapsed)
+
+async def _virtual_user(
+    generator: LoadGenerator,
+    user: int,
+    weights: Dict[str, float],
+    seed: int,
+    deadline: float,
+    remaining: List[int],
+    think_time: float
+):
+    rng = random.Random(seed * 100_003 + user)
+    endpoints, cum_weights = list(weights), []
+    for weight in weights.values():
+        cum_weights.append((cum_weights[-1] if cum_weights else 0.0) + weight)
+
+    sequence = 0
+    while time.perf_counter() < deadline and remaining[0] != 0:
+        remaining[0] -= 1
+        endpoint = rng.choices(endpoints, cum_weights=cum_weights)[0]
+        await generator.send(endpoint, user, sequence, rng)
+        sequence += 1
+        if think_time:
+            await asyncio.sleep(rng.expovariate(1.0 / think_time))
+
+async def run_load(client, args, weights: Dict[str, float], slots: List[str]) -> Tuple[LoadGenerator, float]:
+    generator = LoadGenerator(client, parse_size(args.upload_size), args.session_length, slots)
+
+    # Seed documents for queries to retrieve, then warm every endpoint in the mix; neither is measured
+    warm_rng = random.Random(args.seed)
+    for i in range(args.seed_documents):
+        await generator.send("upload", -1, i, warm_rng, record=False)
+    for i in range(args.warmup):
+        for endpoint in weights:
+            await generator.send(endpoint, -1, i, warm_rng, record=False)
+
+    # -1 runs until the deadline
+    remaining = [args.requests if args.requests else -1]
+    deadline = time.perf_counter() + args.duration if args.duration else float("inf")
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _virtual_user(generator, user, weights, args.seed, deadline, remaining, args.think_time)
+        for user in range(args.users)
+    ))
+    return generator, time.perf_counter() - start
+
+def collect_results(generator: LoadGenerator, elapsed: float, params: Dict) -> List[Dict]:
+    results = []
+    all_samples, all_statuses, all_errors = [], {}, 0
+    for endpoint in ENDPOINTS:
+        statuses, errors = generator.statuses[endpoint], generator.errors[endpoint]
+        requests = sum(statuses.values()) + errors
+        if not requests:
+            continue
+        samples = generator.samples[endpoint]
+        all_samples += samples
+        all_errors += errors
+        for code, count in statuses.items():
+            all_statuses[code] = all_statuses.get(code, 0) + count
+        results.append(_load_result(endpoint, samples, statuses, errors, elapsed, params))
+    results.append(_load_result("total", all_samples, all_statuses, all_errors, elapsed, params))
+    return results
+
+def _load_result(name: str, samples: List[float], statuses: Dict[int, int], errors: int, elapsed: float, params: Dict) -> Dict:
+    requests = sum(statuses.values()) + errors
+    return {
+        "suite": "load",
+        "name": name,
+        "params": params,
+        "latency": summarize(samples),
+        "metrics": {
+            "requests": requests,
+            "successful": len(samples),
+            "throughput_rps": requests / elapsed if elapsed else None,
+            "successful_rps": len(samples) / elapsed if elapsed else None,
+            "error_rate": (requests - len(samples)) / requests if requests else 0.0,
+            "status_codes": {str(code): count for code, count in sorted(statuses.items())},
+            "client_errors": errors
+        }
+    }
+
+def print_table(results: List[Dict], elapsed: float):
+    print(f"\n{'endpoint':<10} {'requests':>9} {'req/s':>8} {'ok/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  status codes")
+    for result in results:
+        latency, metrics = result["latency"], result["metrics"]
+        if latency["count"]:
+            percentiles = "".join(f" {latency[stat] * 1000:>9.1f}" for stat in ("p50", "p95", "p99"))
+        else:
+            percentiles = f" {'-':>9}" * 3
+        print(
+            f"{result['name']:<10} {metrics['requests']:>9} {metrics['throughput_rps']:>8.1f} "
+            f"{metrics['successful_rps']:>8.1f}{percentiles}  {metrics['status_codes']}"
+        )
+    print(f"measured over {elapsed:.1f}s")
+
+async def _run_in_process(args, weights: Dict[str, float]) -> Tuple[LoadGenerator, float]:
+    import httpx
+    from app.main import app
+    from app.core.availability import slot_index
+
+    # The lifespan starts the outbox sender and dependency monitor as in a real worker
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=args.timeout) as client:
+            return await run_load(client, args, weights, slot_index.slots)
+
+async def _run_remote(args, weights: Dict[str, float]) -> Tuple[LoadGenerator, float]:
+    import httpx
+    from app.core.availability import SlotIndex
+
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        return await run_load(client, args, weights, SlotIndex().slots)
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive the API with concurrent users and report per-endpoint latency")
+    parser.add_argument("--users", type=int, default=8, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds to run; 0 runs until --requests are sent")
+    parser.add_argument("--requests", type=int, default=0, help="Stop after this many requests in total; 0 is unlimited")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Endpoint weights, e.g. query=8,upload=1,book=1")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean seconds a user waits between requests")
+    parser.add_argument("--upload-size", default="16KB")
+    parser.add_argument("--session-length", type=int, default=10, help="Requests per session before a user starts a new one")
+    parser.add_argument("--seed-documents", type=int, default=10, help="Documents uploaded before the measured run")
+    parser.add_argument("--warmup", type=int, default=2, help="Unmeasured requests per endpoint before the run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    parser.add_argument("--url", default=None, help="Target a running server instead of the in-process app")
+    parser.add_argument("--output", default=None, help="JSON results path (default: benchmarks/results/load-<commit>.json)")
+    args = parser.parse_args()
+
+    if not args.duration and not args.requests:
+        parser.error("one of --duration or --requests must be non-zero")
+    weights = {name: weight for name, weight in parse_mix(args.mix).items() if weight > 0}
+
+    # Options that change what is measured are part of every result's key
+    params = {"users": args.users, "mix": args.mix, "upload_size": args.upload_size, "think_time": args.think_time}
+    meta = environment_info(
+        target=args.url or "in-process",
+        stand_ins=None if args.url else STAND_IN_SETTINGS,
+        duration=args.duration,
+        requests=args.requests,
+        seed=args.seed,
+        seed_documents=args.seed_documents,
+        **params
+    )
+    output = os.path.abspath(args.output or os.path.join(
+        REPO_ROOT, "benchmarks", "results", f"load-{meta['commit'] or 'local'}.json"
+    ))
+
+    if args.url:
+        generator, elapsed = asyncio.run(_run_remote(args, weights))
+    else:
+        with tempfile.TemporaryDirectory(prefix="rag-load-") as workdir:
+            os.chdir(workdir)
+            for name, value in STAND_IN_SETTINGS.items():
+                os.environ.setdefault(name, value)
+            os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'load.db')}")
+            generator, elapsed = asyncio.run(_run_in_process(args, weights))
+            os.chdir(REPO_ROOT)
+
+    results = collect_results(generator, elapsed, params)
+    print_table(results, elapsed)
+    write_results(output, meta, results)
+    print(f"Results written to {output}")
+
+if __name__ == "__main__":
+    main()
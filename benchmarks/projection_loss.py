@@ -0,0 +1,196 @@
+# benchmarks/projection_loss.py
+"""Retrieval quality lost per PCA projection dimension.
+
+Chunks and embeds a corpus once at full width, then for each candidate
+dimension fits a PCAProjection on the chunk embeddings, projects chunks and
+questions, and ranks exactly. Reports, next to the full-width baseline,
+recall@k and MRR against the labelled passages, overlap@k with the full-width
+neighbours, explained variance, index size and single-query scan latency.
+
+Uses the same datasets and relevance rule as ``benchmarks.evaluate``.
+
+    python -m benchmarks.projection_loss --dimensions 256 192 128 64
+    python -m benchmarks.projection_loss --corpus data/docs --questions data/qa.jsonl --config recursive:1000:200
+"""
+
+from typing import Dict, List, Optional
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.common import summarize, environment_info, write_results
+from benchmarks.evaluate import K_VALUES, parse_config, synthetic_dataset, load_dataset, score_ranking
+from benchmarks.run import configure_environment, install_stub_models
+
+DEFAULT_DIMENSIONS = [384, 256, 192, 128, 96, 64, 32]
+# Single queries timed per dimension for the scan latency columns
+LATENCY_QUERIES = 200
+
+def embed(texts: List[str]) -> np.ndarray:
+    from app.core.embedding import embedding_generator
+
+    embeddings, metrics = embedding_generator.generate_embeddings(texts, project=False)
+    if metrics.get("status") != "success":
+        raise RuntimeError(f"Embedding failed: {metrics.get('error')}")
+    return np.asarray(embeddings, dtype=np.float32)
+
+def chunk_corpus(documents: Dict[str, str], config: Dict) -> List[str]:
+    from app.core.chunking import chunker
+
+    chunks = []
+    for name, text in documents.items():
+        document_chunks, metrics = chunker.chunk_document(text, method=config["method"], chunk_size=config["chunk_size"], overlap=config["overlap"])
+        if metrics.get("status") != "success":
+            raise RuntimeError(f"Chunking {name} with {config['name']} failed: {metrics.get('error')}")
+        chunks.extend(document_chunks)
+    return chunks
+
+def scan_latency(matrix: np.ndarray, queries: np.ndarray, max_k: int) -> Dict:
+    """One exact top-k scan per query, as a single API request would run it"""
+    from app.core.similarity import batch_top_k
+
+    norms = np.linalg.norm(matrix, axis=1)
+    samples = []
+    for query in queries[:LATENCY_QUERIES]:
+        start = time.perf_counter()
+        batch_top_k(matrix, query, max_k, norms=norms)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+def evaluate_dimension(chunks: List[str], chunk_embeddings: np.ndarray, questions: List[Dict], query_embeddings: np.ndarray,
+                       baseline: Optional[np.ndarray], dimension: Optional[int], max_k: int, min_coverage: float) -> Dict:
+    """dimension=None evaluates the unprojected embeddings"""
+    from app.core.projection import PCAProjection
+    from app.core.similarity import batch_top_k
+
+    variance = 1.0
+    matrix, queries = chunk_embeddings, query_embeddings
+    fit_seconds = 0.0
+    if dimension is not None:
+        start = time.perf_counter()
+        projection = PCAProjection.fit(chunk_embeddings, dimension)
+        fit_seconds = time.perf_counter() - start
+        matrix, queries = projection.transform(chunk_embeddings), projection.transform(query_embeddings)
+        variance = projection.explained_variance_ratio
+
+    indices, _ = batch_top_k(matrix, queries, max_k)
+    recall = {k: [] for k in K_VALUES if k <= max_k}
+    reciprocal_ranks, overlap = [], []
+    for row, item in zip(indices, questions):
+        query_recall, reciprocal_rank = score_ranking([chunks[i] for i in row], item["relevant"], max_k, min_coverage)
+        for k, value in query_recall.items():
+            recall[k].append(value)
+        reciprocal_ranks.append(reciprocal_rank)
+    if baseline is not None:
+        overlap = [len(set(row) & set(reference)) / len(reference) for row, reference in zip(indices, baseline) if len(reference)]
+
+    return {
+        "indices": indices,
+        "dimension": matrix.shape[1],
+        "latency": scan_latency(matrix, queries, max_k),
+        "metrics": {
+            "explained_variance": variance,
+            "recall": {f"@{k}": float(np.mean(values)) for k, values in recall.items()},
+            "mrr": float(np.mean(reciprocal_ranks)),
+            "neighbour_overlap": float(np.mean(overlap)) if overlap else 1.0,
+            "index_bytes": int(matrix.shape[0] * matrix.shape[1] * np.dtype(np.float32).itemsize),
+            "fit_seconds": fit_seconds
+        }
+    }
+
+def print_table(results: List[Dict], max_k: int):
+    recall_columns = [f"@{k}" for k in K_VALUES if k <= max_k]
+    header = f"{'dims':>6} {'variance':>9} " + " ".join(f"{'R' + c:>6}" for c in recall_columns)
+    header += f" {'MRR':>6} {'overlap':>8} {'size MB':>8} {'scan p50 ms':>12} {'scan p95 ms':>12}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        metrics = result["metrics"]
+        row = f"{result['params']['dimensions']:>6} {metrics['explained_variance']:>9.1%} "
+        row += " ".join(f"{metrics['recall'][c]:>6.3f}" for c in recall_columns)
+        row += f" {metrics['mrr']:>6.3f} {metrics['neighbour_overlap']:>8.3f} {metrics['index_bytes'] / 1024 ** 2:>8.2f}"
+        row += f" {result['latency']['p50'] * 1000:>12.3f} {result['latency']['p95'] * 1000:>12.3f}"
+        print(row)
+
+def run_projection_loss(documents: Dict[str, str], questions: List[Dict], config: Dict, dimensions: List[int],
+                        max_k: int, min_coverage: float) -> List[Dict]:
+    chunks = chunk_corpus(documents, config)
+    chunk_embeddings = embed(chunks)
+    query_embeddings = embed([item["question"] for item in questions])
+    full_dimension = chunk_embeddings.shape[1]
+    print(f"Embedded {len(chunks)} chunks and {len(questions)} questions at {full_dimension} dims")
+
+    results, baseline = [], None
+    candidates = [None] + sorted({d for d in dimensions if d < full_dimension}, reverse=True)
+    for dimension in candidates:
+        evaluation = evaluate_dimension(chunks, chunk_embeddings, questions, query_embeddings, baseline, dimension, max_k, min_coverage)
+        if baseline is None:
+            baseline = evaluation["indices"]
+        results.append({
+            "suite": "projection",
+            "name": "full" if dimension is None else "pca",
+            "params": {"config": config["name"], "dimensions": evaluation["dimension"], "chunks": len(chunks), "questions": len(questions)},
+            "latency": evaluation["latency"],
+            "metrics": evaluation["metrics"]
+        })
+        print(f"evaluated {evaluation['dimension']} dims: MRR {evaluation['metrics']['mrr']:.3f}")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure retrieval quality lost per PCA projection dimension")
+    parser.add_argument("--corpus", default=None, help="Directory of .txt/.pdf documents")
+    parser.add_argument("--questions", default=None, help="JSONL of {question, relevant: [passage, ...]}")
+    parser.add_argument("--config", default="recursive", help="method[:chunk_size[:overlap]]")
+    parser.add_argument("--dimensions", nargs="+", type=int, default=DEFAULT_DIMENSIONS)
+    parser.add_argument("--top-k", type=int, default=max(K_VALUES))
+    parser.add_argument("--min-coverage", type=float, default=0.5, help="share of a passage's trigrams a chunk must contain")
+    parser.add_argument("--synthetic-docs", type=int, default=20)
+    parser.add_argument("--synthetic-doc-size", type=int, default=32 * 1024)
+    parser.add_argument("--synthetic-facts", type=int, default=5, help="planted facts (questions) per document")
+    parser.add_argument("--output", default=None, help="JSON results path (default: benchmarks/results/projection-<commit>.json)")
+    parser.add_argument("--real-models", action="store_true", help="Use the real models instead of stubs")
+    args = parser.parse_args()
+
+    if bool(args.corpus) != bool(args.questions):
+        parser.error("--corpus and --questions must be given together")
+    config = parse_config(args.config)
+    corpus = os.path.abspath(args.corpus) if args.corpus else None
+    questions_path = os.path.abspath(args.questions) if args.questions else None
+
+    meta = environment_info(
+        stub_models=not args.real_models,
+        dataset=corpus or f"synthetic:{args.synthetic_docs}x{args.synthetic_doc_size}",
+        min_coverage=args.min_coverage
+    )
+    output = os.path.abspath(args.output or os.path.join(
+        REPO_ROOT, "benchmarks", "results", f"projection-{meta['commit'] or 'local'}.json"
+    ))
+
+    with tempfile.TemporaryDirectory(prefix="rag-projection-") as workdir:
+        configure_environment(workdir)
+        if not args.real_models:
+            install_stub_models()
+
+        if corpus:
+            documents, questions = load_dataset(corpus, questions_path)
+        else:
+            documents, questions = synthetic_dataset(args.synthetic_docs, args.synthetic_doc_size, args.synthetic_facts)
+
+        results = run_projection_loss(documents, questions, config, args.dimensions, args.top_k, args.min_coverage)
+        os.chdir(REPO_ROOT)
+
+    print()
+    print_table(results, args.top_k)
+    write_results(output, meta, results)
+    print(f"Results written to {output}")
+
+if __name__ == "__main__":
+    main()
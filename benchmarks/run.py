@@ -0,0 +1,276 @@
+# benchmarks/run.py
+"""Benchmark suite for chunking, embedding, vector search and end-to-end ingestion.
+
+Runs fully offline by default: models are replaced with deterministic stubs,
+the vector store is the in-memory backend and the database is a throwaway
+SQLite file. Results are written as JSON and can be compared between commits
+with ``python -m benchmarks.compare``.
+
+    python -m benchmarks.run --profile quick --output bench/HEAD.json
+"""
+
+from typing import Dict, List
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.common import measure, summarize, environment_info, write_results
+from benchmarks.corpus import generate_text, generate_file, parse_size
+
+PROFILES = {
+    "quick": {
+        "chunk_sizes": ["16KB", "256KB"],
+        "chunk_methods": ["recursive", "semantic", "custom"],
+        "embedding_texts": 256,
+        "embedding_batch_sizes": [1, 8, 32, 128],
+        "search_corpus_sizes": [1_000, 10_000],
+        "search_queries": 50,
+        "e2e_sizes": ["4KB", "64KB"],
+        "e2e_kinds": ["txt", "pdf"],
+        "e2e_queries": 20,
+        "repeat": 3
+    },
+    "full": {
+        "chunk_sizes": ["16KB", "256KB", "1MB", "10MB"],
+        "chunk_methods": ["recursive", "semantic", "custom"],
+        "embedding_texts": 2048,
+        "embedding_batch_sizes": [1, 8, 32, 64, 128, 256],
+        "search_corpus_sizes": [1_000, 10_000, 100_000, 500_000],
+        "search_queries": 200,
+        "e2e_sizes": ["4KB", "256KB", "1MB", "10MB"],
+        "e2e_kinds": ["txt", "pdf"],
+        "e2e_queries": 100,
+        "repeat": 5
+    }
+}
+
+SUITES = ["chunking", "embedding", "search", "e2e"]
+
+def configure_environment(workdir: str):
+    """Point the app at throwaway local backends; must run before importing app"""
+    os.chdir(workdir)
+    os.environ.setdefault("VECTOR_STORE_BACKEND", "memory")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    # The e2e suite replays many queries from one session
+    os.environ.setdefault("SESSION_RATE_LIMIT", "0")
+
+def install_stub_models():
+    """Swap every model for a deterministic offline stub"""
+    from app.config import settings
+    from app.core.stub_models import StubSentenceModel, StubText2TextPipeline
+    from app.core.chunking import chunker
+    from app.core.embedding import embedding_generator
+    from app.api.rag_agent import rag_agent_instance
+
+    model = StubSentenceModel(settings.EMBEDDING_DIMENSION)
+    chunker._sentence_model = model
+    embedding_generator._sentence_transformer = model
+    rag_agent_instance._llm = StubText2TextPipeline()
+
+def bench_chunking(profile: Dict) -> List[Dict]:
+    from app.core.chunking import chunker
+
+    results = []
+    for size in profile["chunk_sizes"]:
+        text = generate_text(parse_size(size))
+        for method in profile["chunk_methods"]:
+            stage_times, metrics = [], {}
+
+            def run():
+                _, run_metrics = chunker.chunk_document(text, method=method)
+                stage_times.append(run_metrics.get("processing_time", 0.0))
+                metrics.update(run_metrics)
+
+            latency = measure(run, repeat=profile["repeat"])
+            results.append({
+                "suite": "chunking",
+                "name": method,
+                "params": {"size": size},
+                "latency": latency,
+                "metrics": {
+                    "total_chunks": metrics.get("total_chunks", 0),
+                    "avg_chunk_size": metrics.get("avg_chunk_size", 0),
+                    "reported_processing_time": summarize(stage_times),
+                    "throughput_mb_s": len(text) / (1024 ** 2) / latency["p50"] if latency["p50"] else None
+                }
+            })
+            print(f"chunking {method:<10} {size:>6}: p50 {latency['p50'] * 1000:.1f} ms")
+    return results
+
+def bench_embedding(profile: Dict) -> List[Dict]:
+    from app.core.embedding import embedding_generator
+
+    num_texts = profile["embedding_texts"]
+    text = generate_text(num_texts * 800, seed=1)
+    texts = [text[i:i + 800] for i in range(0, len(text), 800)][:num_texts]
+
+    results = []
+    for batch_size in profile["embedding_batch_sizes"]:
+        latency = measure(
+            lambda: embedding_generator.generate_embeddings(texts, batch_size=batch_size),
+            repeat=profile["repeat"]
+        )
+        results.append({
+            "suite": "embedding",
+            "name": "sentence-transformer",
+            "params": {"batch_size": batch_size, "texts": len(texts)},
+            "latency": latency,
+            "metrics": {"texts_per_second": len(texts) / latency["p50"] if latency["p50"] else None}
+        })
+        print(f"embedding batch {batch_size:>4}: {len(texts) / latency['p50']:.0f} texts/s")
+    return results
+
+def bench_search(profile: Dict) -> List[Dict]:
+    from app.config import settings
+    from app.core.vector_store import InMemoryVectorStore
+
+    dimension = settings.EMBEDDING_DIMENSION
+    rng = np.random.default_rng(0)
+    queries = rng.standard_normal((profile["search_queries"], dimension)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    results = []
+    for corpus_size in profile["search_corpus_sizes"]:
+        store = InMemoryVectorStore(dimension)
+        vectors = rng.standard_normal((corpus_size, dimension)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        store.store_embeddings(
+            vectors,
+            [f"chunk {i}" for i in range(corpus_size)],
+            [{"document_id": f"doc-{i // 100}", "chunk_index": i % 100} for i in range(corpus_size)]
+        )
+        store.similarity_search(queries[0], top_k=5)  # builds the stacked matrix
+
+        samples = []
+        for query in queries:
+            start = time.perf_counter()
+            store.similarity_search(query, top_k=5)
+            samples.append(time.perf_counter() - start)
+
+        latency = summarize(samples)
+        results.append({
+            "suite": "search",
+            "name": "memory-cosine",
+            "params": {"corpus_size": corpus_size, "dimension": dimension, "top_k": 5},
+            "latency": latency,
+            "metrics": {}
+        })
+        print(f"search {corpus_size:>8} vectors: p50 {latency['p50'] * 1000:.2f} ms")
+    return results
+
+async def _bench_e2e(profile: Dict, corpus_dir: str) -> List[Dict]:
+    import httpx
+    from app.main import app
+    from app.db.metadata_db import create_tables
+
+    create_tables()
+    results = []
+    content_types = {"txt": "text/plain", "pdf": "application/pdf"}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for size in profile["e2e_sizes"]:
+            for kind in profile["e2e_kinds"]:
+                # Distinct content per run so uploads are processed rather than deduplicated;
+                # the final re-upload of the last file measures the dedup path
+                paths = [generate_file(corpus_dir, size, kind, seed=seed) for seed in range(profile["repeat"])]
+                cases = [("upload", path) for path in paths] + [("upload_duplicate", paths[-1])]
+
+                timings = {}
+                for name, path in cases:
+                    with open(path, "rb") as f:
+                        payload = f.read()
+                    start = time.perf_counter()
+                    response = await client.post(
+                        "/api/v1/upload/upload",
+                        files={"file": (os.path.basename(path), payload, content_types[kind])}
+                    )
+                    samples, statuses = timings.setdefault(name, ([], {}))
+                    samples.append(time.perf_counter() - start)
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+                for name, (samples, statuses) in timings.items():
+                    latency = summarize(samples)
+                    results.append({
+                        "suite": "e2e",
+                        "name": name,
+                        "params": {"size": size, "kind": kind},
+                        "latency": latency,
+                        "metrics": {"status_codes": statuses}
+                    })
+                    print(f"e2e {name} {kind} {size:>6}: p50 {latency['p50'] * 1000:.1f} ms {statuses}")
+
+        samples, statuses = [], {}
+        session_id = "bench-session"
+        for i in range(profile["e2e_queries"]):
+            start = time.perf_counter()
+            response = await client.post(
+                "/api/v1/rag/query",
+                json={"query": f"what is the interview schedule policy {i}", "session_id": session_id}
+            )
+            samples.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        latency = summarize(samples)
+        results.append({
+            "suite": "e2e",
+            "name": "query",
+            "params": {"queries": profile["e2e_queries"]},
+            "latency": latency,
+            "metrics": {"status_codes": statuses}
+        })
+        print(f"e2e query: p50 {latency['p50'] * 1000:.1f} ms {statuses}")
+
+    return results
+
+def bench_e2e(profile: Dict, corpus_dir: str) -> List[Dict]:
+    return asyncio.run(_bench_e2e(profile, corpus_dir))
+
+def main():
+    parser = argparse.ArgumentParser(description="Run RAG backend benchmarks")
+    parser.add_argument("--suites", nargs="+", default=SUITES, choices=SUITES)
+    parser.add_argument("--profile", default="quick", choices=sorted(PROFILES))
+    parser.add_argument("--output", default=None, help="JSON results path (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--corpus-dir", default=None, help="Reuse generated corpus files from this directory")
+    parser.add_argument("--real-models", action="store_true", help="Use the real models instead of stubs")
+    args = parser.parse_args()
+
+    profile = PROFILES[args.profile]
+    meta = environment_info(profile=args.profile, stub_models=not args.real_models, suites=args.suites)
+    output = os.path.abspath(args.output or os.path.join(
+        REPO_ROOT, "benchmarks", "results", f"{meta['commit'] or 'local'}.json"
+    ))
+    corpus_dir = os.path.abspath(args.corpus_dir) if args.corpus_dir else None
+
+    with tempfile.TemporaryDirectory(prefix="rag-bench-") as workdir:
+        configure_environment(workdir)
+        corpus_dir = corpus_dir or os.path.join(workdir, "corpus")
+        if not args.real_models:
+            install_stub_models()
+
+        results = []
+        if "chunking" in args.suites:
+            results += bench_chunking(profile)
+        if "embedding" in args.suites:
+            results += bench_embedding(profile)
+        if "search" in args.suites:
+            results += bench_search(profile)
+        if "e2e" in args.suites:
+            results += bench_e2e(profile, corpus_dir)
+
+        os.chdir(REPO_ROOT)
+
+    write_results(output, meta, results)
+    print(f"Results written to {output}")
+
+if __name__ == "__main__":
+    main()
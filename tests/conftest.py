@@ -0,0 +1,32 @@
+import os
+import tempfile
+
+# Settings are read when app.config is first imported, so point the app at
+# in-process stand-ins before any test module imports it
+_data_dir = tempfile.mkdtemp(prefix="rag-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{_data_dir}/test.db",
+    "REDIS_BACKEND": "memory",
+    "VECTOR_STORE_BACKEND": "memory",
+    "MODEL_BACKEND": "stub",
+    "SMTP_SERVER": "127.0.0.1",
+    "SMTP_SECURITY": "none",
+    "SMTP_USERNAME": "",
+    "SMTP_SENDER_EMAIL": "noreply@example.com",
+})
+
+import pytest
+
+@pytest.fixture
+def db():
+    """A session on freshly created tables"""
+    from app.db.metadata_db import SessionLocal, create_tables, engine
+    from app.db.models import Base
+
+    Base.metadata.drop_all(bind=engine)
+    create_tables()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
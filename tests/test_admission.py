@@ -0,0 +1,154 @@
+import asyncio
+import uuid
+
+import httpx
+import pytest
+from fastapi.responses import JSONResponse
+
+from app.core.admission import AdmissionControlMiddleware, ConcurrencyLimiter, Overloaded, RouteClass
+
+async def settle():
+    """Let every ready task run up to its next wait"""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+def test_release_hands_the_slot_to_the_oldest_waiter():
+    async def scenario():
+        limiter = ConcurrencyLimiter("test", max_concurrent=1, max_queue=2, queue_timeout=5)
+        await limiter.acquire()
+        first = asyncio.create_task(limiter.acquire())
+        await settle()
+        second = asyncio.create_task(limiter.acquire())
+        await settle()
+        assert limiter.queued == 2
+
+        limiter.release()
+        await settle()
+        assert first.done() and not second.done()
+        assert limiter.active == 1
+
+        limiter.release()
+        await settle()
+        assert second.done()
+        limiter.release()
+        assert limiter.active == 0
+        assert limiter.queued == 0
+
+    asyncio.run(scenario())
+
+def test_full_queue_is_refused_at_once():
+    async def scenario():
+        limiter = ConcurrencyLimiter("test", max_concurrent=1, max_queue=1, queue_timeout=5)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await settle()
+
+        with pytest.raises(Overloaded) as error:
+            await limiter.acquire()
+        assert error.value.reason == "queue_full"
+
+        limiter.release()
+        await waiter
+        limiter.release()
+        assert limiter.active == 0
+
+    asyncio.run(scenario())
+
+def test_queue_wait_times_out():
+    async def scenario():
+        limiter = ConcurrencyLimiter("test", max_concurrent=1, max_queue=1, queue_timeout=0.05)
+        await limiter.acquire()
+        with pytest.raises(Overloaded) as error:
+            await limiter.acquire()
+        assert error.value.reason == "queue_timeout"
+        assert limiter.queued == 0
+
+        limiter.release()
+        assert limiter.active == 0
+
+    asyncio.run(scenario())
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    async def scenario():
+        limiter = ConcurrencyLimiter("test", max_concurrent=1, max_queue=2, queue_timeout=5)
+        await limiter.acquire()
+
+        # Cancelled while still queued
+        waiter = asyncio.create_task(limiter.acquire())
+        await settle()
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert limiter.queued == 0
+
+        # Cancelled after the slot was handed over but before it resumed
+        waiter = asyncio.create_task(limiter.acquire())
+        await settle()
+        limiter.release()
+        waiter.cancel()
+        granted = (await asyncio.gather(waiter, return_exceptions=True))[0]
+        if not isinstance(granted, BaseException):
+            # Python 3.11's wait_for delivers a result that lands just before the cancel;
+            # the slot is then the caller's to release, as the middleware does
+            limiter.release()
+
+        assert limiter.active == 0
+        assert limiter.queued == 0
+        assert await limiter.acquire() == 0.0
+
+    asyncio.run(scenario())
+
+def build_app(limiter: ConcurrencyLimiter, rate_limit: int = 0):
+    """A route behind the middleware that holds its slot until released"""
+    held = asyncio.Event()
+    entered = asyncio.Event()
+
+    async def endpoint(scope, receive, send):
+        entered.set()
+        await held.wait()
+        await JSONResponse({"ok": True})(scope, receive, send)
+
+    route_classes = [RouteClass("query", [("POST", "/query")], limiter)]
+    app = AdmissionControlMiddleware(endpoint, route_classes=route_classes, rate_limit=rate_limit, rate_window=60, retry_after=7)
+    return app, held, entered
+
+def client(app) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+def test_middleware_sheds_with_503_and_retry_after():
+    async def scenario():
+        for max_queue, queue_timeout, reason in ((0, 5, "queue_full"), (1, 0.05, "queue_timeout")):
+            app, held, entered = build_app(ConcurrencyLimiter("query", 1, max_queue, queue_timeout))
+            async with client(app) as http:
+                running = asyncio.create_task(http.post("/query"))
+                await entered.wait()
+
+                shed = await http.post("/query")
+                assert shed.status_code == 503
+                assert shed.headers["Retry-After"] == "7"
+                assert shed.json()["reason"] == reason
+
+                held.set()
+                assert (await running).status_code == 200
+
+    asyncio.run(scenario())
+
+def test_session_over_its_rate_limit_gets_429():
+    async def scenario():
+        app, held, _ = build_app(ConcurrencyLimiter("query", 4, 4, 5), rate_limit=2)
+        held.set()
+        session, other = str(uuid.uuid4()), str(uuid.uuid4())
+        async with client(app) as http:
+            statuses = [(await http.post("/query", headers={"X-Session-Id": session})).status_code for _ in range(2)]
+            # The session_id of a JSON body counts towards the same session
+            limited = await http.post("/query", json={"session_id": session, "query": "hello"})
+            assert statuses == [200, 200]
+            assert limited.status_code == 429
+            assert limited.json()["reason"] == "rate_limited"
+            assert 1 <= int(limited.headers["Retry-After"]) <= 60
+
+            assert (await http.post("/query", headers={"X-Session-Id": other})).status_code == 200
+            # Requests without a session are not limited by default
+            statuses = [(await http.post("/query")).status_code for _ in range(3)]
+            assert statuses == [200, 200, 200]
+
+    asyncio.run(scenario())
@@ -0,0 +1,106 @@
+import asyncio
+from datetime import date, datetime
+
+import httpx
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app.core.availability import SlotConflictError, slot_index
+from app.db.models import BookingDayOccupancy, BookingRequest
+
+DAY = date(2030, 1, 7)
+
+def booking(booking_time: str, day: date = DAY, email: str = "guest@example.com") -> BookingRequest:
+    return BookingRequest(
+        full_name="Ada Lovelace",
+        email=email,
+        booking_date=datetime.combine(day, datetime.min.time()),
+        booking_time=booking_time
+    )
+
+def masks(db) -> dict:
+    db.expire_all()
+    return {row.day: row.occupied_mask for row in db.query(BookingDayOccupancy) if row.occupied_mask}
+
+def bit(booking_time: str) -> int:
+    return 1 << slot_index.slots.index(booking_time)
+
+def test_second_active_booking_on_a_slot_conflicts(db):
+    slot_index.book(db, booking("10:00"))
+    db.commit()
+
+    with pytest.raises(SlotConflictError):
+        slot_index.book(db, booking("10:00", email="other@example.com"))
+    db.rollback()
+
+    assert db.query(BookingRequest).count() == 1
+    assert "10:00" not in slot_index.free_slots(db, DAY, DAY)[DAY]
+
+def test_partial_unique_index_rejects_a_second_active_booking(db):
+    # Bypass the occupancy masks: the database itself refuses the double booking
+    db.add(booking("10:00"))
+    db.commit()
+    db.add(booking("10:00", email="other@example.com"))
+    with pytest.raises(IntegrityError):
+        db.commit()
+    db.rollback()
+
+    cancelled = booking("11:00")
+    cancelled.status = "cancelled"
+    db.add_all([cancelled, booking("11:00", email="other@example.com")])
+    db.commit()
+
+def test_cancel_frees_the_slot_and_its_bit(db):
+    first = booking("10:00")
+    slot_index.book(db, first)
+    slot_index.book(db, booking("10:30"))
+    db.commit()
+    assert masks(db) == {DAY: bit("10:00") | bit("10:30")}
+
+    slot_index.cancel(db, first)
+    db.commit()
+    assert masks(db) == {DAY: bit("10:30")}
+    assert "10:00" in slot_index.free_slots(db, DAY, DAY)[DAY]
+
+    slot_index.book(db, booking("10:00", email="other@example.com"))
+    db.commit()
+    assert masks(db) == {DAY: bit("10:00") | bit("10:30")}
+
+def test_rebuild_matches_incremental_masks(db):
+    other_day = date(2030, 1, 8)
+    bookings = [booking("09:00"), booking("13:30"), booking("16:30"), booking("09:00", day=other_day), booking("12:00", day=other_day)]
+    for b in bookings:
+        slot_index.book(db, b)
+    db.commit()
+    slot_index.cancel(db, bookings[1])
+    slot_index.cancel(db, bookings[4])
+    db.commit()
+    incremental = masks(db)
+
+    slot_index.rebuild(db)
+    assert masks(db) == incremental == {
+        DAY: bit("09:00") | bit("16:30"),
+        other_day: bit("09:00")
+    }
+
+def test_availability_endpoint_lists_free_slots(db):
+    from app.main import app
+
+    slot_index.book(db, booking("09:00"))
+    slot_index.book(db, booking("09:30"))
+    db.commit()
+
+    async def get(params):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get("/api/v1/booking/availability", params=params)
+
+    response = asyncio.run(get({"start": "2030-01-07", "end": "2030-01-08"}))
+    assert response.status_code == 200
+    body = response.json()
+    assert body["slot_minutes"] == slot_index.slot_minutes
+    days = {day["date"]: day["free_slots"] for day in body["days"]}
+    assert days["2030-01-07"] == slot_index.slots[2:]
+    assert days["2030-01-08"] == slot_index.slots
+
+    response = asyncio.run(get({"start": "2030-01-08", "end": "2030-01-07"}))
+    assert response.status_code == 400
@@ -0,0 +1,138 @@
+import smtplib
+import socket
+
+import pytest
+
+from app.core.circuit_breaker import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen, is_smtp_connection_failure, is_vector_db_outage
+)
+from app.core.health import DependencyMonitor
+
+class ApiError(Exception):
+    """Shaped like the Pinecone client's API exceptions"""
+
+    def __init__(self, status: int):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+def fail(breaker: CircuitBreaker, error: Exception):
+    with pytest.raises(type(error)):
+        with breaker.guard():
+            raise error
+
+def expire(breaker: CircuitBreaker):
+    """Move the breaker past its reset timeout"""
+    breaker.opened_at -= breaker.reset_timeout
+
+def test_breaker_opens_then_lets_a_single_trial_through():
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        fail(breaker, ConnectionError("down"))
+    assert breaker.state == CLOSED
+
+    fail(breaker, ConnectionError("down"))
+    assert breaker.state == OPEN
+    assert breaker.rejecting
+    with pytest.raises(CircuitOpen) as error:
+        with breaker.guard():
+            pytest.fail("an open breaker must not run the call")
+    assert 0 < error.value.retry_after <= 30
+
+    expire(breaker)
+    assert breaker.allow_request()
+    assert breaker.state == HALF_OPEN
+    # Only one trial call while half-open
+    assert not breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.failures == 0
+
+def test_failed_trial_opens_the_breaker_again():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+    fail(breaker, ConnectionError("down"))
+    expire(breaker)
+
+    fail(breaker, ConnectionError("still down"))
+    assert breaker.state == OPEN
+    assert breaker.rejecting
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=30)
+    fail(breaker, ConnectionError("down"))
+    with breaker.guard():
+        pass
+    fail(breaker, ConnectionError("down"))
+    assert breaker.state == CLOSED
+
+@pytest.mark.parametrize("error, outage", [
+    (ApiError(400), False),
+    (ApiError(404), False),
+    (ApiError(429), True),
+    (ApiError(503), True),
+    (ValueError("dimension mismatch"), False),
+    (ConnectionError("reset"), True),
+    (socket.timeout("timed out"), True),
+])
+def test_vector_db_outage_filter(error, outage):
+    assert is_vector_db_outage(error) is outage
+
+@pytest.mark.parametrize("error, failure", [
+    (smtplib.SMTPRecipientsRefused({"nobody@example.com": (550, b"No such user")}), False),
+    (smtplib.SMTPSenderRefused(553, b"Sender rejected", "noreply@example.com"), False),
+    (smtplib.SMTPDataError(554, b"Message rejected"), False),
+    (smtplib.SMTPConnectError(421, b"Service not available"), True),
+    (smtplib.SMTPServerDisconnected("Connection unexpectedly closed"), True),
+    (ConnectionRefusedError(111, "Connection refused"), True),
+    (socket.timeout("timed out"), True),
+])
+def test_smtp_connection_failure_filter(error, failure):
+    assert is_smtp_connection_failure(error) is failure
+
+def test_rejected_requests_do_not_open_the_breaker():
+    vector_db = CircuitBreaker("vector_db_test", failure_threshold=2, is_failure=is_vector_db_outage)
+    smtp = CircuitBreaker("smtp_test", failure_threshold=2, is_failure=is_smtp_connection_failure)
+    for _ in range(5):
+        fail(vector_db, ApiError(400))
+        fail(smtp, smtplib.SMTPRecipientsRefused({"nobody@example.com": (550, b"No such user")}))
+    assert vector_db.state == CLOSED
+    assert smtp.state == CLOSED
+
+    fail(vector_db, ApiError(429))
+    fail(vector_db, ApiError(503))
+    assert vector_db.state == OPEN
+
+def test_monitor_probe_closes_an_open_breaker():
+    breaker = CircuitBreaker("probed", failure_threshold=1, reset_timeout=3600)
+    fail(breaker, ConnectionError("down"))
+    assert breaker.state == OPEN
+
+    healthy = {"value": False}
+
+    def probe() -> str:
+        if not healthy["value"]:
+            raise ConnectionError("down")
+        return "connected"
+
+    monitor = DependencyMonitor(interval=60, timeout=5)
+    monitor.register("probed", probe, breaker)
+    status = monitor.check_all()
+    assert status["probed"]["status"] == "disconnected"
+    assert breaker.state == OPEN
+
+    # Recovery is noticed by the probe long before the reset timeout
+    healthy["value"] = True
+    status = monitor.check_all()
+    assert status["probed"]["status"] == "connected"
+    assert status["probed"]["breaker"] == CLOSED
+    assert breaker.state == CLOSED
+    assert monitor.health()["status"] == "healthy"
+
+def test_passive_checks_leave_the_breaker_alone():
+    breaker = CircuitBreaker("passive", failure_threshold=1, reset_timeout=3600)
+    fail(breaker, ConnectionError("down"))
+
+    monitor = DependencyMonitor(interval=60, timeout=5)
+    monitor.register("passive", lambda: "idle", breaker, passive=True)
+    monitor.check_all()
+    assert breaker.state == OPEN
+    assert monitor.health()["status"] == "degraded"
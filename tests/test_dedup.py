@@ -0,0 +1,92 @@
+import random
+
+from app.core.dedup import MinHasher, deduplicator, similarity
+from app.db.models import ChunkLSHBucket, ChunkRecord, ChunkReference
+
+MODEL = "sentence-transformer"
+
+def paragraph(seed: int, words: int = 120) -> str:
+    rng = random.Random(seed)
+    return " ".join(f"w{rng.randrange(100000)}" for _ in range(words))
+
+def near_duplicate(text: str) -> str:
+    """The same text with its last word changed"""
+    return text.rsplit(" ", 1)[0] + " changed"
+
+def ingest(db, document_id: str, chunks, embedding_model: str = MODEL, embedding_projection=None):
+    plan = deduplicator.plan(db, chunks, embedding_model, embedding_projection)
+    vector_ids = [f"{document_id}-{position}" for position in plan.unique]
+    deduplicator.record(db, plan, document_id, embedding_model, embedding_projection, chunks, vector_ids)
+    db.commit()
+    return plan
+
+def test_minhash_estimates_jaccard_similarity():
+    hasher = MinHasher()
+    text = paragraph(1)
+    assert (hasher.signature(text) == hasher.signature(text)).all()
+    assert similarity(hasher.signature(text), hasher.signature(near_duplicate(text))) >= 0.9
+    assert similarity(hasher.signature(text), hasher.signature(paragraph(2))) < 0.1
+    # Nothing to shingle: no signature, so the chunk is never matched
+    assert hasher.signature("") is None
+    assert hasher.signature("--- !!!") is None
+
+def test_near_duplicate_across_documents_is_stored_once(db):
+    shared = paragraph(1)
+    ingest(db, "doc-a", [shared, paragraph(2)])
+    plan = ingest(db, "doc-b", [near_duplicate(shared), paragraph(3)])
+
+    assert plan.unique == [1]
+    assert list(plan.stored_duplicates) == [0]
+    record = db.query(ChunkRecord).filter(ChunkRecord.id == plan.stored_duplicates[0]).one()
+    assert record.vector_id == "doc-a-0"
+
+    references = db.query(ChunkReference).filter(ChunkReference.chunk_id == record.id).all()
+    assert sorted((r.document_id, r.chunk_index) for r in references) == [("doc-a", 0), ("doc-b", 0)]
+    assert db.query(ChunkRecord).count() == 3
+    assert sorted(deduplicator.source_documents(db, ["doc-a-0"])["doc-a-0"]) == ["doc-a", "doc-b"]
+
+def test_duplicate_within_a_document(db):
+    text = paragraph(1)
+    plan = ingest(db, "doc-a", [text, paragraph(2), near_duplicate(text)])
+
+    assert plan.unique == [0, 1]
+    assert plan.batch_duplicates == {2: 0}
+    assert db.query(ChunkRecord).count() == 2
+    references = db.query(ChunkReference.chunk_index, ChunkRecord.vector_id).join(
+        ChunkRecord, ChunkRecord.id == ChunkReference.chunk_id
+    ).order_by(ChunkReference.chunk_index).all()
+    assert references == [(0, "doc-a-0"), (1, "doc-a-1"), (2, "doc-a-0")]
+
+def test_other_models_and_projections_do_not_match(db):
+    text = paragraph(1)
+    ingest(db, "doc-a", [text])
+
+    assert ingest(db, "doc-b", [text], embedding_projection="pca-64-v1").unique == [0]
+    assert ingest(db, "doc-c", [text], embedding_model="other-model").unique == [0]
+    # Same model and projection as an earlier upload: matched
+    assert ingest(db, "doc-d", [text], embedding_projection="pca-64-v1").stored_duplicates
+    assert db.query(ChunkRecord).count() == 3
+
+def test_chunks_without_shingles_stay_unique(db):
+    plan = ingest(db, "doc-a", ["--- !!!", "--- !!!"])
+    assert plan.unique == [0, 1]
+    assert db.query(ChunkLSHBucket).count() == 0
+
+def test_forget_keeps_chunks_other_documents_reference(db):
+    shared = paragraph(1)
+    ingest(db, "doc-a", [shared, paragraph(2)])
+    ingest(db, "doc-b", [shared])
+
+    assert deduplicator.forget(db, "doc-a") == ["doc-a-1"]
+    db.commit()
+    remaining = db.query(ChunkRecord.vector_id).all()
+    assert remaining == [("doc-a-0",)]
+    assert [r.document_id for r in db.query(ChunkReference)] == ["doc-b"]
+    assert db.query(ChunkLSHBucket).count() == deduplicator.bands
+
+    assert deduplicator.forget(db, "doc-b") == ["doc-a-0"]
+    db.commit()
+    assert db.query(ChunkRecord).count() == 0
+    assert db.query(ChunkLSHBucket).count() == 0
+    # Documents uploaded without deduplication have no references
+    assert deduplicator.forget(db, "doc-unknown") is None
@@ -0,0 +1,123 @@
+import json
+import socket
+from datetime import datetime, timedelta
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from app.core.circuit_breaker import CLOSED, smtp_breaker
+from app.core.tools import booking_tool
+from app.db.models import EmailOutbox
+from app.utils.email_utils import SMTPConnection, email_outbox_sender
+
+REFUSED = "nobody@example.com"
+
+class RecordingHandler:
+    """Accepts every message except to REFUSED, remembering which connection carried it"""
+
+    def __init__(self):
+        self.delivered = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address == REFUSED:
+            return "550 5.1.1 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.delivered.append((envelope.rcpt_tos, session.peer))
+        return "250 Message accepted"
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture
+def smtp_server():
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    try:
+        yield controller, handler
+    finally:
+        controller.stop()
+
+@pytest.fixture
+def sender(db, smtp_server, monkeypatch):
+    controller, _ = smtp_server
+    connection = SMTPConnection(host=controller.hostname, port=controller.port, security="none", username="")
+    monkeypatch.setattr(email_outbox_sender, "connection", connection)
+    monkeypatch.setattr(email_outbox_sender, "max_attempts", 3)
+    monkeypatch.setattr(email_outbox_sender, "backoff_base", 60.0)
+    smtp_breaker.record_success()
+    yield email_outbox_sender
+    connection.close()
+
+def book(email: str, booking_time: str) -> dict:
+    result = booking_tool._run("Ada Lovelace", email, "2030-01-07", booking_time)
+    return json.loads(result)
+
+def outbox(db) -> list:
+    db.expire_all()
+    return db.query(EmailOutbox).order_by(EmailOutbox.id).all()
+
+def make_due(db):
+    """Skip the backoff wait of every pending email"""
+    db.query(EmailOutbox).update({"next_attempt_at": datetime.utcnow() - timedelta(seconds=1)})
+    db.commit()
+
+def test_booking_confirmations_are_delivered_over_one_connection(db, smtp_server, sender):
+    _, handler = smtp_server
+    for i, booking_time in enumerate(["09:00", "09:30", "10:00"]):
+        assert book(f"guest{i}@example.com", booking_time)["email_status"] == "queued"
+
+    assert sender.drain_once() == 3
+
+    emails = outbox(db)
+    assert [email.status for email in emails] == ["sent"] * 3
+    assert [email.attempts for email in emails] == [1] * 3
+    assert all(email.sent_at is not None for email in emails)
+    assert sorted(rcpt for rcpts, _ in handler.delivered for rcpt in rcpts) == [f"guest{i}@example.com" for i in range(3)]
+    # Every message went over the same client socket
+    assert len({peer for _, peer in handler.delivered}) == 1
+    assert sender.drain_once() == 0
+
+def test_refused_recipient_backs_off_then_fails(db, smtp_server, sender):
+    book(REFUSED, "11:00")
+
+    assert sender.drain_once() == 1
+    email = outbox(db)[0]
+    assert email.status == "pending"
+    assert email.attempts == 1
+    assert "No such user" in email.last_error
+    # Backoff: not due again yet
+    assert email.next_attempt_at > datetime.utcnow() + timedelta(seconds=20)
+    assert sender.drain_once() == 0
+
+    for attempt in (2, 3):
+        make_due(db)
+        assert sender.drain_once() == 1
+        assert outbox(db)[0].attempts == attempt
+
+    email = outbox(db)[0]
+    assert email.status == "failed"
+    make_due(db)
+    assert sender.drain_once() == 0
+    # A refused recipient is an answer from a working server
+    assert smtp_breaker.state == CLOSED
+
+def test_message_lost_mid_send_runs_out_of_attempts(db, smtp_server, sender):
+    _, handler = smtp_server
+    book("guest@example.com", "12:00")
+
+    # A worker claims the message and dies before sending, max_attempts times over
+    for attempt in range(1, sender.max_attempts + 1):
+        assert sender._claim(db)
+        assert outbox(db)[0].attempts == attempt
+        make_due(db)
+
+    assert sender.drain_once() == 1
+    email = outbox(db)[0]
+    assert email.status == "failed"
+    assert handler.delivered == []
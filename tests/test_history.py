@@ -0,0 +1,77 @@
+import uuid
+
+from app.core.history import ConversationHistoryManager
+from app.core.stub_models import StubTokenizer
+from app.db.redis_memory import memory_store
+
+class RecordingLLM:
+    """Summarizes by listing the topics it was shown, remembering every prompt"""
+
+    def __init__(self):
+        self.prompts = []
+
+    def __call__(self, prompt: str, max_length: int = 256, **kwargs):
+        self.prompts.append(prompt)
+        topics = sorted({word for word in prompt.split() if word.startswith("topic")})
+        return [{"generated_text": "Discussed " + " ".join(topics)}]
+
+def manager(llm, **kwargs) -> ConversationHistoryManager:
+    history = ConversationHistoryManager(memory_store, window_messages=4, max_tokens=300, summary_max_tokens=40, **kwargs)
+    tokenizer = StubTokenizer()
+    history.use_llm(lambda: llm, lambda: tokenizer)
+    return history
+
+def chat(history, session_id: str, turns: int):
+    for turn in range(turns):
+        history.add_message(session_id, {"role": "user", "content": f"Tell me about topic{turn}"})
+        history.add_message(session_id, {"role": "assistant", "content": f"Here is topic{turn}"})
+
+def test_summary_is_folded_incrementally():
+    llm = RecordingLLM()
+    history = manager(llm, summary_batch_messages=2)
+    session_id = str(uuid.uuid4())
+    chat(history, session_id, 6)
+
+    # One summarizing call per evicted exchange, each shown the previous summary and the new messages only
+    assert len(llm.prompts) == 4
+    assert "Nothing yet." in llm.prompts[0]
+    assert "Discussed topic0" in llm.prompts[1] and "topic1" in llm.prompts[1]
+    assert all("topic5" not in prompt for prompt in llm.prompts)
+    assert memory_store.get_summary(session_id) == "Discussed topic0 topic1 topic2 topic3"
+
+    prompt_history = history.get_prompt_history(session_id)
+    assert prompt_history.startswith("Earlier in the conversation:\nDiscussed topic0 topic1 topic2 topic3")
+    assert "Recent messages:\nUser: Tell me about topic4" in prompt_history
+
+def test_summarizing_work_does_not_grow_with_the_session():
+    llm = RecordingLLM()
+    history = manager(llm, summary_batch_messages=4)
+    session_id = str(uuid.uuid4())
+    chat(history, session_id, 40)
+
+    # First fold at window + batch messages, then one per batch
+    assert len(llm.prompts) == (80 - 8) // 4 + 1
+    assert max(len(prompt) for prompt in llm.prompts[-5:]) <= max(len(prompt) for prompt in llm.prompts[:5]) * 2
+    assert len(memory_store.get_conversation(session_id)) < 4 + 4
+
+def test_prompt_history_stays_within_its_token_budget():
+    history = manager(RecordingLLM(), summary_batch_messages=2)
+    session_id = str(uuid.uuid4())
+    history.add_message(session_id, {"role": "user", "content": "word " * 500})
+    history.add_message(session_id, {"role": "assistant", "content": "short answer"})
+
+    rendered = history.get_prompt_history(session_id, max_tokens=50)
+    assert len(rendered.split()) <= 50 + 2
+    assert rendered.endswith("Assistant: short answer")
+
+def test_failed_summary_keeps_the_previous_one():
+    def broken(prompt, **kwargs):
+        raise RuntimeError("model unavailable")
+
+    history = manager(broken, summary_batch_messages=2)
+    session_id = str(uuid.uuid4())
+    memory_store.store_summary(session_id, "Earlier summary")
+    chat(history, session_id, 4)
+
+    assert memory_store.get_summary(session_id) == "Earlier summary"
+    assert len(memory_store.get_conversation(session_id)) <= 4 + 1
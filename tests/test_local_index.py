@@ -0,0 +1,100 @@
+import multiprocessing
+import os
+
+import numpy as np
+import pytest
+
+from app.core.local_index import LocalVectorStore
+
+DIMENSION = 8
+
+def open_store(directory, **kwargs):
+    return LocalVectorStore(str(directory), dimension=DIMENSION, background_compaction=False, **kwargs)
+
+def vectors(count, seed=0):
+    return np.random.default_rng(seed).normal(size=(count, DIMENSION)).astype(np.float32)
+
+def store(index, embeddings, document_id, start=0):
+    texts = [f"{document_id}-{start + i}" for i in range(len(embeddings))]
+    metadata = [{"document_id": document_id, "chunk_index": start + i} for i in range(len(embeddings))]
+    return index.store_embeddings(embeddings.tolist(), texts, metadata)
+
+def all_texts(index, top_k=1000):
+    results, _ = index.similarity_search([1.0] * DIMENSION, top_k=top_k)
+    return sorted(hit.text for hit in results)
+
+def test_reopen_after_torn_write(tmp_path):
+    index = open_store(tmp_path)
+    store(index, vectors(5), "A")
+    # A writer that crashed halfway through a record leaves a partial header behind
+    segment = index._segments()[-1]
+    with open(segment, "ab") as f:
+        f.write(b"\x01\x02\x03")
+
+    reopened = open_store(tmp_path)
+    assert len(reopened) == 5
+
+    # The next append cuts the torn record off instead of writing after it
+    store(reopened, vectors(2, seed=1), "B")
+    assert len(open_store(tmp_path)) == 7
+    assert all_texts(open_store(tmp_path)) == sorted([f"A-{i}" for i in range(5)] + ["B-0", "B-1"])
+
+def test_delete_then_compact(tmp_path):
+    index = open_store(tmp_path)
+    embeddings = vectors(10)
+    ids = store(index, embeddings[:6], "A")
+    store(index, embeddings[6:], "B", start=6)
+    index.delete_vectors(ids[:2])
+    index.delete_by_document("B")
+    assert len(index) == 4
+
+    index.compact()
+    assert len(index._segments()) == 1
+    reopened = open_store(tmp_path)
+    assert len(reopened) == 4
+    assert reopened._read_manifest()["rows"] == 4
+    assert all_texts(reopened) == [f"A-{i}" for i in range(2, 6)]
+
+    results, _ = reopened.similarity_search(embeddings[0].tolist(), top_k=1)
+    assert results[0].id != ids[0]
+
+def test_search_sees_deletes_while_scanning_snapshot(tmp_path):
+    index = open_store(tmp_path)
+    embeddings = vectors(4)
+    ids = store(index, embeddings, "A")
+    index.compact()
+    index.delete_vectors([ids[1]])
+
+    results, _ = index.similarity_search(embeddings[1].tolist(), top_k=4)
+    assert ids[1] not in [hit.id for hit in results]
+    assert len(results) == 3
+
+def _write_batches(directory, batches):
+    index = open_store(directory)
+    for batch in range(batches):
+        store(index, vectors(3, seed=batch), "writer", start=batch * 3)
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+def test_compaction_racing_a_second_process(tmp_path):
+    index = open_store(tmp_path)
+    store(index, vectors(4, seed=100), "compactor")
+
+    batches = 40
+    writer = multiprocessing.get_context("fork").Process(target=_write_batches, args=(tmp_path, batches))
+    writer.start()
+    while writer.is_alive():
+        index.compact()
+        # Searches follow the other process's appends and the compactions in between:
+        # every row shows up exactly once and appends are seen whole
+        texts = all_texts(index)
+        assert len(texts) == len(set(texts))
+        assert (len(texts) - 4) % 3 == 0
+    writer.join()
+    assert writer.exitcode == 0
+
+    index.compact()
+    expected = sorted([f"compactor-{i}" for i in range(4)] + [f"writer-{i}" for i in range(batches * 3)])
+    assert all_texts(index) == expected
+    assert all_texts(open_store(tmp_path)) == expected
+    snapshots = [name for name in os.listdir(tmp_path) if name.startswith("snapshot-")]
+    assert len(snapshots) == 1